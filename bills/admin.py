@@ -29,5 +29,5 @@ class BillAdmin(admin.ModelAdmin):
     list_display = ("pk","invoice_number", "outlet", "route", "actual_amount","remaining_amount", "status")
     list_filter  = ("outlet__route", "status", "brand")
     search_fields = ("invoice_number", "outlet__name",)
-    readonly_fields = ('remaining_amount',)
+    readonly_fields = ('remaining_amount', 'opening_amount')
     list_per_page = 25
@@ -0,0 +1,75 @@
+# bills/bootstrap.py
+"""
+App start-up payload for a DRA: their open bills plus the routes and
+outlets those bills reference, normalized so each route and outlet is
+sent once.
+
+    {
+      "token":   "<delta sync token, see bills/sync.py>",
+      "routes":  [{"id": 1, "name": "North"}, …],
+      "outlets": [{"id": 7, "name": "Shop A", "route_id": 1}, …],
+      "bills":   [{"id": 42, …, "outlet_id": 7}, …]
+    }
+
+Everything comes from a single values_list() query over the bills joined
+to outlet and route: the bill columns BootstrapBillSerializer needs (via
+its RowMapper) followed by the outlet/route columns, de-duplicated while
+the rows are read. Routes and outlets only the agent's bills use are sent,
+not the whole system's. The token lets the app continue with delta syncs.
+"""
+from .fieldsets import requested_fields
+from .rowmappers import RowMapper
+from .serializers import BootstrapBillSerializer
+from .sync import SyncDelta
+
+# bills grouped the way the app lists them
+BOOTSTRAP_ORDERING = ("outlet__route__name", "outlet__name", "invoice_date", "id")
+REFERENCE_LOOKUPS = ("outlet_id", "outlet__name", "outlet__route_id", "outlet__route__name")
+
+
+def bootstrap_payload(request):
+    # 1) the full worklist, with the token to delta-sync from afterwards
+    delta = SyncDelta(request.user)
+    bills_qs = delta.bills.with_live_overdue().order_by(*BOOTSTRAP_ORDERING)
+
+    # 2) one query: bill columns, then outlet / route columns
+    field_names = requested_fields(request, BootstrapBillSerializer)
+    mapper = RowMapper.for_queryset(BootstrapBillSerializer, bills_qs, field_names)
+    if not mapper.supported:
+        return _bootstrap_from_instances(request, delta, bills_qs)
+    width = len(mapper.lookups)
+    rows = bills_qs.values_list(*mapper.lookups, *REFERENCE_LOOKUPS)
+
+    # 3) map bills, collecting each route / outlet the first time it appears
+    routes, outlets, bills = {}, {}, []
+    convert = mapper.to_representation
+    for row in rows:
+        bills.append(convert(row))
+        outlet_id, outlet_name, route_id, route_name = row[width:]
+        if outlet_id not in outlets:
+            outlets[outlet_id] = {"id": outlet_id, "name": outlet_name, "route_id": route_id}
+        if route_id not in routes:
+            routes[route_id] = {"id": route_id, "name": route_name}
+
+    return {
+        "token":   delta.token,
+        "routes":  list(routes.values()),
+        "outlets": list(outlets.values()),
+        "bills":   bills,
+    }
+
+
+def _bootstrap_from_instances(request, delta, bills_qs):
+    """Same payload through the serializer, for fieldsets RowMapper can't compile."""
+    bills_qs = bills_qs.select_related("outlet__route")
+    routes, outlets = {}, {}
+    for bill in bills_qs:
+        outlet = bill.outlet
+        outlets.setdefault(outlet.pk, {"id": outlet.pk, "name": outlet.name, "route_id": outlet.route_id})
+        routes.setdefault(outlet.route_id, {"id": outlet.route_id, "name": outlet.route.name})
+    return {
+        "token":   delta.token,
+        "routes":  list(routes.values()),
+        "outlets": list(outlets.values()),
+        "bills":   BootstrapBillSerializer(bills_qs, many=True, context={"request": request}).data,
+    }
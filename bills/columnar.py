@@ -0,0 +1,174 @@
+# bills/columnar.py
+"""
+Compact columnar format for bulk downloads (`?format=columnar`).
+
+A list of row objects
+
+    [{"id": 1, "route_name": "North", "brand": "Acme", …}, …]
+
+is sent as
+
+    {
+      "columns": ["id", "route_name", "brand", …],
+      "rows": [[1, 0, 0, …], …],
+      "dictionaries": {"route_name": ["North", …], "brand": ["Acme", …]}
+    }
+
+Field names appear once, and repeated strings in DICTIONARY_COLUMNS are
+replaced in `rows` by their index into `dictionaries[column]` (null stays
+null). When the view can, rows are built straight from values_list()
+tuples (bills.rowmappers), skipping the per-row dicts entirely;
+ColumnarJSONRenderer converts any remaining lists of row dicts (e.g.
+under "results" or "bills") itself.
+
+Unpaginated lists are streamed like their JSON counterparts
+(bills.streaming): "columns" first, then "rows" chunk by chunk, and
+"dictionaries" last, once every value has been seen. Memory stays at one
+chunk of rows plus the dictionaries.
+"""
+from rest_framework.renderers import JSONRenderer
+
+from .fieldsets import requested_fields
+from .rowmappers import RowMapper
+
+COLUMNAR_FORMAT = "columnar"
+DICTIONARY_COLUMNS = ("route_name", "outlet_name", "brand", "assigned_to_name")
+
+
+class ColumnarTable:
+    """Incrementally built columnar payload."""
+
+    def __init__(self, columns, dictionary_columns=DICTIONARY_COLUMNS):
+        self.columns = list(columns)
+        self.rows = []
+        # column position → (value → index, values)
+        self._dictionaries = {
+            position: ({}, [])
+            for position, name in enumerate(self.columns)
+            if name in dictionary_columns
+        }
+
+    def append(self, values):
+        for position, (index, values_seen) in self._dictionaries.items():
+            value = values[position]
+            if value is None:
+                continue
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(values_seen)
+                values_seen.append(value)
+            values[position] = code
+        self.rows.append(values)
+
+    def take_rows(self):
+        """The rows appended since the last call (for streaming)."""
+        rows, self.rows = self.rows, []
+        return rows
+
+    @property
+    def dictionaries(self):
+        return {
+            self.columns[position]: values
+            for position, (_, values) in self._dictionaries.items()
+        }
+
+    def as_dict(self):
+        return {
+            "columns": self.columns,
+            "rows": self.rows,
+            "dictionaries": self.dictionaries,
+        }
+
+
+def is_columnar(data):
+    return isinstance(data, dict) and "columns" in data and "rows" in data
+
+
+def columnar_from_dicts(items):
+    """Row dicts → columnar payload (keys in first-seen order)."""
+    columns = {}
+    for item in items:
+        for key in item:
+            columns.setdefault(key, None)
+    table = ColumnarTable(columns)
+    for item in items:
+        table.append([item.get(name) for name in table.columns])
+    return table.as_dict()
+
+
+def columnar_chunks(queryset, serializer_class, context=None, chunk_size=1000):
+    """
+    (table, iterator of row-list chunks) for `queryset`: rows built from
+    values_list() tuples when `serializer_class` compiles to a RowMapper,
+    else from its row dicts. The table's dictionaries are complete once
+    the iterator is exhausted.
+    """
+    field_names = requested_fields((context or {}).get("request"), serializer_class)
+    mapper = RowMapper.for_queryset(serializer_class, queryset, field_names)
+    if mapper.supported:
+        table = ColumnarTable(mapper.field_names)
+
+        def chunks():
+            to_values, append = mapper.to_values, table.append
+            for row in mapper.rows(queryset).iterator(chunk_size=chunk_size):
+                append(to_values(row))
+                if len(table.rows) >= chunk_size:
+                    yield table.take_rows()
+            yield table.take_rows()
+        return table, chunks()
+
+    # serializer output: every row has the serializer's (selected) fields
+    names = [
+        name for name, field in serializer_class(context=context or {}).fields.items()
+        if not field.write_only
+    ]
+    table = ColumnarTable(names)
+
+    def chunks():
+        rows = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            rows.append(obj)
+            if len(rows) >= chunk_size:
+                yield _append_dicts(table, serializer_class(rows, many=True, context=context or {}).data)
+                rows = []
+        yield _append_dicts(table, serializer_class(rows, many=True, context=context or {}).data)
+    return table, chunks()
+
+
+def _append_dicts(table, items):
+    for item in items:
+        table.append([item.get(name) for name in table.columns])
+    return table.take_rows()
+
+
+def columnar_rows(queryset, serializer_class, context=None):
+    """Columnar payload for `queryset`, built in memory (see columnar_chunks)."""
+    table, chunks = columnar_chunks(queryset, serializer_class, context)
+    rows = [row for chunk in chunks for row in chunk]
+    return {"columns": table.columns, "rows": rows, "dictionaries": table.dictionaries}
+
+
+def wants_columnar(request):
+    renderer = getattr(request, "accepted_renderer", None)
+    return renderer is not None and renderer.format == COLUMNAR_FORMAT
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON renderer selected by ?format=columnar."""
+    media_type = "application/vnd.debt-recovery.columnar+json"
+    format = COLUMNAR_FORMAT
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(self.to_columnar(data), accepted_media_type, renderer_context)
+
+    @classmethod
+    def to_columnar(cls, data):
+        if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+            return columnar_from_dicts(data)
+        if isinstance(data, dict) and not is_columnar(data):
+            # paginated envelopes: {"results": [...]} / {"bills": [...]}
+            return {
+                key: cls.to_columnar(value) if isinstance(value, list) else value
+                for key, value in data.items()
+            }
+        return data
@@ -0,0 +1,51 @@
+# bills/dateranges.py
+"""
+Sargable local-date filters for DateTimeFields.
+
+`created_at__date__gte=…` makes the database cast every row's timestamp to
+a date (in the current time zone) before comparing, so an index on
+created_at cannot be used. The helpers here turn local calendar dates into
+half-open timestamp ranges instead:
+
+    start_date ≤ local date of created_at ≤ end_date
+      ⇔  start_of_day(start_date) ≤ created_at < start_of_day(end_date + 1)
+
+which a plain index on the column serves as a range seek. Day boundaries
+are local midnights of the current (by default the project's TIME_ZONE)
+time zone, matching what `__date` lookups did.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def start_of_day(day, tz=None):
+    """Aware datetime of the local midnight that starts `day`."""
+    tz = tz or timezone.get_current_timezone()
+    return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+
+def local_date_bounds(start_date=None, end_date=None, tz=None):
+    """
+    (lower, upper) timestamps for the local dates start_date..end_date
+    (both inclusive): lower is inclusive, upper exclusive. A missing date
+    leaves that side unbounded (None).
+    """
+    lower = start_of_day(start_date, tz) if start_date else None
+    upper = start_of_day(end_date + timedelta(days=1), tz) if end_date else None
+    return lower, upper
+
+
+def filter_local_dates(queryset, field, start_date=None, end_date=None, tz=None):
+    """`queryset` restricted to rows whose `field` falls on start_date..end_date."""
+    lower, upper = local_date_bounds(start_date, end_date, tz)
+    if lower is not None:
+        queryset = queryset.filter(**{f"{field}__gte": lower})
+    if upper is not None:
+        queryset = queryset.filter(**{f"{field}__lt": upper})
+    return queryset
+
+
+def filter_local_date(queryset, field, day, tz=None):
+    """`queryset` restricted to rows whose `field` falls on the local date `day`."""
+    return filter_local_dates(queryset, field, day, day, tz)
@@ -0,0 +1,106 @@
+# bills/excel.py
+import openpyxl
+
+
+class ExcelReadError(ValueError):
+    """The upload could not be opened as an .xlsx workbook."""
+
+
+class ExcelRowReader:
+    """
+    Constant-memory reader for uploaded .xlsx files.
+
+    The workbook is opened once in openpyxl's read-only mode and the active
+    sheet is walked with `iter_rows(values_only=True)`, so only the current
+    row is ever materialised. The first row is taken as the header row and
+    is parsed exactly once; every following row is yielded as
+    `(excel_row_number, {header: typed_value})`.
+
+    Cell values keep the types openpyxl gives them (str, int, float,
+    datetime, None). Completely empty rows are skipped. `header_map` may be
+    set (or replaced) any time before iteration starts.
+
+    Usage:
+        reader = ExcelRowReader(uploaded_file, header_map={"Brand": "brand"})
+        reader.missing(["brand", ...])        # → list of absent columns
+        for chunk in reader.chunks(1000):
+            ...                               # list of (row_number, dict)
+    """
+
+    def __init__(self, uploaded_file, header_map=None):
+        self.file = uploaded_file
+        self.header_map = header_map or {}
+        self._workbook = None
+        self._rows = None
+        self._headers = None
+
+    # ─── opening / headers ───────────────────────────────────────────────────
+    def _open(self):
+        if self._rows is not None:
+            return
+        try:
+            if hasattr(self.file, "seek"):
+                self.file.seek(0)
+            self._workbook = openpyxl.load_workbook(
+                self.file, read_only=True, data_only=True
+            )
+            sheet = self._workbook.active
+            # read-only sheets trust the stored <dimension>, which some
+            # exporters get wrong; recompute it while streaming instead
+            sheet.reset_dimensions()
+            self._rows = sheet.iter_rows(values_only=True)
+            header_row = next(self._rows, None) or ()
+        except Exception as e:
+            self.close()
+            raise ExcelReadError(f"Could not read Excel file: {e}") from e
+
+        self._headers = [str(h).strip() if h is not None else None for h in header_row]
+
+    def _mapped_headers(self):
+        self._open()
+        return [
+            self.header_map.get(h, h) if h is not None else None
+            for h in self._headers
+        ]
+
+    @property
+    def headers(self):
+        """Header names (after `header_map`), in sheet order."""
+        return [h for h in self._mapped_headers() if h is not None]
+
+    def missing(self, required):
+        """Required columns that are absent from the header row, in order."""
+        present = set(self.headers)
+        return [c for c in required if c not in present]
+
+    # ─── rows ────────────────────────────────────────────────────────────────
+    def __iter__(self):
+        headers = self._mapped_headers()
+        try:
+            for offset, values in enumerate(self._rows):
+                if not any(v is not None and v != "" for v in values):
+                    continue
+                row = {
+                    header: value
+                    for header, value in zip(headers, values)
+                    if header is not None
+                }
+                yield offset + 2, row  # Excel row = offset + header row
+        finally:
+            self.close()
+
+    def chunks(self, size):
+        """Yield lists of at most `size` `(row_number, dict)` pairs."""
+        chunk = []
+        for item in self:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+        self._workbook = None
@@ -0,0 +1,264 @@
+# bills/exports.py
+"""
+Streaming variants of export_bills_xlsx / export_payments_xlsx.
+
+Rows are read with `.values_list(...).iterator(chunk_size=...)`, so only one
+chunk of database rows is alive at a time, and handed to either
+  • a CSV writer whose output is yielded line by line (first bytes go out
+    as soon as the first chunk is read), or
+  • an openpyxl write-only workbook, which spills rows to a temporary file
+    instead of keeping cells in memory; the finished file is then streamed
+    from disk in fixed-size blocks.
+
+build_export_frame() is the shared, vectorized DataFrame builder used by the
+buffered (default) exports in bills/views.py.
+"""
+import csv
+import io
+import tempfile
+from decimal import ROUND_HALF_UP, Decimal
+
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from payments.models import Payment
+from .dateranges import filter_local_dates
+from .models import Bill
+
+
+DEFAULT_EXPORT_CHUNK_SIZE = 2000
+STREAM_BLOCK_SIZE = 64 * 1024
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_CONTENT_TYPE = "text/csv; charset=utf-8"
+
+BILL_EXPORT_COLUMNS = [
+    "Bill ID",
+    "Brand",
+    "Invoice Date",
+    "Route Name",
+    "Invoice Number",
+    "Outlet Name",
+    "Outstanding Amount",
+    "Overdue Days",
+    "Invoice Bill Amount",
+]
+
+PAYMENT_EXPORT_COLUMNS = [
+    "Bill ID",
+    "Brand",
+    "Invoice Date",
+    "Route Name",
+    "Invoice Number",
+    "Outlet Name",
+    "Payment Amount",
+    "Username",
+    "Overdue Days",
+]
+
+
+# values_list field → export column, for the DataFrame-based exports
+BILL_EXPORT_FIELDS = {
+    "pk":                  "Bill ID",
+    "brand":               "Brand",
+    "invoice_date":        "Invoice Date",
+    "outlet__route__name": "Route Name",
+    "invoice_number":      "Invoice Number",
+    "outlet__name":        "Outlet Name",
+    "remaining_amount":    "Outstanding Amount",
+    "actual_amount":       "Invoice Bill Amount",
+}
+
+PAYMENT_EXPORT_FIELDS = {
+    "bill__pk":                  "Bill ID",
+    "bill__brand":               "Brand",
+    "bill__invoice_date":        "Invoice Date",
+    "bill__outlet__route__name": "Route Name",
+    "bill__invoice_number":      "Invoice Number",
+    "bill__outlet__name":        "Outlet Name",
+    "amount":                    "Payment Amount",
+    "dra__username":             "Username",
+}
+
+
+def export_chunk_size():
+    return getattr(settings, "EXPORT_CHUNK_SIZE", DEFAULT_EXPORT_CHUNK_SIZE)
+
+
+def overdue_days(today, invoice_date):
+    if invoice_date is None:
+        return 0
+    return max((today - invoice_date).days, 0)
+
+
+# ─── DataFrame builder ───────────────────────────────────────────────────────
+def _paise(amount):
+    return int(Decimal(amount).scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def to_minor_units(series):
+    """Decimal money → int64 paise, scaled exactly in Decimal (no float step)."""
+    return series.map(_paise, na_action="ignore").fillna(0).astype("int64")
+
+
+def build_export_frame(qs, fields, invoice_date_field, categorical=(), money=()):
+    """
+    Build the export DataFrame for `qs` in one pass:
+      • columns come from `.values_list(*fields)` and are renamed through
+        `fields` (field → export column)
+      • "Overdue Days" = max((today − invoice_date).days, 0), computed with
+        vectorized datetime64 arithmetic (missing dates count as 0); the
+        invoice date column itself stays plain dates, so the sheet shows
+        "2026-10-07", not a midnight timestamp
+      • repeated text columns (`categorical`) are stored as categoricals
+      • money columns (`money`) are held as int64 paise; write_export_xlsx()
+        turns them back into rupees
+    """
+    names = list(fields)
+    df = pd.DataFrame.from_records(
+        qs.values_list(*names).iterator(chunk_size=export_chunk_size()),
+        columns=names,
+    )
+
+    dates = pd.to_datetime(df[invoice_date_field])
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = dates.dt.tz_convert(None)
+    today = pd.Timestamp(timezone.localdate())
+    overdue = (today - dates.dt.normalize()).dt.days
+    df["Overdue Days"] = overdue.clip(lower=0).fillna(0).astype("int32")
+    df[invoice_date_field] = dates.dt.date
+
+    for name in categorical:
+        df[name] = df[name].astype("category")
+    for name in money:
+        df[name] = to_minor_units(df[name])
+
+    return df.rename(columns=fields)
+
+
+def write_export_xlsx(df, sheet_name, money_columns=()):
+    """Serialize a build_export_frame() result to XLSX bytes."""
+    out = df.copy(deep=False)
+    for col in money_columns:
+        # int / 100 is correctly rounded: the cell gets the double nearest
+        # the exact rupee amount, as writing the Decimal would
+        out[col] = out[col] / 100
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        out.to_excel(writer, index=False, sheet_name=sheet_name)
+    return output.getvalue()
+
+
+# ─── row sources ─────────────────────────────────────────────────────────────
+def iter_bill_rows(start_date=None, end_date=None):
+    """Yield one tuple per bill, in BILL_EXPORT_COLUMNS order."""
+    qs = Bill.objects.all()
+    if start_date:
+        qs = qs.filter(invoice_date__gte=start_date)
+    if end_date:
+        qs = qs.filter(invoice_date__lte=end_date)
+
+    today = timezone.localdate()
+    values = qs.order_by("pk").values_list(
+        "pk",
+        "brand",
+        "invoice_date",
+        "outlet__route__name",
+        "invoice_number",
+        "outlet__name",
+        "remaining_amount",
+        "actual_amount",
+    )
+    for pk, brand, inv_date, route, number, outlet, remaining, actual in values.iterator(
+        chunk_size=export_chunk_size()
+    ):
+        yield (pk, brand, inv_date, route, number, outlet, remaining,
+               overdue_days(today, inv_date), actual)
+
+
+def iter_payment_rows(start_date=None, end_date=None):
+    """Yield one tuple per payment, in PAYMENT_EXPORT_COLUMNS order."""
+    qs = filter_local_dates(Payment.objects.all(), "created_at", start_date, end_date)
+
+    today = timezone.localdate()
+    values = qs.order_by("pk").values_list(
+        "bill__pk",
+        "bill__brand",
+        "bill__invoice_date",
+        "bill__outlet__route__name",
+        "bill__invoice_number",
+        "bill__outlet__name",
+        "amount",
+        "dra__username",
+    )
+    for row in values.iterator(chunk_size=export_chunk_size()):
+        yield row + (overdue_days(today, row[2]),)
+
+
+# ─── writers ─────────────────────────────────────────────────────────────────
+class _Echo:
+    """File-like object whose write() just returns what it was given."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    """Yield the CSV export as UTF-8 bytes, one line at a time."""
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the UTF-8 file (₹, Devanagari names…) correctly
+    yield "\ufeff".encode("utf-8") + writer.writerow(columns).encode("utf-8")
+    for row in rows:
+        yield writer.writerow(row).encode("utf-8")
+
+
+def stream_xlsx(sheet_name, columns, rows):
+    """
+    Build the workbook in write-only mode (rows spill to disk, not memory)
+    and yield the finished file in STREAM_BLOCK_SIZE pieces.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            block = tmp.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+EXPORTS = {
+    "bills":    ("Bills", BILL_EXPORT_COLUMNS, iter_bill_rows),
+    "payments": ("Payments", PAYMENT_EXPORT_COLUMNS, iter_payment_rows),
+}
+
+
+def streaming_export_response(kind, file_format, start_date=None, end_date=None):
+    """
+    StreamingHttpResponse for `kind` ("bills" | "payments") as
+    `file_format` ("xlsx" | "csv"), using the same columns and filename
+    scheme as the buffered exports.
+    """
+    sheet_name, columns, row_source = EXPORTS[kind]
+    rows = row_source(start_date, end_date)
+
+    if file_format == "csv":
+        content, content_type = stream_csv(columns, rows), CSV_CONTENT_TYPE
+    else:
+        content, content_type = stream_xlsx(sheet_name, columns, rows), XLSX_CONTENT_TYPE
+
+    start_str = start_date.isoformat() if start_date else "all"
+    end_str = end_date.isoformat() if end_date else "all"
+    filename = f"{kind}_{start_str}_to_{end_str}.{file_format}"
+
+    resp = StreamingHttpResponse(content, content_type=content_type)
+    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return resp
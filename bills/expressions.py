@@ -0,0 +1,40 @@
+# bills/expressions.py
+from django.db.models import DateField, Func, IntegerField, Value
+from django.db.models.functions import Greatest
+
+
+class DaysSince(Func):
+    """
+    Whole days from a date column to `today`, computed by the database:
+        DaysSince("invoice_date", today)  →  today − invoice_date  (in days)
+
+    Rendered per backend: plain date subtraction on PostgreSQL/Oracle,
+    DATEDIFF() on MySQL and julianday() arithmetic on SQLite.
+    """
+    output_field = IntegerField()
+    arg_joiner = " - "
+    template = "(%(expressions)s)"
+
+    def __init__(self, expression, today, **extra):
+        super().__init__(Value(today, output_field=DateField()), expression, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            function="DATEDIFF", template="%(function)s(%(expressions)s)",
+            arg_joiner=", ",
+            **extra_context,
+        )
+
+
+def overdue_days_expression(today, field="invoice_date"):
+    """max(today − invoice_date, 0), the same rule Bill.save() applies."""
+    return Greatest(DaysSince(field, today), Value(0))
@@ -0,0 +1,74 @@
+# bills/fieldsets.py
+"""
+Sparse fieldsets: `?fields=id,invoice_number,remaining_amount` keeps only
+those output fields, `?omit=cleared_at,assigned_to_name` drops some.
+
+The selection applies to safe (read) requests only, so a write never loses
+input fields. Besides trimming the JSON, the same names are handed to the
+query planner (bills.planning) and the values_list() row mapper
+(bills.rowmappers), so joins and columns that only fed dropped fields are
+not loaded either. A relation the ORDER BY (or a filter) goes through is
+still joined: e.g. my-assignments-flat's default `outlet__route__name`
+ordering keeps the outlet and route joins whatever ?fields= says; with
+`?ordering=id` the same ?fields=id,remaining_amount selects two columns
+from the bills table alone.
+"""
+from functools import lru_cache
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = "fields"
+OMIT_QUERY_PARAM = "omit"
+
+
+@lru_cache(maxsize=None)
+def readable_field_names(serializer_class):
+    """Names of the fields `serializer_class` outputs, in order."""
+    return tuple(
+        name for name, field in serializer_class().fields.items() if not field.write_only
+    )
+
+
+def _names(raw):
+    return [name.strip() for name in (raw or "").split(",") if name.strip()]
+
+
+def requested_fields(request, serializer_class):
+    """
+    Output field names selected by ?fields= / ?omit= (serializer order),
+    or None when the request doesn't ask for a subset.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if FIELDS_QUERY_PARAM not in params and OMIT_QUERY_PARAM not in params:
+        return None
+
+    available = readable_field_names(serializer_class)
+    keep = _names(params.get(FIELDS_QUERY_PARAM))
+    omit = _names(params.get(OMIT_QUERY_PARAM))
+
+    unknown = [name for name in keep + omit if name not in available]
+    if unknown:
+        raise ValidationError({
+            FIELDS_QUERY_PARAM: [f"Unknown field(s): {', '.join(unknown)}."],
+        })
+
+    keep = set(keep or available)
+    return tuple(name for name in available if name in keep and name not in omit)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin: drop the fields not selected by `field_names=` or, when
+    not given, by the request's ?fields= / ?omit= (from the context).
+    """
+
+    def __init__(self, *args, field_names=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if field_names is None:
+            field_names = requested_fields(self.context.get("request"), type(self))
+        if field_names is not None:
+            for name in set(self.fields) - set(field_names):
+                self.fields.pop(name)
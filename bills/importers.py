@@ -0,0 +1,491 @@
+# bills/importers.py
+import datetime
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from payments.models import Payment, apply_balance_deltas
+from payments.summaries import record_payments
+from users.models import User
+from .models import Bill, Route, Outlet
+from . import versions
+from .versions import bump_versions
+
+
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
+
+def import_batch_size():
+    """Rows per bulk_create batch (settings.BILL_IMPORT_BATCH_SIZE)."""
+    return getattr(settings, "BILL_IMPORT_BATCH_SIZE", DEFAULT_IMPORT_BATCH_SIZE)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from `iterable`."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_decimal(value):
+    """
+    Coerce a spreadsheet cell to a 2-place Decimal.
+    Strips thousands separators and currency signs the way the payment
+    import always has.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        raise ValueError("amount is blank")
+    text = str(value).replace(",", "").replace("$", "").replace("₹", "").strip()
+    try:
+        return Decimal(text).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: '{value}'")
+
+
+class BillImporter:
+    """
+    Set-based engine behind ImportBillsFromExcelAPIView.
+
+    Rows are consumed in batches of `batch_size`. For every batch we:
+      1) parse & coerce each row (bad rows go to `errors`, the rest continue)
+      2) drop invoice numbers that already exist (one IN query per batch)
+      3) resolve routes/outlets from in-memory dictionaries, loading unseen
+         names with one IN query and creating missing ones with bulk_create
+      4) bulk_create the bills with remaining_amount/overdue_days already set
+
+    Each batch commits in its own transaction, so a failure only loses the
+    batch that was in flight: a database error (e.g. an invoice number a
+    concurrent import just inserted) is reported under the batch's first
+    row and the import carries on with the next batch.
+
+    Usage:
+        importer = BillImporter()
+        importer.import_rows(rows)   # rows: iterable of (excel_row, dict)
+        importer.imported, importer.errors
+    """
+
+    # map Excel headers → our internal snake_case keys
+    HEADER_MAP = {
+        'Brand':               'brand',
+        'Invoice Date':        'invoice_date',
+        'Route Name':          'route_name',
+        'Invoice Number':      'invoice_number',
+        'Outlet Name':         'outlet_name',
+        'Outstanding Amount':  'outstanding_amount',
+        'Overdue Days':        'overdue_days',
+        'Invoice Bill Amount': 'bill_amount',
+    }
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or import_batch_size()
+        self.routes = {}            # route name  → Route
+        self.outlets = {}           # outlet name → Outlet
+        self.ambiguous_outlets = set()
+        self.seen_invoices = set()  # invoice numbers handled in this run
+        self.imported = []
+        self.errors = []
+
+    # ─── public API ──────────────────────────────────────────────────────────
+    def import_rows(self, rows):
+        for batch in chunked(rows, self.batch_size):
+            self.import_batch(batch)
+        return self
+
+    def import_batch(self, batch):
+        parsed = []
+        for excel_row, row in batch:
+            try:
+                parsed.append((excel_row, self.parse_row(row)))
+            except Exception as e:
+                self.errors.append({"row": excel_row, "error": str(e)})
+
+        seen_invoices = set(self.seen_invoices)
+        try:
+            with transaction.atomic():
+                fresh = self._drop_existing(parsed)
+                if not fresh:
+                    return 0
+                self._resolve_routes({data["route_name"] for _, data in fresh})
+                fresh = self._resolve_outlets(fresh)
+                created = self._create_bills(fresh)
+        except DatabaseError as e:
+            # rolled back: forget routes / outlets the batch may have created
+            self.routes, self.outlets = {}, {}
+            self.seen_invoices = seen_invoices
+            self.errors.append({
+                "row": batch[0][0],
+                "error": f"Database error in rows {batch[0][0]}–{batch[-1][0]}: {str(e)}",
+            })
+            return 0
+
+        self.imported.extend(created)
+        return len(created)
+
+    # ─── row parsing ─────────────────────────────────────────────────────────
+    @staticmethod
+    def parse_row(row):
+        overdue_days = int(row["overdue_days"])
+        if overdue_days < 0:
+            raise ValueError("Overdue Days cannot be negative")
+        return {
+            "brand":              str(row["brand"] or "").strip(),
+            "invoice_date":       pd.to_datetime(row["invoice_date"]).date(),
+            "route_name":         str(row["route_name"]).strip(),
+            "invoice_number":     str(row["invoice_number"]).strip(),
+            "outlet_name":        str(row["outlet_name"]).strip(),
+            "outstanding_amount": to_decimal(row["outstanding_amount"]),
+            "overdue_days":       overdue_days,
+            "bill_amount":        to_decimal(row["bill_amount"]),
+        }
+
+    # ─── set-based steps ─────────────────────────────────────────────────────
+    def _drop_existing(self, parsed):
+        """Skip duplicates: already in the DB, or repeated earlier in the sheet."""
+        numbers = {data["invoice_number"] for _, data in parsed}
+        existing = set(
+            Bill.objects.filter(invoice_number__in=numbers)
+            .values_list("invoice_number", flat=True)
+        )
+        fresh = []
+        for excel_row, data in parsed:
+            number = data["invoice_number"]
+            if number in existing or number in self.seen_invoices:
+                continue
+            self.seen_invoices.add(number)
+            fresh.append((excel_row, data))
+        return fresh
+
+    def _resolve_routes(self, names):
+        missing = names - self.routes.keys()
+        if not missing:
+            return
+        for route in Route.objects.filter(name__in=missing):
+            self.routes[route.name] = route
+        to_create = [Route(name=n) for n in missing if n not in self.routes]
+        if to_create:
+            # ignore_conflicts tolerates a concurrent import creating the same
+            # route; re-read afterwards so every Route carries its pk.
+            Route.objects.bulk_create(to_create, ignore_conflicts=True)
+            bump_versions(versions.ROUTES)
+            for route in Route.objects.filter(name__in=[r.name for r in to_create]):
+                self.routes[route.name] = route
+
+    def _resolve_outlets(self, fresh):
+        """
+        Outlets are matched on name alone (as the per-row importer always did);
+        an outlet found under a different route is moved to the sheet's route.
+        Rows naming an outlet that exists on several routes are rejected.
+        """
+        wanted = {}  # outlet name → route of the last row that mentions it
+        for _, data in fresh:
+            wanted[data["outlet_name"]] = self.routes[data["route_name"]]
+
+        unseen = wanted.keys() - self.outlets.keys() - self.ambiguous_outlets
+        if unseen:
+            found = {}
+            for outlet in Outlet.objects.filter(name__in=unseen):
+                if outlet.name in found:
+                    self.ambiguous_outlets.add(outlet.name)
+                found[outlet.name] = outlet
+            for name, outlet in found.items():
+                if name not in self.ambiguous_outlets:
+                    self.outlets[name] = outlet
+
+        to_create, to_move = [], []
+        for name, route in wanted.items():
+            if name in self.ambiguous_outlets:
+                continue
+            outlet = self.outlets.get(name)
+            if outlet is None:
+                outlet = Outlet(name=name, route=route)
+                self.outlets[name] = outlet
+                to_create.append(outlet)
+            elif outlet.route_id != route.id:
+                outlet.route = route
+                to_move.append(outlet)
+            else:
+                outlet.route = route  # keep the cached Route attached
+
+        if to_create:
+            Outlet.objects.bulk_create(to_create)
+            bump_versions(versions.OUTLETS)
+            if any(o.pk is None for o in to_create):
+                # backends without RETURNING: fetch the new primary keys
+                lookup = {
+                    (o.name, o.route_id): o.pk
+                    for o in Outlet.objects.filter(name__in=[o.name for o in to_create])
+                }
+                for o in to_create:
+                    o.pk = lookup[(o.name, o.route_id)]
+        if to_move:
+            Outlet.objects.bulk_update(to_move, ["route"], batch_size=self.batch_size)
+            # bulk_update sends no post_save: worklists show the old route
+            from .worklists import bump_worklist_generation
+            bump_worklist_generation()
+            bump_versions(versions.OUTLETS)
+
+        kept = []
+        for excel_row, data in fresh:
+            if data["outlet_name"] in self.ambiguous_outlets:
+                self.errors.append({
+                    "row": excel_row,
+                    "error": f"Multiple outlets named '{data['outlet_name']}' exist",
+                })
+                continue
+            kept.append((excel_row, data))
+        return kept
+
+    def _create_bills(self, fresh):
+        bills = [
+            Bill(
+                brand=data["brand"],
+                invoice_date=data["invoice_date"],
+                outlet=self.outlets[data["outlet_name"]],
+                invoice_number=data["invoice_number"],
+                actual_amount=data["bill_amount"],
+                remaining_amount=data["outstanding_amount"],
+                opening_amount=data["outstanding_amount"],
+                overdue_days=data["overdue_days"],
+                # no assigned_to – leave it for manual assignment later
+            )
+            for _, data in fresh
+        ]
+        # bulk_create bypasses Bill.save(), which is exactly what we want:
+        # the sheet already carries the balance (net of payments made before
+        # the import: the ledger's opening amount) and overdue_days.
+        created = Bill.objects.bulk_create(bills, batch_size=self.batch_size)
+        bump_versions(versions.BILLS)
+        return created
+
+
+def is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ""
+    return bool(pd.isna(value))
+
+
+def apply_payment_balances(payments):
+    """
+    Move the balances of the bills `payments` were bulk-created against by
+    their summed amounts, through the payment ledger
+    (payments.models.apply_balance_deltas): one CASE UPDATE per batch of
+    bills, clearing those that reach zero. A bill's imported opening
+    balance is kept, unlike a recomputation from actual_amount.
+    """
+    deltas = defaultdict(Decimal)
+    for payment in payments:
+        deltas[payment.bill_id] += payment.amount
+    if not deltas:
+        return 0
+    updated = apply_balance_deltas(deltas)
+    from .worklists import invalidate_bill_worklists
+    invalidate_bill_worklists(deltas)
+    return updated
+
+
+class PaymentImporter:
+    """
+    Bulk engine behind BillImportView.
+
+    Per batch of rows:
+      1) parse each row (bad rows are reported, the rest continue)
+      2) resolve every invoice number in one IN query and every
+         username/email in one more
+      3) insert the payments with bulk_create – no per-row post_save, so the
+         update_bill_remaining signal never fires
+      4) move the touched bills' balances by their summed payments through
+         the ledger (see apply_payment_balances), and add the payments to
+         their days' summaries
+
+    Each batch runs in its own transaction. A database error rolls back and
+    reports just that batch (under its first row); anything else is a bug
+    and propagates.
+    """
+
+    PAYMENT_METHOD = "Imported"
+
+    # The import sheet must at least contain these column headers
+    REQUIRED_COLUMNS = (
+        "Invoice Number",
+        "Payment Amount",
+        "Username",
+        "Payment Date",
+    )
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or import_batch_size()
+        self.imported = 0
+        self.errors = []
+
+    def import_rows(self, rows):
+        for batch in chunked(rows, self.batch_size):
+            self.import_batch(batch)
+        return self
+
+    @property
+    def summary(self):
+        errors = sorted(self.errors, key=lambda e: e["row"])
+        return {"imported": self.imported, "errors": errors}
+
+    def import_batch(self, batch):
+        parsed = []
+        for excel_row, row in batch:
+            try:
+                parsed.append((excel_row, self.parse_row(row)))
+            except ValueError as e:
+                self.errors.append({"row": excel_row, "error": str(e)})
+
+        bills = self._load_bills({data["invoice_number"] for _, data in parsed})
+        users = self._load_users({data["identifier"] for _, data in parsed})
+
+        payments = []
+        for excel_row, data in parsed:
+            bill_id = bills.get(data["invoice_number"])
+            if bill_id is None:
+                self.errors.append({
+                    "row": excel_row,
+                    "error": f"Bill with Invoice Number '{data['invoice_number']}' not found",
+                })
+                continue
+            dra_id = users.get(data["identifier"])
+            if dra_id is None:
+                self.errors.append(
+                    {"row": excel_row, "error": f"User '{data['identifier']}' not found"}
+                )
+                continue
+            payments.append(Payment(
+                bill_id=bill_id,
+                dra_id=dra_id,
+                amount=data["amount"],
+                created_at=data["payment_date"],
+                cheque_number=data["cheque_number"],
+                cheque_date=data["cheque_date"],
+                payment_method=self.PAYMENT_METHOD,
+            ))
+
+        if not payments:
+            return 0
+        try:
+            with transaction.atomic():
+                Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+                bump_versions(versions.PAYMENTS)
+                record_payments(payments)
+                apply_payment_balances(payments)
+        except DatabaseError as e:
+            self.errors.append({
+                "row": batch[0][0],
+                "error": f"Database error in rows {batch[0][0]}–{batch[-1][0]}: {str(e)}",
+            })
+            return 0
+        self.imported += len(payments)
+        return len(payments)
+
+    # ─── lookups (one query each per batch) ──────────────────────────────────
+    @staticmethod
+    def _load_bills(numbers):
+        return dict(
+            Bill.objects.filter(invoice_number__in=numbers)
+            .values_list("invoice_number", "id")
+        )
+
+    @staticmethod
+    def _load_users(identifiers):
+        by_username, by_email = {}, {}
+        matches = User.objects.filter(
+            Q(username__in=identifiers) | Q(email__in=identifiers)
+        ).order_by("pk").values_list("id", "username", "email")
+        for pk, username, email in matches:
+            by_username.setdefault(username, pk)
+            by_email.setdefault(email, pk)
+        # username wins over e-mail, exactly like the old two-step lookup
+        return {
+            ident: by_username.get(ident) or by_email.get(ident)
+            for ident in identifiers
+        }
+
+    # ─── row parsing ─────────────────────────────────────────────────────────
+    @staticmethod
+    def parse_date_value(raw):
+        if isinstance(raw, pd.Timestamp):
+            return raw.to_pydatetime()
+        if isinstance(raw, datetime.datetime):
+            return raw
+        if isinstance(raw, datetime.date):
+            return timezone.datetime(
+                raw.year, raw.month, raw.day,
+                tzinfo=timezone.get_current_timezone(),
+            )
+        parsed = parse_date(str(raw))
+        if parsed:
+            # convert date → datetime at midnight
+            return timezone.datetime(
+                parsed.year, parsed.month, parsed.day,
+                tzinfo=timezone.get_current_timezone(),
+            )
+        # Fallback: let pandas parse
+        try:
+            return pd.to_datetime(str(raw))
+        except Exception:
+            return None
+
+    @classmethod
+    def parse_row(cls, row):
+        # Invoice Number
+        raw_inv = row.get("Invoice Number")
+        if is_blank(raw_inv):
+            raise ValueError("Invoice Number is blank")
+        invoice_number = str(raw_inv).strip()
+
+        # Payment Amount → numeric
+        raw_amt = row.get("Payment Amount")
+        if is_blank(raw_amt):
+            raise ValueError("Payment Amount is blank")
+        try:
+            amount = to_decimal(raw_amt)
+        except ValueError:
+            raise ValueError(f"Invalid Payment Amount: '{raw_amt}'")
+
+        # Username (or e-mail) of the paying DRA
+        raw_user = row.get("Username")
+        if is_blank(raw_user):
+            raise ValueError("Username is blank")
+        identifier = str(raw_user).strip()
+
+        # Payment Date
+        raw_date = row.get("Payment Date")
+        if is_blank(raw_date):
+            raise ValueError("Payment Date is blank")
+        payment_date = cls.parse_date_value(raw_date)
+        if not payment_date:
+            raise ValueError(f"Invalid Payment Date: '{raw_date}'")
+
+        # Optional: Cheque # and Cheque Date
+        raw_chq = row.get("Cheque #")
+        cheque_number = None if is_blank(raw_chq) else str(raw_chq).strip()
+
+        cheque_date = None
+        raw_chq_date = row.get("Cheque Date")
+        if not is_blank(raw_chq_date):
+            parsed_chq = cls.parse_date_value(raw_chq_date)
+            cheque_date = parsed_chq.date() if parsed_chq else None
+
+        return {
+            "invoice_number": invoice_number,
+            "amount":         amount,
+            "identifier":     identifier,
+            "payment_date":   payment_date,
+            "cheque_number":  cheque_number,
+            "cheque_date":    cheque_date,
+        }
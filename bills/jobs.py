@@ -0,0 +1,182 @@
+# bills/jobs.py
+"""
+Local worker pool for ImportJob (no external broker).
+
+Jobs run on a process-wide ThreadPoolExecutor. A job is *claimed* with a
+conditional UPDATE that stores a fresh lease token, so with several WSGI
+workers only one of them runs it. Every batch is committed together with
+the job's progress (`last_row`, counters, errors, heartbeat), and only while
+the job still carries this worker's lease; a job whose heartbeat goes stale
+– its worker died, the server restarted, or one batch ran past
+IMPORT_JOB_STALE_AFTER – is claimed again under a new lease and resumes
+after `last_row`, and the old worker's next commit rolls back with
+LeaseLost instead of importing the same rows a second time.
+
+Nothing in a web worker runs until it next submits a job, so the
+`resume_import_jobs` cron entry (settings.CRONJOBS, every five minutes)
+is what picks orphaned jobs up after a restart.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .excel import ExcelRowReader
+from .importers import BillImporter, PaymentImporter
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_STALE_AFTER = 300  # seconds without a heartbeat before a job is reclaimed
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def stale_after():
+    return timedelta(seconds=getattr(settings, "IMPORT_JOB_STALE_AFTER", DEFAULT_STALE_AFTER))
+
+
+def get_executor():
+    """The process-wide pool; created (and orphaned jobs resumed) on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMPORT_JOB_WORKERS", DEFAULT_WORKERS),
+                thread_name_prefix="import-job",
+            )
+            created = True
+        else:
+            created = False
+    if created:
+        resume_stale_jobs()
+    return _executor
+
+
+def submit(job):
+    """Queue `job` once the surrounding transaction (if any) has committed."""
+    transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+
+
+def resumable_jobs():
+    """Queued jobs, plus running jobs whose worker stopped heart-beating."""
+    cutoff = timezone.now() - stale_after()
+    return ImportJob.objects.filter(
+        Q(status=ImportJob.STATUS_QUEUED)
+        | Q(status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+        | Q(status=ImportJob.STATUS_RUNNING, heartbeat_at__isnull=True)
+    )
+
+
+def resume_stale_jobs():
+    pks = list(resumable_jobs().values_list("pk", flat=True))
+    for pk in pks:
+        get_executor().submit(run_job, pk)
+    return pks
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed by another worker; stop without committing."""
+
+
+def claim(pk):
+    """Atomically mark the job running; its new lease token, or None if another worker owns it."""
+    now = timezone.now()
+    lease = uuid.uuid4()
+    claimed = resumable_jobs().filter(pk=pk).update(
+        status=ImportJob.STATUS_RUNNING, heartbeat_at=now, lease=lease
+    )
+    if not claimed:
+        return None
+    ImportJob.objects.filter(pk=pk, started_at__isnull=True).update(started_at=now)
+    return lease
+
+
+def _owned(job):
+    """The job row, if `job.lease` still owns it."""
+    return ImportJob.objects.filter(pk=job.pk, lease=job.lease)
+
+
+def make_importer(job):
+    if job.kind == ImportJob.KIND_BILLS:
+        return BillImporter(), BillImporter.HEADER_MAP
+    return PaymentImporter(), None
+
+
+def run_job(pk):
+    """Worker entry point: stream the job's sheet from `last_row` onwards."""
+    close_old_connections()
+    try:
+        lease = claim(pk)
+        if lease is None:
+            return
+        job = ImportJob.objects.get(pk=pk)
+        try:
+            _process(job)
+        except LeaseLost:
+            logger.warning("Import job %s was reclaimed by another worker", pk)
+        except Exception as e:
+            logger.exception("Import job %s failed", pk)
+            _owned(job).update(
+                status=ImportJob.STATUS_FAILED,
+                failure=str(e),
+                finished_at=timezone.now(),
+            )
+    finally:
+        connection.close()
+
+
+def _process(job):
+    importer, header_map = make_importer(job)
+    with job.file.open("rb") as fh:
+        reader = ExcelRowReader(fh, header_map=header_map)
+        rows = (item for item in reader if item[0] > job.last_row)
+        batch = []
+        for item in rows:
+            batch.append(item)
+            if len(batch) >= importer.batch_size:
+                _commit_batch(job, importer, batch)
+                batch = []
+        if batch:
+            _commit_batch(job, importer, batch)
+
+    job.status = ImportJob.STATUS_COMPLETED
+    job.finished_at = timezone.now()
+    if not _owned(job).update(status=job.status, finished_at=job.finished_at):
+        raise LeaseLost()
+
+
+def _commit_batch(job, importer, batch):
+    """
+    Import one batch and record the progress in the same transaction,
+    provided the job still carries `job.lease`; otherwise roll the batch
+    back and raise LeaseLost.
+    """
+    with transaction.atomic():
+        # lock the job row: a concurrent claim waits for this batch to commit
+        if not _owned(job).select_for_update().exists():
+            raise LeaseLost()
+        imported = importer.import_batch(batch)
+        progress = {
+            "last_row":       batch[-1][0],
+            "rows_processed": job.rows_processed + len(batch),
+            "imported":       job.imported + imported,
+            "errors":         job.errors + sorted(importer.errors, key=lambda e: e["row"]),
+            "heartbeat_at":   timezone.now(),
+        }
+        if not _owned(job).update(**progress):
+            raise LeaseLost()
+    for name, value in progress.items():
+        setattr(job, name, value)
+    # the job row now holds them; keep the importer's memory flat
+    importer.errors = []
+    if isinstance(importer, BillImporter):
+        importer.imported.clear()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bills import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the memory-mapped reference snapshot (routes, outlets, "
+        "agents) at REFERENCE_SNAPSHOT_PATH and swap it in atomically."
+    )
+
+    def handle(self, *args, **opts):
+        path = snapshots.snapshot_path()
+        if not path:
+            raise CommandError("REFERENCE_SNAPSHOT_PATH is not set.")
+        snapshot = snapshots.regenerate(path)
+        counts = ", ".join(f"{len(table)} {name}" for name, table in snapshot.tables.items())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path} ({counts})."))
@@ -0,0 +1,152 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bills.dateranges import filter_local_dates
+from bills.models import AssignmentTombstone, Bill
+from payments.models import Payment
+
+
+# vendor → (explain() format, pattern of a full scan of `{table}`)
+FULL_SCAN_PATTERNS = {
+    # "SCAN bills_bill" reads every row, with or without "USING INDEX …"
+    # (that only walks them in index order); "SEARCH …" seeks
+    "sqlite":     (None,   r"\bSCAN {table}\b"),
+    # a full index walk is an Index Scan with no Index Cond (see below)
+    "postgresql": (None,   r"\bSeq Scan on {table}\b"),
+    "mysql":      ("TREE", r"\b(?:Table|Index) scan on {table}\b"),
+}
+PG_INDEX_SCAN = r"\bIndex (?:Only )?Scan(?: Backward)? using \S+ on {table}\b"
+
+
+def pg_full_index_scan(plan, table):
+    """Whether a PostgreSQL plan walks an index of `table` without a condition."""
+    lines = plan.splitlines()
+    for i, line in enumerate(lines):
+        if not re.search(PG_INDEX_SCAN.format(table=table), line):
+            continue
+        details = []
+        for detail in lines[i + 1:]:
+            if "->" in detail:
+                break
+            details.append(detail)
+        if not any("Index Cond:" in detail for detail in details):
+            return True
+    return False
+
+
+def stops_at_limit(qs):
+    """
+    An unfiltered, ordered, sliced query: a full scan in index order stops
+    after LIMIT rows (e.g. the first page of the bill list), so it is fine.
+    A filtered one may walk the whole index before it finds them.
+    """
+    query = qs.query
+    return bool(query.is_sliced and query.order_by and not query.where)
+
+
+def full_scan(vendor, pattern, qs, plan):
+    """Whether `plan` (of `qs`) reads its main table or index end to end."""
+    if stops_at_limit(qs):
+        return False
+    table = re.escape(qs.model._meta.db_table)
+    if re.search(pattern.format(table=table), plan):
+        return True
+    return vendor == "postgresql" and pg_full_index_scan(plan, table)
+
+
+def hot_queries():
+    """
+    (label, queryset) for the list, export and report queries of
+    bills/views.py, payments/views.py and save_daily_payment_summary,
+    built the way those views build them.
+    """
+    today = timezone.localdate()
+    month_ago = today - timedelta(days=30)
+    payments = Payment.objects.all()
+
+    return [
+        ("bill list (-created_at)",
+         Bill.objects.order_by("-created_at", "-pk")[:10]),
+        ("bill list cursor seek",
+         Bill.objects.filter(created_at__lt=timezone.now()).order_by("-created_at", "-pk")[:10]),
+        ("bill list ?min_overdue=90",
+         Bill.objects.min_overdue(90).order_by("-created_at")[:10]),
+        ("my assignments",
+         Bill.objects.filter(assigned_to_id=1, status=Bill.STATUS_OPEN)
+         .order_by("outlet__route__name")[:25]),
+        ("my assignments ?ordering=-overdue_days",
+         Bill.objects.filter(assigned_to_id=1, status=Bill.STATUS_OPEN)
+         .order_by("invoice_date", "pk")[:25]),
+        ("my assignments sync (changed since token)",
+         Bill.objects.filter(assigned_to_id=1, updated_at__gte=timezone.now())),
+        ("my assignments sync (tombstones since token)",
+         AssignmentTombstone.objects.filter(dra_id=1, created_at__gte=timezone.now())),
+        ("bill export (invoice_date range)",
+         Bill.objects.filter(invoice_date__gte=month_ago, invoice_date__lte=today)
+         .values_list("pk", "invoice_date", "outlet__route__name")),
+        ("bill payments",
+         Payment.objects.filter(bill_id=1, dra_id=1).order_by("-created_at")),
+        ("payment list (date range)",
+         filter_local_dates(payments, "created_at", month_ago, today)
+         .order_by("-created_at")[:10]),
+        ("payment export (date range)",
+         filter_local_dates(payments, "created_at", month_ago, today)
+         .values_list("bill__pk", "amount", "dra__username")),
+        ("daily summary backfill (date range)",
+         filter_local_dates(payments, "created_at", month_ago, today)
+         .annotate(day=TruncDate("created_at"))
+         .values("day", "payment_method").annotate(total=Sum("amount")).order_by()),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot list/export/report queries and fail if any of them "
+        "reads its main table (or a whole index of it) instead of seeking "
+        "an index. Unfiltered first pages that stop at their LIMIT pass."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan of every query.",
+        )
+
+    def handle(self, *args, **opts):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(f"No plan check for the '{vendor}' backend.")
+        explain_format, pattern = FULL_SCAN_PATTERNS[vendor]
+
+        failures = []
+        with transaction.atomic():
+            if vendor == "postgresql":
+                # small/dev tables make a seq scan the cheapest plan; ask
+                # whether an index *can* serve the query instead
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for label, qs in hot_queries():
+                plan = qs.explain(format=explain_format)
+                scans = full_scan(vendor, pattern, qs, plan)
+
+                if scans:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"SCAN   {label}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"index  {label}"))
+                if scans or opts["verbose_plans"]:
+                    self.stdout.write("    " + plan.replace("\n", "\n    "))
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} query(s) scan their table: {', '.join(failures)}"
+            )
+        self.stdout.write(self.style.SUCCESS("All checked queries use an index."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bills.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete assignment tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS; "
+        "devices with older sync tokens get a full resync instead."
+    )
+
+    def handle(self, *args, **opts):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} assignment tombstones."))
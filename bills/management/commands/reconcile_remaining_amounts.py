@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bills.models import Bill
+from bills import versions
+from bills.versions import bump_versions
+from bills.worklists import invalidate_bill_worklists
+from payments.models import Payment
+
+
+ZERO = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Detect (and repair) drift between Bill.remaining_amount and "
+        "opening_amount (actual_amount, or the imported outstanding amount) "
+        "minus the sum of its payments, across all bills, with one grouped query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted bills; do not update them.",
+        )
+
+    def handle(self, *args, **opts):
+        # 1) One GROUP BY over bills ⟕ payments: expected balance per bill,
+        #    keeping only the rows where the stored ledger disagrees.
+        drifted = list(
+            Bill.objects
+            .annotate(paid=Coalesce(Sum("user_payments__amount"), ZERO))
+            .annotate(expected=F("opening_amount") - F("paid"))
+            .exclude(remaining_amount=F("expected"))
+            .values_list("pk", "remaining_amount", "expected")
+        )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("No remaining_amount drift found."))
+            return
+
+        for pk, stored, expected in drifted[:20]:
+            self.stdout.write(f"Bill {pk}: stored {stored}, expected {expected}")
+        if len(drifted) > 20:
+            self.stdout.write(f"… and {len(drifted) - 20} more")
+
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING(
+                f"{len(drifted)} bills have drifted (dry run, nothing changed)."
+            ))
+            return
+
+        # 2) Repair with a correlated subquery so the balance is recomputed
+        #    inside the UPDATE itself (payments arriving meanwhile are counted).
+        paid_sq = (
+            Payment.objects.filter(bill=OuterRef("pk"))
+            .values("bill")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        ids = [pk for pk, _, _ in drifted]
+        with transaction.atomic():
+            fixed = Bill.objects.filter(pk__in=ids).update(
+                remaining_amount=F("opening_amount") - Coalesce(Subquery(paid_sq), ZERO),
+                updated_at=timezone.now(),
+            )
+            # keep status consistent with the repaired balance, both ways
+            now = timezone.now()
+            cleared = (
+                Bill.objects.filter(pk__in=ids, remaining_amount__lte=0)
+                .exclude(status=Bill.STATUS_CLEARED)
+                .update(status=Bill.STATUS_CLEARED, cleared_at=now, updated_at=now)
+            )
+            reopened = (
+                Bill.objects.filter(pk__in=ids, remaining_amount__gt=0, status=Bill.STATUS_CLEARED)
+                .update(status=Bill.STATUS_OPEN, cleared_at=None, updated_at=now)
+            )
+            invalidate_bill_worklists(ids)
+            bump_versions(versions.BILLS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired remaining_amount on {fixed} bills "
+            f"({cleared} newly cleared, {reopened} reopened)."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bills import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Resume queued import jobs and running jobs whose worker died, "
+        "continuing each one after its last committed batch. Blocks until "
+        "they finish."
+    )
+
+    def handle(self, *args, **opts):
+        pks = list(jobs.resumable_jobs().values_list("pk", flat=True))
+        executor = jobs.get_executor()  # first use submits every resumable job
+        executor.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed import jobs: {pks or 'none pending'}"
+        ))
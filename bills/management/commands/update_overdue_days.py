@@ -1,16 +1,56 @@
+import time
+
 from django.core.management.base import BaseCommand
+from django.db.models import Max, Min, Q
 from django.utils import timezone
+
+from bills.expressions import overdue_days_expression
 from bills.models import Bill
 
+
 class Command(BaseCommand):
-    help = "Recalculate overdue_days for all open bills"
+    help = (
+        "Recalculate overdue_days for all open bills with set-based UPDATEs "
+        "(one per id chunk), touching only rows whose value changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Bill ids covered by each UPDATE statement (default 10000).",
+        )
 
     def handle(self, *args, **opts):
+        started = time.monotonic()
         today = timezone.localdate()
-        qs = Bill.objects.filter(status='open')
-        for bill in qs:
-            bill.overdue_days = (today - bill.created_at.date()).days
-            bill.save(update_fields=['overdue_days'])
+        chunk = max(opts["chunk_size"], 1)
+
+        open_bills = Bill.objects.filter(status=Bill.STATUS_OPEN)
+        bounds = open_bills.aggregate(lo=Min("pk"), hi=Max("pk"))
+        if bounds["lo"] is None:
+            self.stdout.write(self.style.SUCCESS("No open bills; nothing to update."))
+            return
+
+        # Same rule as Bill.save(): max((today − invoice_date).days, 0),
+        # evaluated by the database for every row of the chunk.
+        # updated_at is deliberately left alone: daily aging would otherwise
+        # put every open bill into each DRA's next delta sync.
+        overdue = overdue_days_expression(today)
+
+        updated = chunks = 0
+        for start in range(bounds["lo"], bounds["hi"] + 1, chunk):
+            updated += (
+                open_bills
+                .filter(pk__gte=start, pk__lt=start + chunk)
+                .filter(~Q(overdue_days=overdue))
+                .update(overdue_days=overdue)
+            )
+            chunks += 1
+
+        elapsed = time.monotonic() - started
         self.stdout.write(self.style.SUCCESS(
-            f"Updated {qs.count()} open bills’ overdue_days."
+            f"Updated overdue_days on {updated} open bills "
+            f"({chunks} chunks of {chunk} ids) in {elapsed:.2f}s."
         ))
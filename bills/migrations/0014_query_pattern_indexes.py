@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-17 05:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0013_bill_status_invoice_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(condition=models.Q(('status', 'open')), fields=['assigned_to', 'invoice_date'], name='bill_open_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['invoice_date'], name='bill_invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['created_at'], name='bill_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-17 07:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0014_query_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['assigned_to', 'updated_at'], name='bill_assignee_updated_idx'),
+        ),
+        migrations.CreateModel(
+            name='AssignmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bill_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignment_tombstones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dra', 'created_at'], name='tombstone_dra_created_idx')],
+            },
+        ),
+    ]
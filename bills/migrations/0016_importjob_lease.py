@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0015_bill_updated_at_assignmenttombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='lease',
+            field=models.UUIDField(blank=True, editable=False, help_text='token of the worker that currently owns the job', null=True),
+        ),
+    ]
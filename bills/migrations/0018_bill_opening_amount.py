@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 06:48
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_opening_amounts(apps, schema_editor):
+    """
+    The ledger so far: remaining_amount = opening − payments, where opening
+    was actual_amount or an imported sheet's outstanding amount. Recover it
+    as remaining_amount + payments, in one UPDATE.
+    """
+    Bill = apps.get_model("bills", "Bill")
+    Payment = apps.get_model("payments", "Payment")
+    paid = (
+        Payment.objects.filter(bill=OuterRef("pk"))
+        .order_by()
+        .values("bill")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    zero = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+    Bill.objects.update(opening_amount=models.F("remaining_amount") + Coalesce(Subquery(paid), zero))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0017_changecounter'),
+        ('payments', '0009_backfill_daily_payment_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='opening_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='balance before any recorded payment', max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='remaining_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='opening_amount minus all payments', max_digits=10),
+        ),
+        migrations.RunPython(backfill_opening_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 06:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0018_bill_opening_amount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['status', 'overdue_days'], name='bill_status_overdue_idx'),
+        ),
+    ]
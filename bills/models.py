@@ -1,9 +1,15 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from datetime import timedelta
 from decimal import Decimal
 
+from . import versions
+from .versions import bump_versions
+
 
 class Route(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -30,6 +36,42 @@ class Outlet(models.Model):
 
 
 
+class BillQuerySet(models.QuerySet):
+    """
+    Query-time overdue days, so lists don't depend on the nightly
+    update_overdue_days run.
+
+    Open bills age every day: their overdue days are computed in SQL from
+    invoice_date and the local date. Cleared bills keep the value frozen
+    in the overdue_days column when they were cleared.
+    """
+
+    def with_live_overdue(self, today=None):
+        """Annotate `live_overdue_days` (see Bill.current_overdue_days)."""
+        from .expressions import overdue_days_expression
+        today = today or timezone.localdate()
+        return self.annotate(live_overdue_days=models.Case(
+            models.When(status=Bill.STATUS_OPEN, then=overdue_days_expression(today)),
+            default=models.F('overdue_days'),
+            output_field=models.IntegerField(),
+        ))
+
+    def min_overdue(self, days, today=None):
+        """
+        Bills at least `days` overdue. For open bills this is rewritten as
+        `invoice_date <= today − days`, a plain range on the
+        (status, invoice_date) index rather than a per-row computation;
+        cleared bills are a range on (status, overdue_days). Both branches
+        name their status, so each can use its index.
+        """
+        today = today or timezone.localdate()
+        cutoff = today - timedelta(days=days)
+        return self.filter(
+            models.Q(status=Bill.STATUS_OPEN, invoice_date__lte=cutoff)
+            | models.Q(status=Bill.STATUS_CLEARED, overdue_days__gte=days)
+        )
+
+
 class Bill(models.Model):
     STATUS_OPEN = 'open'
     STATUS_CLEARED = 'cleared'
@@ -62,8 +104,41 @@ class Bill(models.Model):
     remaining_amount = models.DecimalField(
         max_digits=10, decimal_places=2,
         default=Decimal('0.00'),
-        help_text="actual_amount minus all payments"
+        help_text="opening_amount minus all payments"
     )
+    # the balance the ledger started from: actual_amount, or the sheet's
+    # outstanding amount for imported bills (payments made before the import)
+    opening_amount = models.DecimalField(
+        max_digits=12, decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="balance before any recorded payment"
+    )
+    # change tracking for delta sync (bills/sync.py); every write path,
+    # including queryset .update()s, bumps it
+    updated_at     = models.DateTimeField(auto_now=True)
+
+    objects = BillQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # live overdue sorting/filtering on open bills is an invoice_date
+            # range/ordering within one status (see BillQuerySet)
+            models.Index(fields=['status', 'invoice_date'], name='bill_status_invdate_idx'),
+            # ?min_overdue= on cleared bills: their frozen overdue_days
+            models.Index(fields=['status', 'overdue_days'], name='bill_status_overdue_idx'),
+            # my-assignments: a DRA's open bills only (cleared ones never match)
+            models.Index(
+                fields=['assigned_to', 'invoice_date'],
+                name='bill_open_assignee_idx',
+                condition=models.Q(status='open'),
+            ),
+            # export date ranges (no status filter)
+            models.Index(fields=['invoice_date'], name='bill_invoice_date_idx'),
+            # bill list default ordering / keyset seek on (created_at, id)
+            models.Index(fields=['created_at'], name='bill_created_at_idx'),
+            # delta sync: a DRA's bills changed since the client's token
+            models.Index(fields=['assigned_to', 'updated_at'], name='bill_assignee_updated_idx'),
+        ]
 
 
     def save(self, *args, **kwargs):
@@ -74,19 +149,25 @@ class Bill(models.Model):
         if is_new:
             # first save to get a PK
             super().save(*args, **kwargs)
-            self.remaining_amount = self.actual_amount
+            self.remaining_amount = self.opening_amount = self.actual_amount
             # also calc overdue_days for initial state
             delta = (today - self.invoice_date).days
             self.overdue_days = max(delta, 0)
+            if self.assigned_to_id:
+                from .worklists import invalidate_worklists
+                invalidate_worklists([self.assigned_to_id])
             # finally write those two fields
             return Bill.objects.filter(pk=self.pk).update(
                 remaining_amount=self.remaining_amount,
-                overdue_days=self.overdue_days
+                opening_amount=self.opening_amount,
+                overdue_days=self.overdue_days,
+                updated_at=self.updated_at,
             )
 
-        # ——— 2) on update: recalc overdue_days and remaining_amount ———
-        # fetch previous status
-        prev_status = Bill.objects.only('status').get(pk=self.pk).status
+        # ——— 2) on update: recalc overdue_days; shift remaining_amount ———
+        # fetch previous status / amount
+        prev = Bill.objects.only('status', 'actual_amount', 'assigned_to').get(pk=self.pk)
+        prev_status = prev.status
 
         # overdue_days logic
         if self.status == self.STATUS_OPEN:
@@ -99,18 +180,55 @@ class Bill(models.Model):
                 self.cleared_at = timezone.now()
         # else already cleared: leave overdue_days/cleared_at intact
 
-        # initial save so we have a PK and timestamps right
+        # the column is current again; drop a stale with_live_overdue() value
+        self.__dict__.pop('live_overdue_days', None)
+
+        # remaining_amount / opening_amount are a ledger kept by the payment
+        # signals (payments.models.apply_balance_delta) and the amount shift
+        # below; never overwrite them with possibly stale in-memory values
+        # unless the caller asks to.
+        update_fields = kwargs.get('update_fields')
+        saves_amount = update_fields is None or 'actual_amount' in update_fields
+        saves_assignee = update_fields is None or {'assigned_to', 'assigned_to_id'} & set(update_fields)
+        if update_fields is None:
+            kwargs['update_fields'] = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('remaining_amount', 'opening_amount')
+            ]
+        elif 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
         super().save(*args, **kwargs)
 
-        # now safely aggregate payments to recalc remaining_amount
-        paid = (
-            self.user_payments.aggregate(total=Sum('amount'))['total']
-            or Decimal('0.00')
+        # taken off a DRA's worklist: leave a tombstone for their next sync
+        if saves_assignee and prev.assigned_to_id and prev.assigned_to_id != self.assigned_to_id:
+            AssignmentTombstone.objects.create(bill_id=self.pk, dra_id=prev.assigned_to_id)
+
+        # the cached worklists this bill is (or was) on
+        from .worklists import invalidate_worklists
+        invalidate_worklists([prev.assigned_to_id, self.assigned_to_id])
+
+        # an edited invoice amount moves the balance by the same difference,
+        # through the payment ledger so crossing zero flips the status too
+        # (raised: a cleared bill reopens; lowered below what was paid: it clears)
+        amount_change = (
+            Decimal(str(self.actual_amount)) - prev.actual_amount if saves_amount else 0
         )
-        new_rem = self.actual_amount - paid
+        if amount_change:
+            from payments.models import apply_balance_delta
+            Bill.objects.filter(pk=self.pk).update(
+                opening_amount=F('opening_amount') + amount_change
+            )
+            apply_balance_delta(self.pk, -amount_change)
+            self.remaining_amount, self.opening_amount, self.status, self.cleared_at = (
+                Bill.objects.values_list(
+                    'remaining_amount', 'opening_amount', 'status', 'cleared_at'
+                ).get(pk=self.pk)
+            )
 
-        # update only remaining_amount (and overdue_days/cleared_at if needed)
-        Bill.objects.filter(pk=self.pk).update(remaining_amount=new_rem)
+    @property
+    def current_overdue_days(self):
+        """The live value when annotated by with_live_overdue(), else the stored one."""
+        return getattr(self, 'live_overdue_days', self.overdue_days)
 
     @property
     def route(self):
@@ -120,4 +238,152 @@ class Bill(models.Model):
         return f'{self.outlet} #{self.invoice_number}'
 
 
+class AssignmentTombstone(models.Model):
+    """
+    A bill that left a DRA's worklist (reassigned, unassigned or deleted).
+    Delta sync (bills/sync.py) reports these as removed; rows older than
+    SYNC_TOMBSTONE_RETENTION_DAYS are purged and older tokens get a full
+    resync instead.
+    """
+    bill_id    = models.BigIntegerField()  # plain id: the bill may be gone
+    dra        = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   on_delete=models.CASCADE,
+                                   related_name='assignment_tombstones')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dra', 'created_at'], name='tombstone_dra_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'bill {self.bill_id} left {self.dra_id}'
+
+
+class ChangeCounter(models.Model):
+    """
+    A named counter bumped on every write to what it covers (a table, a
+    DRA's worklist…), in the database so every worker process and
+    management command sees the same value. See bills/versions.py.
+    """
+    name        = models.CharField(max_length=64, primary_key=True)
+    value       = models.BigIntegerField()
+    modified_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} = {self.value}'
+
+
+def record_unassignments(bills_qs, new_assignee_id=None):
+    """Tombstones for every assigned bill in `bills_qs` moving off its DRA."""
+    moved = bills_qs.exclude(assigned_to__isnull=True)
+    if new_assignee_id is not None:
+        moved = moved.exclude(assigned_to_id=new_assignee_id)
+    AssignmentTombstone.objects.bulk_create([
+        AssignmentTombstone(bill_id=pk, dra_id=dra_id)
+        for pk, dra_id in moved.values_list('pk', 'assigned_to_id')
+    ])
+
+
+@receiver(post_delete, sender=Bill)
+def tombstone_deleted_bill(sender, instance, **kwargs):
+    if instance.assigned_to_id:
+        AssignmentTombstone.objects.create(bill_id=instance.pk, dra_id=instance.assigned_to_id)
+        from .worklists import invalidate_worklists
+        invalidate_worklists([instance.assigned_to_id])
 
+
+@receiver([post_save, post_delete], sender=Route)
+def bump_routes_version(sender, **kwargs):
+    bump_versions(versions.ROUTES)
+
+
+@receiver([post_save, post_delete], sender=Outlet)
+def bump_outlets_version(sender, **kwargs):
+    bump_versions(versions.OUTLETS)
+
+
+@receiver([post_save, post_delete], sender=Bill)
+def bump_bills_version(sender, **kwargs):
+    # queryset .update() paths call bump_versions() themselves
+    bump_versions(versions.BILLS)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=Outlet)
+def invalidate_all_worklists(sender, created, **kwargs):
+    # worklist rows carry route / outlet names (a route / outlet with bills
+    # can't be deleted: Bill.outlet is PROTECT)
+    if not created and not kwargs.get('raw'):
+        from .worklists import bump_worklist_generation
+        bump_worklist_generation()
+
+
+
+
+
+class ImportJob(models.Model):
+    """
+    A spreadsheet import running in the background worker pool
+    (see bills/jobs.py). Progress is committed together with every batch,
+    so `last_row` always points at the last sheet row that is safely in
+    the database and a restarted job resumes right after it.
+    """
+    KIND_BILLS = 'bills'
+    KIND_PAYMENTS = 'payments'
+    KIND_CHOICES = (
+        (KIND_BILLS, 'Bills'),
+        (KIND_PAYMENTS, 'Payments'),
+    )
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    kind           = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status         = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                                      default=STATUS_QUEUED)
+    file           = models.FileField(upload_to='imports/')
+    created_by     = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                       null=True, blank=True,
+                                       on_delete=models.SET_NULL)
+    last_row       = models.PositiveIntegerField(
+        default=0, help_text="last sheet row committed to the database"
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    imported       = models.PositiveIntegerField(default=0)
+    errors         = models.JSONField(default=list, blank=True)
+    failure        = models.TextField(blank=True, default="")
+    created_at     = models.DateTimeField(auto_now_add=True)
+    started_at     = models.DateTimeField(null=True, blank=True)
+    lease          = models.UUIDField(
+        null=True, blank=True, editable=False,
+        help_text="token of the worker that currently owns the job",
+    )
+    heartbeat_at   = models.DateTimeField(null=True, blank=True)
+    finished_at    = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at or not self.rows_processed:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f'{self.get_kind_display()} import #{self.pk} ({self.status})'
@@ -1,6 +1,16 @@
 # bills/pagination.py
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class BillPagination(PageNumberPagination):
     """
@@ -11,3 +21,189 @@ class BillPagination(PageNumberPagination):
     page_size_query_param = 'limit'       # ?limit=<m> overrides page_size
     page_query_param = 'page'             # ?page=<n> picks the page
     max_page_size = 100                   # never allow more than 100 at once
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination: no OFFSET and, unless asked for, no COUNT(*).
+
+    The page is keyed on the queryset's own ordering (e.g. `-created_at` or
+    whatever `?ordering=` the view applied), with the primary key appended
+    as a tie-breaker so every cursor names exactly one position. The next
+    page is fetched with
+        WHERE (a > x) OR (a = x AND b > y) …   ORDER BY a, b … LIMIT n+1
+    which stays index-friendly however deep the client pages.
+
+    Clients start with ?pagination=cursor (or an empty ?cursor=) and then
+    follow `next`. ?limit=<m> sets the page size, ?count=true adds the
+    total (one extra COUNT query).
+
+    Response:
+      {"next": <url|null>, "next_cursor": <str|null>, "results": [...]}
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    default_ordering = ('-created_at',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or params.get(cls.mode_query_param) == 'cursor'
+
+    # ─── ordering / cursor encoding ─────────────────────────────────────────
+    def get_ordering(self, queryset):
+        ordering = [o for o in queryset.query.order_by if isinstance(o, str)]
+        if not ordering:
+            ordering = list(queryset.model._meta.ordering) or list(self.default_ordering)
+        if not any(o.lstrip('-') in ('pk', 'id') for o in ordering):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    @staticmethod
+    def _to_json(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _value_of(obj, field):
+        if isinstance(obj, dict):
+            return obj[field]
+        for part in field.split('__'):
+            obj = getattr(obj, part)
+        return obj
+
+    def encode_cursor(self, ordering, values):
+        payload = json.dumps({'o': ordering, 'v': [self._to_json(v) for v in values]})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token, ordering):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values = payload['v']
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if payload.get('o') != ordering or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def seek_filter(ordering, values):
+        """(a > x) OR (a = x AND b > y) OR …, honouring each field's direction."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    # ─── BasePagination API ─────────────────────────────────────────────────
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        self.count = None
+        if request.query_params.get('count') in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            values = self.decode_cursor(token, self.ordering)
+            try:
+                queryset = queryset.filter(self.seek_filter(self.ordering, values))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+
+        self.next_cursor = None
+        if self.has_next and rows:
+            last = rows[-1]
+            values = [self._value_of(last, f.lstrip('-')) for f in self.ordering]
+            self.next_cursor = self.encode_cursor(self.ordering, values)
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'limit': self.page_size_value,
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'limit': {'type': 'integer'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class AssignmentKeysetPagination(KeysetPagination):
+    # my-assignments-flat has always defaulted to 25 bills per page
+    page_size = 25
+
+
+class KeysetModeMixin:
+    """
+    For generic list views: keep the regular `pagination_class`, but switch to
+    `keyset_pagination_class` when the client asks for cursor paging
+    (?pagination=cursor or ?cursor=…).
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.keyset_pagination_class and self.keyset_pagination_class.requested(self.request):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def uses_keyset(self):
+        return isinstance(self.paginator, KeysetPagination)
+
+    def keyset_list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
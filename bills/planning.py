@@ -0,0 +1,231 @@
+# bills/planning.py
+"""
+Query planning from serializer field sources.
+
+A serializer that reads `outlet.route.name` or `assigned_to.username` from
+every row turns an unjoined list into one query per row and relation.
+plan_queryset() walks the serializer's (readable) field sources against the
+model metadata and applies the matching
+
+  • select_related()  for forward FK / one-to-one hops,
+  • prefetch_related() for to-many relations,
+  • only()            for the columns actually read (on safe requests).
+
+Sources that are not model fields (properties, methods) can't be mapped to
+columns; unless the serializer declares them in `Meta.source_columns`
+(`{"current_overdue_days": ("overdue_days",)}`), the whole model at that
+path is loaded.
+
+LazyLoadCheckingListSerializer (set as `Meta.list_serializer_class`) logs a
+warning in DEBUG when rendering a list still runs queries, i.e. some
+relation or deferred column was loaded lazily per row.
+"""
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import RelatedField
+
+from .fieldsets import requested_fields
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlan:
+    """select_related / prefetch_related / only() lookups for one serializer."""
+
+    def __init__(self, select=(), prefetch=(), columns=(), complete=True):
+        self.select = tuple(sorted(select))
+        self.prefetch = tuple(sorted(prefetch))
+        self.columns = tuple(sorted(columns))
+        # False when a source on the root model couldn't be mapped to columns
+        self.complete = complete
+
+    def apply(self, queryset, restrict_columns=True):
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        if restrict_columns and self.complete and self.columns:
+            if queryset.query.select_related is True:
+                return queryset  # select_related() with no fields: can't narrow
+            # relations the view already joins must not be deferred
+            columns = set(self.columns) | set(_joined_paths(queryset.query.select_related))
+            # ordering values are read back from the last row by keyset
+            # pagination, so they must be loaded (and joined) too
+            for name in (o.lstrip('-') for o in queryset.query.order_by if isinstance(o, str)):
+                if name == 'pk' or name in queryset.query.annotations:
+                    continue
+                relations = _relation_prefixes(queryset.model, name)
+                if relations is None:
+                    continue
+                if relations:
+                    queryset = queryset.select_related(relations[-1])
+                columns.update(relations)
+                columns.add(name)
+            queryset = queryset.only(*columns)
+        return queryset
+
+
+def _joined_paths(select_related, prefix=()):
+    """'outlet', 'outlet__route', … from Query.select_related's nested dict."""
+    if not isinstance(select_related, dict):
+        return
+    for name, nested in select_related.items():
+        path = (*prefix, name)
+        yield '__'.join(path)
+        yield from _joined_paths(nested, path)
+
+
+def _relation_prefixes(model, lookup):
+    """
+    ['outlet', 'outlet__route'] for 'outlet__route__name': the forward
+    relations a lookup crosses, or None if it isn't a plain field path.
+    """
+    parts = lookup.split('__')
+    prefixes = []
+    for depth, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if depth == len(parts) - 1:
+            return prefixes
+        if not (field.many_to_one or field.one_to_one) or field.auto_created:
+            return None
+        prefixes.append('__'.join(parts[:depth + 1]))
+        model = field.related_model
+    return prefixes
+
+
+def _join(path, name):
+    return '__'.join([*path, name])
+
+
+def _all_columns(model, path):
+    return {_join(path, f.name) for f in model._meta.concrete_fields}
+
+
+@lru_cache(maxsize=None)
+def plan_for(serializer_class, field_names=None):
+    """
+    Build (and cache) the QueryPlan for a ModelSerializer class, limited to
+    `field_names` (a tuple, see bills.fieldsets) when given.
+    """
+    serializer = serializer_class()
+    meta = serializer.Meta
+    root = meta.model
+    extra = getattr(meta, 'source_columns', {})
+
+    select, prefetch = set(), set()
+    columns = {root._meta.pk.name}
+    complete = True
+
+    for name, field in serializer.fields.items():
+        if field.write_only or (field_names is not None and name not in field_names):
+            continue
+        if field.source == '*':
+            complete = False
+            continue
+
+        model, path = root, []
+        for depth, attr in enumerate(field.source_attrs):
+            last = depth == len(field.source_attrs) - 1
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                declared = extra.get(field.source) if not path else None
+                if declared is not None:
+                    columns.update(_join(path, c) for c in declared)
+                elif path:
+                    columns.update(_all_columns(model, path))
+                else:
+                    complete = False
+                break
+
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.add(_join(path, attr))
+                break
+
+            if model_field.is_relation:
+                if last and isinstance(field, RelatedField) and field.use_pk_only_optimization():
+                    # PrimaryKeyRelatedField only reads the local <fk>_id
+                    columns.add(_join(path, attr))
+                    break
+                path = [*path, attr]
+                select.add('__'.join(path))
+                columns.add('__'.join(path))
+                model = model_field.related_model
+                if last:
+                    # the related object itself is rendered (str(), nested…)
+                    columns.update(_all_columns(model, path))
+                continue
+
+            columns.add(_join(path, attr))
+            break
+
+    return QueryPlan(select, prefetch, columns, complete)
+
+
+def plan_queryset(queryset, serializer_class, restrict_columns=True, field_names=None):
+    """Apply `serializer_class`'s QueryPlan (for `field_names`) to `queryset`."""
+    if field_names is not None:
+        field_names = tuple(field_names)
+    return plan_for(serializer_class, field_names).apply(queryset, restrict_columns)
+
+
+class QueryPlanMixin:
+    """
+    For generic views: plan the (filtered) queryset for the view's
+    serializer. Hooked into filter_queryset(), which list(), keyset_list()
+    and get_object() all go through. Columns are only restricted on safe
+    requests, so instances that are saved (PUT/PATCH) are fully loaded;
+    on those, ?fields= / ?omit= also prune what is joined and loaded.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, serializers.ModelSerializer):
+            return queryset
+        return plan_queryset(
+            queryset,
+            serializer_class,
+            restrict_columns=self.request.method in SAFE_METHODS,
+            field_names=requested_fields(self.request, serializer_class),
+        )
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class LazyLoadCheckingListSerializer(serializers.ListSerializer):
+    """ListSerializer that, in DEBUG, warns about per-row lazy loads."""
+
+    def to_representation(self, data):
+        if not settings.DEBUG:
+            return super().to_representation(data)
+
+        # evaluate the rows first: only queries *while rendering* count
+        rows = list(data.all() if isinstance(data, BaseManager) else data)
+        counter = _QueryCounter()
+        with connection.execute_wrapper(counter):
+            result = super().to_representation(rows)
+        if counter.count:
+            logger.warning(
+                "%s ran %d lazy-load queries rendering %d rows; "
+                "plan the queryset with bills.planning.plan_queryset().",
+                type(self.child).__name__, counter.count, len(rows),
+            )
+        return result
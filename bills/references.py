@@ -0,0 +1,247 @@
+# bills/references.py
+"""
+In-process cache of the reference tables: routes, outlets and users.
+
+They change rarely but are read on every request: the route / outlet /
+user endpoints list them, and PrimaryKeyRelatedField validation
+(`Outlet.objects.all()`, `User.objects.all()`) fetches a row per
+submitted id. Each process keeps a snapshot of every table, indexed by id
+and by name prefix for autocomplete.
+
+A snapshot is tagged with the change counters (bills.versions) of the
+tables it was built from. They are ChangeCounter rows in the database, so
+a read checks them with one query and rebuilds the table when any process
+(another worker, a management command, this one) changed it. The model signals that bump the counters are therefore
+the invalidation. Outlets depend on routes too, because each outlet holds
+its route for str().
+
+Instances handed out are shallow copies, so callers may mutate them.
+
+With settings.REFERENCE_SNAPSHOT_PATH set, the tables are read instead
+from the memory-mapped snapshot file that all workers share
+(bills.snapshots). Instances are then built per read, with only the
+snapshot's columns loaded (the rest deferred). That table holds agents
+only, so other user ids are validated against the database.
+"""
+import bisect
+import copy
+import threading
+
+from django.contrib.auth import get_user_model
+from django.http import Http404
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from . import snapshots, versions
+from .models import Outlet, Route
+
+_lock = threading.Lock()
+_snapshots = {}
+
+
+class ReferenceTable:
+    """One table's rows (in list order), id map and name-prefix index."""
+
+    def __init__(self, rows, name_attr="name"):
+        self.rows = rows
+        self.by_id = {row.pk: row for row in rows}
+        # (casefolded name, id) sorted: a prefix is a contiguous range
+        self.index = sorted(
+            ((getattr(row, name_attr) or "").casefold(), row.pk) for row in rows
+        )
+
+    def get(self, pk):
+        row = self.by_id.get(pk)
+        return None if row is None else copy.copy(row)
+
+    def autocomplete(self, prefix, limit=10):
+        """Rows whose name starts with `prefix` (case-insensitive), by name."""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.index, (prefix,))
+        matches = []
+        for name, pk in self.index[start:]:
+            if not name.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(self.by_id[pk])
+        return matches
+
+
+def _load_routes():
+    return ReferenceTable(list(Route.objects.order_by("name")))
+
+
+def _load_outlets():
+    return ReferenceTable(list(Outlet.objects.select_related("route").order_by("route__name", "name")))
+
+
+def _load_users():
+    return ReferenceTable(list(get_user_model().objects.order_by("pk")), name_attr="username")
+
+
+# table → (counters it depends on, loader)
+TABLES = {
+    versions.ROUTES:  ((versions.ROUTES,), _load_routes),
+    versions.OUTLETS: ((versions.OUTLETS, versions.ROUTES), _load_outlets),
+    versions.USERS:   ((versions.USERS,), _load_users),
+}
+
+
+def _instance(model, **values):
+    """A model instance with just `values` loaded, as from a query."""
+    fields = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    return model.from_db(None, fields, [values[name] for name in fields])
+
+
+class MappedReferenceTable:
+    """ReferenceTable interface over a table of the mapped snapshot."""
+
+    def __init__(self, snapshot, name):
+        self.snapshot = snapshot
+        self.table = snapshot.tables[name]
+        self.build = getattr(self, f"_build_{name}")
+
+    @property
+    def rows(self):
+        return [self.build(row) for row in range(len(self.table))]
+
+    def get(self, pk):
+        row = self.table.row_of(pk)
+        return None if row is None else self.build(row)
+
+    def autocomplete(self, prefix, limit=10):
+        return [self.build(row) for row in self.table.prefix_rows(prefix, limit)]
+
+    def _build_routes(self, row):
+        return _instance(Route, **self.table.values(row))
+
+    def _build_outlets(self, row):
+        values = self.table.values(row)
+        outlet = _instance(Outlet, **values)
+        routes = self.snapshot.tables["routes"]
+        route_row = routes.row_of(values["route_id"])
+        if route_row is not None:
+            Outlet.route.field.set_cached_value(
+                outlet, _instance(Route, **routes.values(route_row)),
+            )
+        return outlet
+
+    def _build_agents(self, row):
+        return _instance(get_user_model(), is_superuser=False, **self.table.values(row))
+
+
+_MAPPED_NAMES = {versions.ROUTES: "routes", versions.OUTLETS: "outlets", versions.USERS: "agents"}
+
+
+def reference_table(name):
+    """The current ReferenceTable `name`, rebuilt if its counters moved."""
+    if snapshots.snapshot_path():
+        return MappedReferenceTable(snapshots.current_snapshot(), _MAPPED_NAMES[name])
+
+    depends, load = TABLES[name]
+    current = versions.table_versions(*depends)
+    tag = tuple(current[table][0] for table in depends)
+
+    snapshot = _snapshots.get(name)
+    if snapshot is not None and snapshot[0] == tag:
+        return snapshot[1]
+    with _lock:
+        snapshot = _snapshots.get(name)
+        if snapshot is None or snapshot[0] != tag:
+            snapshot = _snapshots[name] = (tag, load())
+    return snapshot[1]
+
+
+def routes():
+    return reference_table(versions.ROUTES)
+
+
+def outlets():
+    return reference_table(versions.OUTLETS)
+
+
+def users():
+    return reference_table(versions.USERS)
+
+
+def agents(rows):
+    """The users UserViewSet lists: everyone but admins / superusers."""
+    return [u for u in rows if not (u.is_superuser or u.role == "admin")]
+
+
+def _table_for(queryset):
+    """The reference table a plain `.all()` queryset reads, if any."""
+    if queryset is None or queryset.query.where or queryset.query.is_sliced:
+        return None
+    model = queryset.model
+    if model is Route:
+        return versions.ROUTES
+    if model is Outlet:
+        return versions.OUTLETS
+    if model is get_user_model():
+        return versions.USERS
+    return None
+
+
+class CachedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that validates ids of routes, outlets and users
+    against the in-process snapshot. Ids it doesn't know (e.g. a row whose
+    counter bump hasn't landed yet) still go to the database.
+    """
+
+    def to_internal_value(self, data):
+        table = _table_for(self.get_queryset())
+        if table is not None and self.pk_field is None and not isinstance(data, bool):
+            try:
+                obj = reference_table(table).get(int(data))
+            except (TypeError, ValueError):
+                obj = None
+            if obj is not None:
+                return obj
+        return super().to_internal_value(data)
+
+
+class ReferenceViewMixin:
+    """
+    list() / retrieve() for read-only viewsets over a reference table,
+    served from the snapshot instead of the queryset. `filter_references()`
+    narrows the rows (query params, visibility) like get_queryset() does.
+    """
+    reference_table = None
+
+    def filter_references(self, rows):
+        return rows
+
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_references(reference_table(self.reference_table).rows)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows, many=True).data)
+
+    def get_reference(self):
+        """get_object() from the snapshot: 404 unless visible."""
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            obj = reference_table(self.reference_table).get(int(lookup))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None or not self.filter_references([obj]):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(self.get_reference()).data)
+
+    def autocomplete_response(self, request):
+        """?q=<prefix>&limit=<n> (default 10, at most 50) over the names."""
+        prefix = request.query_params.get("q", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        table = reference_table(self.reference_table)
+        # over-fetch so rows dropped by filter_references() don't starve the page
+        rows = self.filter_references(table.autocomplete(prefix, limit * 4))[:limit]
+        return Response(self.get_serializer(rows, many=True).data)
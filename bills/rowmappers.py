@@ -0,0 +1,237 @@
+# bills/rowmappers.py
+"""
+Values-based fast path for read-only ModelSerializer lists.
+
+DRF renders a list by building a model instance per row and calling every
+field's get_attribute()/to_representation(). For flat, read-only
+serializers the same output can be produced from `.values_list()` tuples:
+RowMapper compiles a serializer class once into
+
+  • the list of values_list() lookups it needs (dotted sources become
+    joins, `outlet.id` becomes the local `outlet_id` column), and
+  • one (key, tuple index, converter) step per field,
+
+and then maps each tuple straight to the output dict. The JSON is the same
+as the serializer's, including DecimalField quantization/string coercion,
+ISO dates, and DRF's rule that a read-only field whose relation is NULL is
+left out of the row.
+
+Sources that aren't model fields may name their values_list() candidates in
+`Meta.source_values` (`{"current_overdue_days": ("live_overdue_days",
+"overdue_days")}`); the first one the queryset provides (annotation or
+field) is used. Serializers with anything else the mapper can't compile
+(method fields, nested serializers, str() of a relation…) fall back to the
+regular serializer in serialize_rows().
+"""
+import decimal
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, fields as drf_fields
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField
+from rest_framework.settings import api_settings
+
+from .fieldsets import requested_fields
+
+_SKIP = object()
+
+
+def _decimal_converter(field):
+    if field.localize or getattr(field, 'normalize_output', False):
+        return None
+    if field.decimal_places is None:
+        quantize = None
+    else:
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def quantize(value):
+            return value.quantize(exponent, rounding=field.rounding, context=context)
+
+    if getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        if quantize is None:
+            return '{:f}'.format
+        return lambda value: '{:f}'.format(quantize(value))
+    return quantize or (lambda value: value)
+
+
+def _converter(field):
+    """value → representation for one field (None: not compilable)."""
+    if isinstance(field, drf_fields.ReadOnlyField):
+        return lambda value: value
+    if isinstance(field, PrimaryKeyRelatedField):
+        return (lambda value: value) if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, drf_fields.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, drf_fields.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == ISO_8601:
+            return lambda value: value.isoformat()
+        return field.to_representation
+    if isinstance(field, (RelatedField, ManyRelatedField)):
+        return None
+    if isinstance(field, (drf_fields.SerializerMethodField, drf_fields.HiddenField)):
+        return None
+    if hasattr(field, 'child') or hasattr(field, 'fields'):
+        return None  # nested / list serializers
+    return field.to_representation
+
+
+class RowMapper:
+    """Compiled values_list() lookups + per-field steps for a serializer."""
+
+    def __init__(self, serializer_class, provided=(), field_names=None):
+        serializer = serializer_class()
+        meta = serializer.Meta
+        self.model = meta.model
+        self.source_values = getattr(meta, 'source_values', {})
+        self.provided = set(provided)
+        self.lookups = []
+        self.steps = []
+        self.supported = True
+
+        for name, field in serializer.fields.items():
+            if field.write_only or (field_names is not None and name not in field_names):
+                continue
+            step = self._compile(name, field)
+            if step is None:
+                self.supported = False
+                break
+            self.steps.append(step)
+
+    @classmethod
+    def for_queryset(cls, serializer_class, queryset, field_names=None):
+        """The (cached) mapper for `serializer_class` over `queryset`."""
+        if field_names is not None:
+            field_names = tuple(field_names)
+        return _mapper(serializer_class, frozenset(queryset.query.annotations), field_names)
+
+    # ─── compilation ─────────────────────────────────────────────────────────
+    def _column(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return self.lookups.index(lookup)
+
+    def _resolve(self, field):
+        """(lookup, nullable relation lookups on the way) or None."""
+        if field.source == '*':
+            return None
+        model, path, guards = self.model, [], []
+        attrs = field.source_attrs
+        for depth, attr in enumerate(attrs):
+            last = depth == len(attrs) - 1
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if path or not last:
+                    return None
+                for candidate in self.source_values.get(field.source, ()):
+                    if candidate in self.provided or self._is_local_field(candidate):
+                        return candidate, guards
+                return None
+
+            if model_field.many_to_many or model_field.one_to_many:
+                return None
+            if model_field.is_relation:
+                lookup = '__'.join([*path, attr])
+                if last:
+                    # only a pk-only relation field renders from the id
+                    return (lookup, guards) if isinstance(field, PrimaryKeyRelatedField) else None
+                if model_field.null:
+                    guards.append(lookup)
+                path.append(attr)
+                model = model_field.related_model
+                continue
+
+            if path and model_field.primary_key:
+                # outlet.id → the FK column itself, no join
+                return '__'.join(path), guards
+            return '__'.join([*path, attr]), guards
+        return None
+
+    def _is_local_field(self, name):
+        try:
+            return not self.model._meta.get_field(name).is_relation
+        except FieldDoesNotExist:
+            return False
+
+    def _compile(self, name, field):
+        resolved = self._resolve(field)
+        convert = _converter(field)
+        if resolved is None or convert is None:
+            return None
+        lookup, guards = resolved
+
+        # DRF's get_attribute() on a NULL relation hop
+        missing = None
+        if guards:
+            if field.default is not drf_fields.empty:
+                return None
+            if field.allow_null:
+                missing = None
+            elif not field.required:
+                missing = _SKIP
+            else:
+                return None
+
+        return (
+            name,
+            self._column(lookup),
+            tuple(self._column(g) for g in guards),
+            missing,
+            convert,
+        )
+
+    # ─── mapping ─────────────────────────────────────────────────────────────
+    def to_representation(self, row):
+        out = {}
+        for name, index, guards, missing, convert in self.steps:
+            if guards and any(row[g] is None for g in guards):
+                if missing is not _SKIP:
+                    out[name] = missing
+                continue
+            value = row[index]
+            out[name] = None if value is None else convert(value)
+        return out
+
+    @property
+    def field_names(self):
+        return [step[0] for step in self.steps]
+
+    def to_values(self, row):
+        """The row as a list in field_names order (a left-out field is None)."""
+        values = []
+        for name, index, guards, missing, convert in self.steps:
+            if guards and any(row[g] is None for g in guards):
+                values.append(None if missing is _SKIP else missing)
+                continue
+            value = row[index]
+            values.append(None if value is None else convert(value))
+        return values
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.lookups)
+
+    def map(self, queryset):
+        convert = self.to_representation
+        return [convert(row) for row in self.rows(queryset)]
+
+
+@lru_cache(maxsize=None)
+def _mapper(serializer_class, provided, field_names):
+    return RowMapper(serializer_class, provided, field_names)
+
+
+def serialize_rows(queryset, serializer_class, context=None):
+    """
+    List representation of `queryset` through the values fast path when
+    `serializer_class` compiles, else through the serializer itself. The
+    request in `context` selects a sparse fieldset (?fields= / ?omit=).
+    """
+    field_names = requested_fields((context or {}).get('request'), serializer_class)
+    mapper = RowMapper.for_queryset(serializer_class, queryset, field_names)
+    if mapper.supported:
+        return mapper.map(queryset)
+    return serializer_class(queryset, many=True, context=context or {}).data
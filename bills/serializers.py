@@ -1,18 +1,22 @@
 from rest_framework import serializers
-from .models import Bill , Outlet , Route
+from .models import Bill , Outlet , Route, ImportJob
 from payments.serializers import PaymentSerializer
 from users.models import User
 from .models import Route, Outlet, Bill
-import pandas as pd
+from .excel import ExcelRowReader, ExcelReadError
+from .importers import PaymentImporter
+from .planning import LazyLoadCheckingListSerializer
+from .fieldsets import SparseFieldsetMixin
+from .references import CachedPrimaryKeyRelatedField
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model  = Route
         fields = "__all__"
 
-class OutletSerializer(serializers.ModelSerializer):
+class OutletSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     route = serializers.StringRelatedField()      # human-readable
-    route_id = serializers.PrimaryKeyRelatedField(  # writable
+    route_id = CachedPrimaryKeyRelatedField(  # writable
         source='route',
         queryset=Route.objects.all(),
         write_only=True
@@ -21,16 +25,17 @@ class OutletSerializer(serializers.ModelSerializer):
     class Meta:
         model  = Outlet
         fields = ("id", "name", "route", "route_id")
+        list_serializer_class = LazyLoadCheckingListSerializer
 
 
-class BillSerializer(serializers.ModelSerializer):
-    outlet = serializers.PrimaryKeyRelatedField(queryset=Outlet.objects.all())
+class BillSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    outlet = CachedPrimaryKeyRelatedField(queryset=Outlet.objects.all())
     route_name  = serializers.ReadOnlyField(source="outlet.route.name")  
     route  = serializers.ReadOnlyField(source="outlet.route.id")  
     outlet_name = serializers.ReadOnlyField(
         source='outlet.name'
     )
-    assigned_to_id = serializers.PrimaryKeyRelatedField(
+    assigned_to_id = CachedPrimaryKeyRelatedField(
         source='assigned_to', queryset=User.objects.all(),
     )
     assigned_to_name = serializers.CharField(
@@ -40,6 +45,8 @@ class BillSerializer(serializers.ModelSerializer):
         max_digits=12,
         decimal_places=2,
         read_only=True )
+    # live value when the queryset was built with Bill.objects.with_live_overdue()
+    overdue_days = serializers.IntegerField(source='current_overdue_days', read_only=True)
 
     class Meta:
         model  = Bill
@@ -60,8 +67,14 @@ class BillSerializer(serializers.ModelSerializer):
             "assigned_to_id",
             "assigned_to_name",
         )
+        list_serializer_class = LazyLoadCheckingListSerializer
+        # non-field sources → columns they read (see bills.planning) and
+        # values_list() candidates (see bills.rowmappers)
+        source_columns = {"current_overdue_days": ("overdue_days",)}
+        source_values = {"current_overdue_days": ("live_overdue_days", "overdue_days")}
 
 class BillCreateSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedPrimaryKeyRelatedField  # outlet
     route = serializers.ReadOnlyField(source='outlet.route.name')
     class Meta:
         model = Bill
@@ -78,26 +91,99 @@ class BillAssignSerializer(serializers.Serializer):
 class ExcelImportSerializer(serializers.Serializer):
     file = serializers.FileField()
 
+    def validate(self, attrs):
+        """
+        Open the upload once with the streaming reader; the view consumes
+        `reader` row by row instead of re-parsing the file.
+        """
+        reader = ExcelRowReader(attrs["file"])
+        try:
+            reader.headers
+        except ExcelReadError as e:
+            raise serializers.ValidationError({"file": str(e)})
+        attrs["reader"] = reader
+        return attrs
+
 class ExcelImportBillsSerializer(serializers.Serializer):
     file = serializers.FileField()
 
-    def validate_file(self, uploaded_file):
-        df = pd.read_excel(uploaded_file)
-        missing = set([
-            'Brand',
-            'Invoice Date',
-            'Route Name',
-            'Invoice Number',
-            'Outlet Name',
-            'Outstanding Amount',
-            'Overdue Days',
-            'Invoice Bill Amount'
-        ]) - set(df.columns.str.strip())
+    REQUIRED_COLUMNS = (
+        'Brand',
+        'Invoice Date',
+        'Route Name',
+        'Invoice Number',
+        'Outlet Name',
+        'Outstanding Amount',
+        'Overdue Days',
+        'Invoice Bill Amount',
+    )
+
+    def validate(self, attrs):
+        """
+        Check the header row (only the header row is parsed here) and hand
+        the open reader on to the view as `reader`.
+        """
+        reader = ExcelRowReader(attrs["file"])
+        try:
+            missing = reader.missing(self.REQUIRED_COLUMNS)
+        except ExcelReadError as e:
+            raise serializers.ValidationError({"file": str(e)})
         if missing:
             raise serializers.ValidationError(
-                f"Missing columns in Excel: {', '.join(missing)}"
+                {"file": f"Missing columns in Excel: {', '.join(missing)}"}
             )
-        return uploaded_file
+        attrs["reader"] = reader
+        return attrs
+
+class ImportJobCreateSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=ImportJob.KIND_CHOICES)
+    file = serializers.FileField()
+
+    def validate(self, attrs):
+        """Reject bad sheets up front: only the header row is read here."""
+        if attrs["kind"] == ImportJob.KIND_BILLS:
+            required = ExcelImportBillsSerializer.REQUIRED_COLUMNS
+        else:
+            required = PaymentImporter.REQUIRED_COLUMNS
+        reader = ExcelRowReader(attrs["file"])
+        try:
+            missing = reader.missing(required)
+        except ExcelReadError as e:
+            raise serializers.ValidationError({"file": str(e)})
+        finally:
+            reader.close()
+        if missing:
+            raise serializers.ValidationError(
+                {"file": f"Missing columns in Excel: {', '.join(missing)}"}
+            )
+        return attrs
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+    error_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model  = ImportJob
+        fields = (
+            "id",
+            "kind",
+            "status",
+            "rows_processed",
+            "last_row",
+            "imported",
+            "error_count",
+            "errors",
+            "rows_per_second",
+            "failure",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+    def get_error_count(self, obj) -> int:
+        return len(obj.errors)
 
 class RouteSimpleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -114,7 +200,7 @@ class OutletSimpleSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'route_id', 'route_name')
 
 
-class BillSimpleSerializer(serializers.ModelSerializer):
+class BillSimpleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     outlet_id      = serializers.ReadOnlyField(source='outlet.id')
     outlet_name    = serializers.ReadOnlyField(source='outlet.name')
     route_id       = serializers.ReadOnlyField(source='outlet.route.id')
@@ -122,6 +208,7 @@ class BillSimpleSerializer(serializers.ModelSerializer):
     invoice_number = serializers.ReadOnlyField()
     invoice_date   = serializers.ReadOnlyField()
     remaining_amount = serializers.ReadOnlyField()
+    overdue_days   = serializers.IntegerField(source='current_overdue_days', read_only=True)
 
     class Meta:
         model  = Bill
@@ -139,3 +226,30 @@ class BillSimpleSerializer(serializers.ModelSerializer):
             'outlet_id',
             'outlet_name',
         )
+        list_serializer_class = LazyLoadCheckingListSerializer
+        source_columns = {'current_overdue_days': ('overdue_days',)}
+        source_values = {'current_overdue_days': ('live_overdue_days', 'overdue_days')}
+
+
+class BootstrapBillSerializer(BillSimpleSerializer):
+    """
+    BillSimpleSerializer without the route/outlet names: the bootstrap
+    payload (bills/bootstrap.py) sends each route and outlet once, and
+    bills reference them by outlet_id.
+    """
+    outlet_name = None
+    route_id    = None
+    route_name  = None
+
+    class Meta(BillSimpleSerializer.Meta):
+        fields = (
+            'id',
+            'invoice_number',
+            'invoice_date',
+            'actual_amount',
+            'remaining_amount',
+            'brand',
+            'status',
+            'overdue_days',
+            'outlet_id',
+        )
@@ -0,0 +1,302 @@
+# bills/snapshots.py
+"""
+Memory-mapped, read-only snapshot file of the reference tables (routes,
+outlets, agents), shared by every worker process on the host.
+
+Layout (native byte order, every number a 64-bit integer, so each array
+can be read in place through memoryview.cast("q")):
+
+    header   magic, routes / outlets / users counters, string pool offset
+    per table, in TABLES order:
+      n                       row count
+      ids[n]                  in listing order (routes by name, …)
+      <int column>[n]         e.g. outlets.route_id
+      sorted_ids[n], id_rows[n]      id → row by binary search
+      <str column>_offsets[n+1]      into the string pool, per column
+      key_offsets[n+1], key_rows[n]  casefolded search names, sorted,
+                                     for prefix autocomplete
+    string pool              UTF-8 bytes of every string
+
+A row's string is pool[offsets[row]:offsets[row + 1]]. Nothing is decoded
+or copied until it's read, and the pages are the OS page cache's, not
+each worker's heap.
+
+The file is tagged with the bills.versions counters it was built from,
+which are ChangeCounter rows every process shares. When they move, a
+reader first looks at the file on disk (its inode, then its tag): if
+another worker already swapped in a file at least as new, it maps that
+one. Otherwise it regenerates the file into a temporary path, maps it and
+os.replace()s it, which swaps it atomically. Mappings of an old file stay
+valid until dropped. `manage.py build_reference_snapshot` regenerates on
+demand, e.g. after a deploy.
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from . import versions
+from .models import Outlet, Route
+
+MAGIC = b"DRSNAP01" if sys.byteorder == "little" else b"DRSNAPB1"
+HEADER = struct.Struct("=8s4q")  # magic, 3 counters, pool offset
+COUNTERS = (versions.ROUTES, versions.OUTLETS, versions.USERS)
+
+
+class TableSpec:
+    def __init__(self, name, int_columns, str_columns, search):
+        self.name = name
+        self.int_columns = int_columns
+        self.str_columns = str_columns
+        self.search = search  # the str column autocomplete matches
+
+
+ROUTES = TableSpec("routes", (), ("name",), "name")
+OUTLETS = TableSpec("outlets", ("route_id",), ("name",), "name")
+AGENTS = TableSpec("agents", (), ("username", "full_name", "role"), "username")
+TABLES = (ROUTES, OUTLETS, AGENTS)
+
+
+def snapshot_path():
+    return getattr(settings, "REFERENCE_SNAPSHOT_PATH", None)
+
+
+# ─── building ───────────────────────────────────────────────────────────────
+def _load_rows():
+    """{table name: [(id, {column: value})…]} in listing order."""
+    User = get_user_model()
+    agents = User.objects.filter(~(Q(is_superuser=True) | Q(role="admin"))).order_by("pk")
+    return {
+        "routes": [
+            (pk, {"name": name})
+            for pk, name in Route.objects.order_by("name").values_list("pk", "name")
+        ],
+        "outlets": [
+            (pk, {"name": name, "route_id": route_id})
+            for pk, name, route_id in Outlet.objects.order_by("route__name", "name")
+            .values_list("pk", "name", "route_id")
+        ],
+        "agents": [
+            (pk, {"username": username, "full_name": full_name or "", "role": role or ""})
+            for pk, username, full_name, role in agents
+            .values_list("pk", "username", "full_name", "role")
+        ],
+    }
+
+
+class _Pool:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def add(self, text):
+        data = text.encode("utf-8")
+        self.parts.append(data)
+        self.size += len(data)
+        return self.size  # end offset
+
+
+def _q(values):
+    return struct.pack(f"={len(values)}q", *values)
+
+
+def encode_snapshot(tag, rows_by_table):
+    """The snapshot file's bytes for `rows_by_table` built at counters `tag`."""
+    pool = _Pool()
+    body = []
+    for spec in TABLES:
+        rows = rows_by_table[spec.name]
+        n = len(rows)
+        ids = [pk for pk, _ in rows]
+        body.append(_q([n]))
+        body.append(_q(ids))
+        for column in spec.int_columns:
+            body.append(_q([values[column] for _, values in rows]))
+        id_rows = sorted(range(n), key=ids.__getitem__)
+        body.append(_q([ids[row] for row in id_rows]))
+        body.append(_q(id_rows))
+        for column in spec.str_columns:
+            offsets = [pool.size]
+            offsets.extend(pool.add(values[column]) for _, values in rows)
+            body.append(_q(offsets))
+        keys = sorted((values[spec.search].casefold(), row) for row, (_, values) in enumerate(rows))
+        offsets = [pool.size]
+        offsets.extend(pool.add(key) for key, _ in keys)
+        body.append(_q(offsets))
+        body.append(_q([row for _, row in keys]))
+
+    pool_offset = HEADER.size + sum(len(part) for part in body)
+    header = HEADER.pack(MAGIC, *tag, pool_offset)
+    return b"".join([header, *body, *pool.parts])
+
+
+def regenerate(path=None):
+    """
+    Build the snapshot from the database, swap it in atomically and return
+    it mapped (mapped before the swap: a concurrent swap can't change it).
+    """
+    path = path or snapshot_path()
+    # counters first: data read after them is at least as new as the tag
+    current = versions.table_versions(*COUNTERS)
+    tag = tuple(current[table][0] for table in COUNTERS)
+    data = encode_snapshot(tag, _load_rows())
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".reference-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        snapshot = MappedSnapshot(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return snapshot
+
+
+# ─── reading ────────────────────────────────────────────────────────────────
+class MappedTable:
+    """Array-backed view of one table inside a mapped snapshot."""
+
+    def __init__(self, spec, words, pool, start):
+        self.spec = spec
+        self.pool = pool
+        n = self.n = words[start]
+        at = start + 1
+
+        def take(count):
+            nonlocal at
+            view = words[at:at + count]
+            at += count
+            return view
+
+        self.ids = take(n)
+        self.ints = {column: take(n) for column in spec.int_columns}
+        self.sorted_ids = take(n)
+        self.id_rows = take(n)
+        self.strs = {column: take(n + 1) for column in spec.str_columns}
+        self.key_offsets = take(n + 1)
+        self.key_rows = take(n)
+        self.end = at
+
+    def __len__(self):
+        return self.n
+
+    def string(self, column, row):
+        offsets = self.strs[column]
+        return str(self.pool[offsets[row]:offsets[row + 1]], "utf-8")
+
+    def row_of(self, pk):
+        """Row index of id `pk`, or None."""
+        i = bisect.bisect_left(self.sorted_ids, pk)
+        if i < self.n and self.sorted_ids[i] == pk:
+            return self.id_rows[i]
+        return None
+
+    def values(self, row):
+        out = {"id": self.ids[row]}
+        for column, array in self.ints.items():
+            out[column] = array[row]
+        for column in self.spec.str_columns:
+            out[column] = self.string(column, row)
+        return out
+
+    def _key(self, i):
+        return str(self.pool[self.key_offsets[i]:self.key_offsets[i + 1]], "utf-8")
+
+    def prefix_rows(self, prefix, limit):
+        """Rows whose search column starts with `prefix`, casefolded, by name."""
+        prefix = prefix.casefold()
+        lo, hi = 0, self.n
+        while lo < hi:  # first key ≥ prefix
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        rows = []
+        for i in range(lo, self.n):
+            if len(rows) >= limit or not self._key(i).startswith(prefix):
+                break
+            rows.append(self.key_rows[i])
+        return rows
+
+
+class MappedSnapshot:
+    """A snapshot file mapped read-only; tables by name."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *tag, pool_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a reference snapshot")
+        self.tag = tuple(tag)
+        buffer = memoryview(self._mmap)
+        words = buffer[HEADER.size:pool_offset].cast("q")
+        pool = buffer[pool_offset:]
+        self.tables = {}
+        at = 0
+        for spec in TABLES:
+            table = self.tables[spec.name] = MappedTable(spec, words, pool, at)
+            at = table.end
+
+
+_lock = threading.Lock()
+_mapped = None
+
+
+def _covers(snapshot_tag, tag):
+    """Whether a snapshot tagged `snapshot_tag` is at least as new as `tag`."""
+    return all(have >= want for have, want in zip(snapshot_tag, tag))
+
+
+def _swapped_in(path, mapped):
+    """The file at `path` if it isn't the one `mapped` maps, else None."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if mapped is not None and (stat.st_dev, stat.st_ino) == (mapped.stat.st_dev, mapped.stat.st_ino):
+        return None
+    try:
+        return MappedSnapshot(path)
+    except (OSError, ValueError):  # removed meanwhile, or not a snapshot
+        return None
+
+
+def current_snapshot():
+    """
+    The mapped snapshot matching the current counters: the one already
+    mapped, the file another worker just swapped in, or a fresh one.
+    """
+    global _mapped
+    path = snapshot_path()
+    current = versions.table_versions(*COUNTERS)
+    tag = tuple(current[table][0] for table in COUNTERS)
+
+    mapped = _mapped
+    if mapped is not None and _covers(mapped.tag, tag):
+        return mapped
+    with _lock:
+        mapped = _mapped
+        if mapped is not None and _covers(mapped.tag, tag):
+            return mapped
+        on_disk = _swapped_in(path, mapped)
+        if on_disk is not None and _covers(on_disk.tag, tag):
+            _mapped = on_disk
+        else:
+            _mapped = regenerate(path)
+        return _mapped
@@ -0,0 +1,121 @@
+# bills/streaming.py
+"""
+Streamed JSON arrays for the "return everything" list modes.
+
+Instead of serializing the whole table into one Python list and rendering
+it at once, the queryset is read with `.iterator(chunk_size=…)` and every
+chunk is encoded and sent as soon as it is ready:
+
+    [ <chunk 1 rows> , <chunk 2 rows> , … ]
+
+so memory stays at one chunk of rows and the first bytes leave after the
+first chunk. Rows go through the values_list() fast path when the
+serializer compiles (bills.rowmappers), else through the serializer one
+chunk at a time. The bytes match what JSONRenderer would produce.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+from .columnar import columnar_chunks, wants_columnar
+from .fieldsets import requested_fields
+from .rowmappers import RowMapper, serialize_rows
+
+DEFAULT_LIST_STREAM_CHUNK_SIZE = 1000
+
+
+def list_stream_chunk_size():
+    return getattr(settings, "LIST_STREAM_CHUNK_SIZE", DEFAULT_LIST_STREAM_CHUNK_SIZE)
+
+
+def json_encoder():
+    """A JSON encoder configured like DRF's JSONRenderer."""
+    return encoders.JSONEncoder(
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON,
+        separators=(",", ":") if api_settings.COMPACT_JSON else (", ", ": "),
+    )
+
+
+def iter_representations(queryset, serializer_class, context=None, chunk_size=None):
+    """Yield lists of at most `chunk_size` row representations."""
+    chunk_size = chunk_size or list_stream_chunk_size()
+    field_names = requested_fields((context or {}).get("request"), serializer_class)
+    mapper = RowMapper.for_queryset(serializer_class, queryset, field_names)
+
+    if mapper.supported:
+        convert = mapper.to_representation
+        chunk = []
+        for row in mapper.rows(queryset).iterator(chunk_size=chunk_size):
+            chunk.append(convert(row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield serializer_class(chunk, many=True, context=context or {}).data
+            chunk = []
+    if chunk:
+        yield serializer_class(chunk, many=True, context=context or {}).data
+
+
+def iter_json_array(chunks):
+    """Encode an iterable of row lists as one JSON array, chunk by chunk."""
+    encoder = json_encoder()
+    separator = b","
+    yield b"["
+    first = True
+    for chunk in chunks:
+        # "[a,b,c]" → "a,b,c"
+        body = encoder.encode(list(chunk))[1:-1].encode("utf-8")
+        if not body:
+            continue
+        if not first:
+            yield separator
+        yield body
+        first = False
+    yield b"]"
+
+
+def iter_columnar_json(table, chunks):
+    """
+    Encode a columnar payload (bills.columnar) as one JSON object: columns,
+    then the rows chunk by chunk, then the dictionaries they filled.
+    """
+    encoder = json_encoder()
+    yield b'{"columns":' + encoder.encode(table.columns).encode("utf-8") + b',"rows":'
+    yield from iter_json_array(chunks)
+    yield b',"dictionaries":' + encoder.encode(table.dictionaries).encode("utf-8") + b"}"
+
+
+def streaming_list_response(queryset, serializer_class, context=None, chunk_size=None):
+    chunks = iter_representations(queryset, serializer_class, context, chunk_size)
+    return StreamingHttpResponse(iter_json_array(chunks), content_type="application/json")
+
+
+def full_list_response(request, queryset, serializer_class, context=None):
+    """
+    Response for an unpaginated list: a streamed JSON array when JSON was
+    negotiated, a columnar payload for ?format=columnar, otherwise (e.g.
+    the browsable API) a regular Response.
+    """
+    # validate ?fields= / ?omit= before any bytes are streamed
+    requested_fields(request, serializer_class)
+    if wants_columnar(request):
+        table, chunks = columnar_chunks(queryset, serializer_class, context, list_stream_chunk_size())
+        return StreamingHttpResponse(
+            iter_columnar_json(table, chunks), content_type=request.accepted_renderer.media_type,
+        )
+    renderer = getattr(request, "accepted_renderer", None)
+    if renderer is not None and renderer.format == "json":
+        return streaming_list_response(queryset, serializer_class, context)
+    return Response(serialize_rows(queryset, serializer_class, context), status=status.HTTP_200_OK)
@@ -0,0 +1,133 @@
+# bills/sync.py
+"""
+Delta sync of a DRA's worklist (open bills assigned to them).
+
+Instead of re-downloading every open assigned bill, a device keeps the
+opaque `token` from its last sync and sends it back:
+
+    GET /api/bills/my-assignments-sync/?token=<token>
+
+    {
+      "token":   "<next token>",
+      "full":    false,
+      "bills":   [ …open bills assigned to me, changed since the token… ],
+      "removed": [ …ids to drop: cleared, reassigned, unassigned, deleted… ]
+    }
+
+Without a token (first sync), or when the token is older than the
+tombstone retention, "full" is true and "bills" is the whole worklist:
+the device replaces its local copy instead of merging.
+
+Changes are found through Bill.updated_at (bumped by every write path,
+including payments moving the balance) and AssignmentTombstone rows (a
+bill leaving a DRA). The token records the request's start time; the next
+sync looks back SYNC_TOKEN_OVERLAP seconds further to cover writes that
+committed late, so a bill may be sent twice and devices upsert by id.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import AssignmentTombstone, Bill
+
+TOKEN_QUERY_PARAM = "token"
+TOKEN_VERSION = 1
+DEFAULT_SYNC_TOKEN_OVERLAP = 60
+DEFAULT_SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+
+def token_overlap():
+    return datetime.timedelta(
+        seconds=getattr(settings, "SYNC_TOKEN_OVERLAP", DEFAULT_SYNC_TOKEN_OVERLAP)
+    )
+
+
+def tombstone_retention():
+    return datetime.timedelta(
+        days=getattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", DEFAULT_SYNC_TOMBSTONE_RETENTION_DAYS)
+    )
+
+
+# ─── tokens ─────────────────────────────────────────────────────────────────
+def encode_token(synced_at):
+    payload = json.dumps({"v": TOKEN_VERSION, "t": synced_at.isoformat()})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    """The sync time a token records; ValidationError if it is malformed."""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if payload["v"] != TOKEN_VERSION:
+            raise ValueError(payload["v"])
+        synced_at = datetime.datetime.fromisoformat(payload["t"])
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise ValidationError({TOKEN_QUERY_PARAM: ["Invalid sync token."]})
+    if timezone.is_naive(synced_at):
+        raise ValidationError({TOKEN_QUERY_PARAM: ["Invalid sync token."]})
+    return synced_at
+
+
+# ─── changes ────────────────────────────────────────────────────────────────
+def worklist(user):
+    """The bills a DRA's device holds: open and assigned to them."""
+    return Bill.objects.filter(assigned_to=user, status=Bill.STATUS_OPEN)
+
+
+class SyncDelta:
+    """
+    What changed on `user`'s worklist since `token` (None: everything).
+
+    `bills` is a queryset for the caller to plan and serialize; `removed`
+    is a sorted list of bill ids; `token` is the token for the next sync.
+    """
+
+    def __init__(self, user, token=None, now=None):
+        now = now or timezone.now()
+        self.token = encode_token(now)
+        synced_at = decode_token(token) if token else None
+        # tombstones older than the retention may be purged already
+        self.full = synced_at is None or synced_at < now - tombstone_retention()
+
+        if self.full:
+            self.bills = worklist(user)
+            self.removed = []
+            return
+
+        since = synced_at - token_overlap()
+
+        # 1) open bills of mine written since: newly assigned, edited, paid
+        self.bills = worklist(user).filter(updated_at__gte=since)
+
+        # 2) mine but cleared since
+        removed = set(
+            Bill.objects
+                .filter(assigned_to=user, updated_at__gte=since)
+                .exclude(status=Bill.STATUS_OPEN)
+                .values_list("pk", flat=True)
+        )
+        # 3) taken off my worklist since (reassigned, unassigned, deleted)
+        removed.update(
+            AssignmentTombstone.objects
+                .filter(dra=user, created_at__gte=since)
+                .values_list("bill_id", flat=True)
+        )
+        # a bill that came back (reassigned to me again) is not removed
+        if removed:
+            removed -= set(
+                worklist(user).filter(pk__in=removed).values_list("pk", flat=True)
+            )
+        self.removed = sorted(removed)
+
+
+def purge_tombstones(now=None):
+    """Delete tombstones no token within the retention can still need."""
+    cutoff = (now or timezone.now()) - tombstone_retention() - token_overlap()
+    deleted, _ = AssignmentTombstone.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,892 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from users.models import User
+from payments.models import Payment
+from payments.serializers import PaymentSerializer
+from payments.services import record_payment
+from . import jobs, snapshots, sync, versions, worklists
+from .importers import BillImporter, PaymentImporter
+from .management.commands import check_query_plans
+from .columnar import columnar_chunks
+from .pagination import KeysetPagination
+from .rowmappers import RowMapper, serialize_rows
+from .serializers import BillSerializer, BillSimpleSerializer
+from .streaming import iter_columnar_json
+from .models import Bill, ChangeCounter, ImportJob, Outlet, Route
+
+
+class BillFixturesMixin:
+    """An admin, a DRA, two routes / outlets and six bills (odd ones assigned)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="x", role="admin", is_staff=True)
+        cls.dra = User.objects.create_user("dra", password="x", role="dra", email="dra@example.com")
+        cls.north = Route.objects.create(name="North")
+        cls.south = Route.objects.create(name="South")
+        cls.shop_a = Outlet.objects.create(name="Shop A", route=cls.north)
+        cls.shop_b = Outlet.objects.create(name="Shop B", route=cls.south)
+        cls.bills = [
+            Bill.objects.create(
+                outlet=[cls.shop_a, cls.shop_b][i % 2],
+                invoice_number=f"INV{i:03d}",
+                invoice_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i),
+                actual_amount=100 + i,
+                brand=f"B{i % 3}",
+                assigned_to=cls.dra if i % 2 else None,
+            )
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+        self.dra_client = APIClient()
+        self.dra_client.force_authenticate(self.dra)
+
+
+class SparseFieldsetJoinTests(BillFixturesMixin, TestCase):
+    URL = "/api/bills/my-assignments-flat/"
+
+    def cursor_sql(self, query):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.dra_client.get(self.URL + query)
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in ctx.captured_queries if "bills_bill" in q["sql"]][-1]
+
+    def test_route_ordering_keeps_its_join(self):
+        sql = self.cursor_sql("?pagination=cursor&fields=id,remaining_amount")
+        self.assertIn("bills_route", sql)
+
+    def test_pruned_without_relation_ordering(self):
+        sql = self.cursor_sql("?pagination=cursor&fields=id,remaining_amount&ordering=id")
+        self.assertNotIn("JOIN", sql)
+
+
+def bill_row(number, outlet="Shop A", route="North", **overrides):
+    row = {
+        "brand": "Acme",
+        "invoice_date": "2025-03-01",
+        "route_name": route,
+        "invoice_number": number,
+        "outlet_name": outlet,
+        "outstanding_amount": "80.00",
+        "overdue_days": 10,
+        "bill_amount": "100.00",
+    }
+    row.update(overrides)
+    return row
+
+
+class BillImporterTests(BillFixturesMixin, TestCase):
+    def test_imports_and_skips_duplicate_invoice_numbers(self):
+        rows = [
+            (2, bill_row("NEW1")),
+            (3, bill_row("INV000")),            # already in the database
+            (4, bill_row("NEW1")),              # repeated in the sheet
+            (5, bill_row("NEW2", outlet="Shop C", route="East")),
+        ]
+        importer = BillImporter(batch_size=2).import_rows(rows)
+
+        self.assertEqual(sorted(b.invoice_number for b in importer.imported), ["NEW1", "NEW2"])
+        self.assertEqual(importer.errors, [])
+        new2 = Bill.objects.select_related("outlet__route").get(invoice_number="NEW2")
+        self.assertEqual((new2.outlet.name, new2.outlet.route.name), ("Shop C", "East"))
+        self.assertEqual(new2.remaining_amount, Decimal("80.00"))
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        rows = [
+            (2, bill_row("NEW1", overdue_days=-1)),
+            (3, bill_row("NEW2", bill_amount="abc")),
+            (4, bill_row("NEW3", overdue_days="n/a")),
+            (5, bill_row("NEW4")),
+        ]
+        importer = BillImporter().import_rows(rows)
+
+        self.assertEqual([b.invoice_number for b in importer.imported], ["NEW4"])
+        self.assertEqual([e["row"] for e in importer.errors], [2, 3, 4])
+        self.assertEqual(importer.errors[0]["error"], "Overdue Days cannot be negative")
+
+    def test_database_error_fails_only_its_batch(self):
+        rows = [
+            (2, bill_row("NEW1", outlet="Shop C", route="East")),
+            (3, bill_row("INV001")),            # collides on the unique index
+            (4, bill_row("NEW2", outlet="Shop C", route="East")),
+        ]
+        importer = BillImporter(batch_size=2)
+        # as if a concurrent import inserted INV001 after the existence check
+        with mock.patch.object(BillImporter, "_drop_existing", lambda self, parsed: parsed):
+            importer.import_rows(rows)
+
+        self.assertEqual(len(importer.errors), 1)
+        self.assertEqual(importer.errors[0]["row"], 2)
+        self.assertIn("Database error in rows 2–3", importer.errors[0]["error"])
+        # the failed batch is rolled back, the next one still imports
+        self.assertFalse(Bill.objects.filter(invoice_number="NEW1").exists())
+        new2 = Bill.objects.select_related("outlet__route").get(invoice_number="NEW2")
+        self.assertEqual((new2.outlet.name, new2.outlet.route.name), ("Shop C", "East"))
+
+
+def payment_row(number, amount="10.00", username="dra", **overrides):
+    row = {
+        "Invoice Number": number,
+        "Payment Amount": amount,
+        "Username": username,
+        "Payment Date": "2025-03-01",
+    }
+    row.update(overrides)
+    return row
+
+
+class PaymentImporterTests(BillFixturesMixin, TestCase):
+    def test_repeated_invoice_numbers_all_count_towards_the_balance(self):
+        rows = [
+            (2, payment_row("INV001", "30.00")),
+            (3, payment_row("INV001", "71.00", username="dra@example.com")),
+            (4, payment_row("INV002", "5.00")),
+        ]
+        importer = PaymentImporter(batch_size=2).import_rows(rows)
+
+        self.assertEqual(importer.summary, {"imported": 3, "errors": []})
+        cleared = Bill.objects.get(invoice_number="INV001")
+        self.assertEqual(cleared.remaining_amount, Decimal("0.00"))
+        self.assertEqual(cleared.status, Bill.STATUS_CLEARED)
+        self.assertEqual(Bill.objects.get(invoice_number="INV002").remaining_amount, Decimal("97.00"))
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        rows = [
+            (2, payment_row("")),
+            (3, payment_row("INV001", "abc")),
+            (4, payment_row("NOPE")),
+            (5, payment_row("INV001", username="ghost")),
+            (6, payment_row("INV001", **{"Payment Date": None})),
+            (7, payment_row("INV001")),
+        ]
+        summary = PaymentImporter().import_rows(rows).summary
+
+        self.assertEqual(summary["imported"], 1)
+        self.assertEqual(
+            [(e["row"], e["error"]) for e in summary["errors"]],
+            [
+                (2, "Invoice Number is blank"),
+                (3, "Invalid Payment Amount: 'abc'"),
+                (4, "Bill with Invoice Number 'NOPE' not found"),
+                (5, "User 'ghost' not found"),
+                (6, "Payment Date is blank"),
+            ],
+        )
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_database_error_fails_only_its_batch(self):
+        rows = [(2, payment_row("INV001")), (3, payment_row("INV002"))]
+        real_bulk_create = Payment.objects.bulk_create
+        calls = []
+
+        def flaky_bulk_create(objs, **kwargs):
+            calls.append(objs)
+            if len(calls) == 1:
+                raise IntegrityError("boom")
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Payment.objects, "bulk_create", flaky_bulk_create):
+            summary = PaymentImporter(batch_size=1).import_rows(rows).summary
+
+        self.assertEqual(summary["imported"], 1)
+        self.assertEqual(summary["errors"], [{"row": 2, "error": "Database error in rows 2–2: boom"}])
+        self.assertEqual(list(Payment.objects.values_list("bill__invoice_number", flat=True)), ["INV002"])
+
+    def test_programming_errors_are_not_reported_as_database_errors(self):
+        with mock.patch("bills.importers.apply_payment_balances", side_effect=TypeError("bug")):
+            with self.assertRaises(TypeError):
+                PaymentImporter().import_rows([(2, payment_row("INV001"))])
+        self.assertFalse(Payment.objects.exists())
+
+    def test_imported_opening_balance_survives_api_and_imported_payments(self):
+        BillImporter().import_rows([(2, bill_row("NEW1", outstanding_amount="60.00"))])
+        bill = Bill.objects.get(invoice_number="NEW1")
+        self.assertEqual((bill.actual_amount, bill.opening_amount), (Decimal("100.00"), Decimal("60.00")))
+
+        record_payment(bill.pk, self.dra, amount=Decimal("10.00"), payment_method="cash")
+        PaymentImporter().import_rows([(2, payment_row("NEW1", "5.00"))])
+        bill.refresh_from_db()
+        self.assertEqual(bill.remaining_amount, Decimal("45.00"))
+
+        out = io.StringIO()
+        call_command("reconcile_remaining_amounts", "--dry-run", stdout=out)
+        self.assertIn("No remaining_amount drift found.", out.getvalue())
+
+        PaymentImporter().import_rows([(2, payment_row("NEW1", "45.00"))])
+        bill.refresh_from_db()
+        self.assertEqual((bill.remaining_amount, bill.status), (Decimal("0.00"), Bill.STATUS_CLEARED))
+
+
+def bills_workbook(numbers):
+    """An .xlsx upload with one bill row per invoice number."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    headers = list(BillImporter.HEADER_MAP)
+    sheet.append(headers)
+    for number in numbers:
+        row = bill_row(number)
+        sheet.append([row[BillImporter.HEADER_MAP[h]] for h in headers])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return ContentFile(buffer.getvalue(), name="bills.xlsx")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMPORT_JOB_STALE_AFTER=300)
+class ImportJobTests(BillFixturesMixin, TestCase):
+    def make_job(self, numbers, **fields):
+        return ImportJob.objects.create(
+            kind=ImportJob.KIND_BILLS, file=bills_workbook(numbers), **fields
+        )
+
+    def make_stale(self, job):
+        ImportJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - datetime.timedelta(seconds=301)
+        )
+
+    def test_claim_is_exclusive_while_heartbeat_is_fresh(self):
+        job = self.make_job(["NEW1"])
+        lease = jobs.claim(job.pk)
+
+        self.assertIsNotNone(lease)
+        self.assertIsNone(jobs.claim(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.lease), (ImportJob.STATUS_RUNNING, lease))
+        self.assertIsNotNone(job.started_at)
+
+    def test_reclaimed_job_rejects_the_old_workers_batch(self):
+        job = self.make_job(["NEW1"])
+        jobs.claim(job.pk)
+        old_worker = ImportJob.objects.get(pk=job.pk)
+
+        # the first worker's batch outlives IMPORT_JOB_STALE_AFTER
+        self.make_stale(job)
+        new_lease = jobs.claim(job.pk)
+        self.assertNotEqual(new_lease, old_worker.lease)
+
+        with self.assertRaises(jobs.LeaseLost):
+            jobs._commit_batch(old_worker, BillImporter(), [(2, bill_row("NEW1"))])
+        self.assertFalse(Bill.objects.filter(invoice_number="NEW1").exists())
+        job.refresh_from_db()
+        self.assertEqual((job.last_row, job.imported), (0, 0))
+
+    def test_resumed_job_continues_after_last_row(self):
+        job = self.make_job(
+            ["NEW1", "NEW2", "NEW3"],
+            status=ImportJob.STATUS_RUNNING, last_row=2, rows_processed=1, imported=1,
+        )
+        Bill.objects.create(
+            outlet=self.shop_a, invoice_number="NEW1", invoice_date=datetime.date(2025, 3, 1),
+            actual_amount=100,
+        )
+        self.make_stale(job)
+
+        self.assertEqual(list(jobs.resumable_jobs()), [job])
+        jobs.claim(job.pk)
+        job = ImportJob.objects.get(pk=job.pk)
+        jobs._process(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.last_row, job.rows_processed, job.imported), (4, 3, 3))
+        self.assertEqual(
+            Bill.objects.filter(invoice_number__startswith="NEW").count(), 3
+        )
+
+    def test_resume_command_submits_each_job_once(self):
+        queued = self.make_job(["NEW1"])
+        stale = self.make_job(["NEW2"], status=ImportJob.STATUS_RUNNING)
+        self.make_stale(stale)
+        self.make_job(["NEW3"], status=ImportJob.STATUS_RUNNING, heartbeat_at=timezone.now())
+
+        with mock.patch.object(jobs, "_executor", None), mock.patch.object(jobs, "run_job") as run_job:
+            call_command("resume_import_jobs", stdout=io.StringIO())
+
+        self.assertCountEqual([c.args for c in run_job.call_args_list], [(queued.pk,), (stale.pk,)])
+
+    def test_cron_resumes_orphaned_jobs(self):
+        stale = self.make_job(["NEW1"], status=ImportJob.STATUS_RUNNING)
+        self.make_stale(stale)
+        entries = [entry for entry in settings.CRONJOBS if entry[2] == ["resume_import_jobs"]]
+        self.assertEqual(len(entries), 1)
+        _, func, args = entries[0]
+
+        with mock.patch.object(jobs, "_executor", None), mock.patch.object(jobs, "run_job") as run_job:
+            import_string(func)(*args, stdout=io.StringIO())
+
+        self.assertEqual([c.args for c in run_job.call_args_list], [(stale.pk,)])
+
+
+class ExportFrameTests(BillFixturesMixin, TestCase):
+    def test_bills_xlsx_keeps_dates_and_exact_amounts(self):
+        from .views import export_bills_xlsx
+
+        Bill.objects.filter(pk=self.bills[0].pk).update(remaining_amount=Decimal("1234567.89"))
+        content, _, _ = export_bills_xlsx()
+
+        sheet = openpyxl.load_workbook(io.BytesIO(content)).active
+        header = [cell.value for cell in sheet[1]]
+        first = {name: cell for name, cell in zip(header, sheet[2])}
+        self.assertEqual(first["Invoice Date"].value, datetime.datetime(2025, 1, 1))
+        self.assertEqual(first["Invoice Date"].number_format.lower(), "yyyy-mm-dd")
+        self.assertEqual(Decimal(str(first["Outstanding Amount"].value)), Decimal("1234567.89"))
+        self.assertEqual(Decimal(str(first["Invoice Bill Amount"].value)), Decimal("100"))
+
+
+class KeysetPaginationTests(BillFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # ties on the ordering columns: three bills per invoice_date / amount
+        Bill.objects.update(invoice_date=datetime.date(2025, 2, 1))
+        Bill.objects.filter(pk__in=[b.pk for b in cls.bills[3:]]).update(
+            invoice_date=datetime.date(2025, 2, 2), remaining_amount=Decimal("7.50"),
+        )
+
+    def page(self, queryset, cursor=None, limit=2):
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        request = Request(APIRequestFactory().get("/", params))
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(queryset, request)
+        return paginator, [row.pk for row in rows]
+
+    def walk(self, queryset, limit=2):
+        seen, cursor = [], None
+        while True:
+            paginator, pks = self.page(queryset, cursor, limit)
+            seen.extend(pks)
+            cursor = paginator.next_cursor
+            if cursor is None:
+                return seen
+
+    def assertWalksLike(self, queryset, *ordering):
+        queryset = queryset.order_by(*ordering)
+        # ties broken on pk, in the direction of the last ordering column
+        full = KeysetPagination().get_ordering(queryset)
+        expected = list(queryset.order_by(*full).values_list("pk", flat=True))
+        for limit in (1, 2, 4):
+            self.assertEqual(self.walk(queryset, limit), expected)
+
+    def test_ties_ascending(self):
+        self.assertWalksLike(Bill.objects.all(), "invoice_date")
+
+    def test_ties_descending(self):
+        self.assertWalksLike(Bill.objects.all(), "-invoice_date")
+
+    def test_mixed_directions_and_decimal_values(self):
+        self.assertWalksLike(Bill.objects.all(), "-remaining_amount", "invoice_date")
+
+    def test_relation_ordering(self):
+        self.assertWalksLike(Bill.objects.all(), "-outlet__route__name")
+
+    def test_default_ordering_is_newest_first(self):
+        self.assertEqual(self.walk(Bill.objects.all()), [b.pk for b in reversed(self.bills)])
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        ordering = ["-created_at", "remaining_amount", "invoice_date", "-pk"]
+        values = [
+            timezone.now(), Decimal("12.30"), datetime.date(2025, 1, 2), 7,
+        ]
+        token = paginator.encode_cursor(ordering, values)
+        self.assertNotIn("=", token)
+        self.assertEqual(
+            paginator.decode_cursor(token, ordering),
+            [values[0].isoformat(), "12.30", "2025-01-02", 7],
+        )
+
+    def test_tampered_cursors_are_rejected(self):
+        paginator = KeysetPagination()
+        queryset = Bill.objects.order_by("invoice_date")
+        ordering = ["invoice_date", "pk"]
+        bad = [
+            "not base64!",
+            paginator.encode_cursor(["-invoice_date", "-pk"], ["2025-02-01", 1]),  # other ordering
+            paginator.encode_cursor(ordering, ["2025-02-01"]),                     # too few values
+            paginator.encode_cursor(ordering, ["not a date", 1]),
+            paginator.encode_cursor(ordering, ["2025-02-01", "x"]),
+        ]
+        for token in bad:
+            with self.subTest(token=token), self.assertRaises(NotFound):
+                self.page(queryset, token)
+
+
+class SyncDeltaTests(BillFixturesMixin, TestCase):
+    URL = "/api/bills/my-assignments-sync/"
+
+    def sync(self, token=None):
+        params = {"token": token} if token else {}
+        response = self.dra_client.get(self.URL, params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return body, [bill["id"] for bill in body["bills"]]
+
+    def backdate(self, bills, age):
+        Bill.objects.filter(pk__in=[b.pk for b in bills]).update(
+            updated_at=timezone.now() - age,
+        )
+
+    def test_token_round_trip(self):
+        moment = timezone.now()
+        self.assertEqual(sync.decode_token(sync.encode_token(moment)), moment)
+        for token in ("not a token", sync.encode_token(moment)[:-2] + "!!"):
+            with self.subTest(token=token):
+                response = self.dra_client.get(self.URL, {"token": token})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("token", response.json())
+
+    def test_first_sync_is_full_then_only_changes(self):
+        body, ids = self.sync()
+        self.assertTrue(body["full"])
+        self.assertEqual(ids, [b.pk for b in self.bills if b.assigned_to_id])
+
+        # nothing written since: an older bill is outside the overlap
+        self.backdate(self.bills, datetime.timedelta(hours=1))
+        body, ids = self.sync(body["token"])
+        self.assertFalse(body["full"])
+        self.assertEqual((ids, body["removed"]), ([], []))
+
+        edited = self.bills[1]
+        Bill.objects.get(pk=edited.pk).save()
+        body, ids = self.sync(body["token"])
+        self.assertEqual(ids, [edited.pk])
+
+    def test_overlap_resends_late_commits(self):
+        token = sync.encode_token(timezone.now())
+        # committed "before" the token was issued, but within the overlap
+        self.backdate([self.bills[1]], sync.token_overlap() / 2)
+        self.backdate([self.bills[3], self.bills[5]], sync.token_overlap() * 2)
+
+        body, ids = self.sync(token)
+        self.assertFalse(body["full"])
+        self.assertEqual(ids, [self.bills[1].pk])
+
+    def test_reassign_and_delete_leave_tombstones(self):
+        body, _ = self.sync()
+        self.backdate(self.bills, datetime.timedelta(hours=1))
+        moved, deleted = self.bills[1], self.bills[3]
+
+        bill = Bill.objects.get(pk=moved.pk)
+        bill.assigned_to = self.admin
+        bill.save()
+        Bill.objects.get(pk=deleted.pk).delete()
+
+        body, ids = self.sync(body["token"])
+        self.assertEqual(ids, [])
+        self.assertEqual(body["removed"], sorted([moved.pk, deleted.pk]))
+
+        # assigned back: sent again, no longer removed
+        bill.assigned_to = self.dra
+        bill.save()
+        body, ids = self.sync(sync.encode_token(timezone.now() - datetime.timedelta(seconds=1)))
+        self.assertEqual(ids, [moved.pk])
+        self.assertEqual(body["removed"], [deleted.pk])
+
+    def test_cleared_bill_is_removed(self):
+        body, _ = self.sync()
+        cleared = self.bills[5]
+        Payment.objects.create(bill=cleared, dra=self.dra, amount=cleared.actual_amount, payment_method="cash")
+
+        body, ids = self.sync(body["token"])
+        self.assertNotIn(cleared.pk, ids)
+        self.assertEqual(body["removed"], [cleared.pk])
+
+    def test_expired_token_falls_back_to_full_sync(self):
+        expired = timezone.now() - sync.tombstone_retention() - datetime.timedelta(minutes=1)
+        self.backdate(self.bills, datetime.timedelta(days=400))
+
+        body, ids = self.sync(sync.encode_token(expired))
+        self.assertTrue(body["full"])
+        self.assertEqual(ids, [b.pk for b in self.bills if b.assigned_to_id])
+        self.assertEqual(body["removed"], [])
+
+
+class ChangeCounterTests(BillFixturesMixin, TestCase):
+    URL = "/api/bills/"
+
+    def etag(self):
+        response = self.admin_client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_counters_live_in_the_database(self):
+        before = versions.table_versions(versions.BILLS)[versions.BILLS][0]
+        with self.captureOnCommitCallbacks(execute=True):
+            versions.bump_versions(versions.BILLS, versions.ROUTES)
+
+        self.assertEqual(ChangeCounter.objects.get(name=versions.BILLS).value, before + 1)
+        self.assertTrue(ChangeCounter.objects.filter(name=versions.ROUTES).exists())
+
+    def test_management_command_write_changes_the_etag(self):
+        etag = self.etag()
+        self.assertEqual(
+            self.admin_client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304,
+        )
+        # drift that only the reconcile command repairs (no signals)
+        Bill.objects.filter(pk=self.bills[0].pk).update(remaining_amount=Decimal("1.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("reconcile_remaining_amounts", stdout=io.StringIO())
+
+        response = self.admin_client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class WorklistCacheTests(BillFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        worklists.worklist_cache().clear()
+
+    def rows(self, user=None):
+        return {row["id"]: row for row in worklists.get_worklist(user or self.dra)}
+
+    def test_hit_costs_only_the_counter_lookup(self):
+        self.rows()
+        with self.assertNumQueries(1):
+            self.rows()
+
+    def test_payment_invalidates(self):
+        bill = self.bills[1]
+        self.assertEqual(self.rows()[bill.pk]["remaining_amount"], Decimal("101.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(bill=bill, dra=self.dra, amount=Decimal("1.00"), payment_method="cash")
+        self.assertEqual(self.rows()[bill.pk]["remaining_amount"], Decimal("100.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(bill=bill, dra=self.dra, amount=Decimal("100.00"), payment_method="cash")
+        self.assertNotIn(bill.pk, self.rows())
+
+    def test_assignment_invalidates_both_agents(self):
+        other = User.objects.create_user("dra2", password="x", role="dra")
+        moved = self.bills[1]
+        self.assertIn(moved.pk, self.rows())
+        self.assertEqual(self.rows(other), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.admin_client.post(
+                f"/api/bills/{moved.pk}/assign/",
+                {"bill_ids": [moved.pk], "dra_id": other.pk}, format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(moved.pk, self.rows())
+        self.assertEqual(list(self.rows(other)), [moved.pk])
+
+    def test_route_rename_invalidates_everyone(self):
+        bill = self.bills[1]  # on Shop B / South
+        self.assertEqual(self.rows()[bill.pk]["route_name"], "South")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.south.name = "Far South"
+            self.south.save()
+        self.assertEqual(self.rows()[bill.pk]["route_name"], "Far South")
+
+    def test_write_during_a_build_is_not_cached(self):
+        bill = self.bills[1]
+        build = worklists.build_worklist
+
+        def racing_build(user):
+            rows = build(user)  # read before the payment committed
+            with self.captureOnCommitCallbacks(execute=True):
+                Payment.objects.create(bill=bill, dra=self.dra, amount=Decimal("1.00"), payment_method="cash")
+            return rows
+
+        with mock.patch.object(worklists, "build_worklist", racing_build):
+            self.assertEqual(self.rows()[bill.pk]["remaining_amount"], Decimal("101.00"))
+        self.assertEqual(self.rows()[bill.pk]["remaining_amount"], Decimal("100.00"))
+
+
+@override_settings(REFERENCE_SNAPSHOT_PATH=None)
+class ReferenceTableTests(TransactionTestCase):
+    """The per-process reference tables notice writes made by other processes."""
+
+    def setUp(self):
+        admin = User.objects.create_user("admin", password="x", role="admin", is_staff=True)
+        Route.objects.create(name="North")
+        Route.objects.create(name="South")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        rows = body["results"] if isinstance(body, dict) else body
+        return [row["name"] for row in rows], response["ETag"]
+
+    def test_write_from_another_connection_is_seen(self):
+        names, etag = self.names("/api/routes/")
+        self.assertEqual(names, ["North", "South"])
+        self.assertEqual(self.names("/api/routes/autocomplete/?q=so")[0], ["South"])
+
+        # another process: its own connection, committing a route and its bump
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            with other.cursor() as cursor:
+                cursor.execute("INSERT INTO bills_route (name) VALUES (%s)", ["Southgate"])
+                cursor.execute(
+                    "UPDATE bills_changecounter SET value = value + 1 WHERE name = %s",
+                    [versions.ROUTES],
+                )
+        finally:
+            other.close()
+
+        self.assertEqual(self.names("/api/routes/")[0], ["North", "South", "Southgate"])
+        self.assertEqual(self.names("/api/routes/autocomplete/?q=so")[0], ["South", "Southgate"])
+        response = self.client.get("/api/routes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ReferenceSnapshotTests(BillFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/reference.snapshot"
+        settings_override = override_settings(REFERENCE_SNAPSHOT_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        snapshots._mapped = None
+        self.addCleanup(setattr, snapshots, "_mapped", None)
+
+    def add_route(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            Route.objects.create(name=name)
+
+    def route_names(self, snapshot):
+        table = snapshot.tables["routes"]
+        return [table.values(row)["name"] for row in range(len(table))]
+
+    def test_unchanged_counters_reuse_the_mapping(self):
+        snapshot = snapshots.current_snapshot()
+        self.assertEqual(self.route_names(snapshot), ["North", "South"])
+        with mock.patch.object(snapshots, "regenerate") as regenerate:
+            self.assertIs(snapshots.current_snapshot(), snapshot)
+        regenerate.assert_not_called()
+
+    def test_maps_a_file_another_worker_swapped_in(self):
+        snapshots.current_snapshot()
+        self.add_route("East")
+        # another worker noticed first and swapped in a new file
+        snapshots.regenerate(self.path)
+
+        with mock.patch.object(snapshots, "regenerate") as regenerate:
+            snapshot = snapshots.current_snapshot()
+        regenerate.assert_not_called()
+        self.assertEqual(self.route_names(snapshot), ["East", "North", "South"])
+        self.assertEqual(snapshot.stat.st_ino, os.stat(self.path).st_ino)
+
+    def test_stale_file_on_disk_is_rebuilt(self):
+        stale = snapshots.regenerate(self.path)
+        self.add_route("East")
+
+        snapshot = snapshots.current_snapshot()
+        self.assertNotEqual(snapshot.tag, stale.tag)
+        self.assertEqual(self.route_names(snapshot), ["East", "North", "South"])
+        self.assertEqual(snapshots.MappedSnapshot(self.path).tag, snapshot.tag)
+
+
+class QueryPlanCheckTests(TestCase):
+    def check_plans(self, queries=None):
+        out = io.StringIO()
+        if queries is None:
+            call_command("check_query_plans", stdout=out)
+        else:
+            with mock.patch.object(check_query_plans, "hot_queries", lambda: queries):
+                call_command("check_query_plans", stdout=out)
+        return out.getvalue()
+
+    def test_hot_queries_seek_an_index(self):
+        self.assertIn("All checked queries use an index.", self.check_plans())
+
+    def test_filtered_walk_of_an_index_fails(self):
+        # ordered by created_at, filtered on unindexed columns: sqlite walks
+        # bill_created_at_idx end to end ("SCAN … USING INDEX")
+        walk = (
+            Bill.objects.filter(~Q(status=Bill.STATUS_OPEN) & Q(overdue_days__gte=90))
+            .order_by("-created_at")[:10]
+        )
+        with self.assertRaisesMessage(CommandError, "1 query(s) scan their table: old min_overdue"):
+            self.check_plans([("old min_overdue", walk)])
+
+    def test_unfiltered_first_page_passes(self):
+        first_page = Bill.objects.order_by("-created_at")[:10]
+        self.assertIn("index  first page", self.check_plans([("first page", first_page)]))
+
+    def test_postgresql_index_scan_without_condition(self):
+        walk = (
+            "Limit  (cost=0.15..1.10 rows=10 width=8)\n"
+            "  ->  Index Scan Backward using bill_created_at_idx on bills_bill  (cost=0.15..52.15)\n"
+            "        Filter: (overdue_days >= 90)"
+        )
+        seek = walk.replace("Filter: (overdue_days >= 90)", "Index Cond: (created_at < now())")
+        self.assertTrue(check_query_plans.pg_full_index_scan(walk, "bills_bill"))
+        self.assertFalse(check_query_plans.pg_full_index_scan(seek, "bills_bill"))
+
+
+class RowMapperTests(BillFixturesMixin, TestCase):
+    """serialize_rows()' values_list() fast path renders what the serializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        paid = cls.bills[1]
+        Payment.objects.create(
+            bill=paid, dra=cls.dra, amount=paid.actual_amount, payment_method="cheque",
+            cheque_number="000123", cheque_date=datetime.date(2025, 2, 3),
+        )
+        Payment.objects.create(bill=cls.bills[3], dra=cls.dra, amount=Decimal("0.5"), payment_method="cash")
+
+    def assertSameJson(self, queryset, serializer_class, fields=None):
+        self.assertTrue(RowMapper.for_queryset(serializer_class, queryset).supported)
+        request = Request(APIRequestFactory().get("/", {"fields": fields} if fields else {}))
+        context = {"request": request}
+        fast = serialize_rows(queryset, serializer_class, context)
+        slow = serializer_class(queryset, many=True, context=context).data
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(slow))
+        return fast
+
+    def test_bill_serializer(self):
+        rows = self.assertSameJson(Bill.objects.with_live_overdue().order_by("id"), BillSerializer)
+        self.assertIsNone(rows[0]["assigned_to_id"])        # NULL relation
+        self.assertEqual(rows[1]["status"], Bill.STATUS_CLEARED)
+        self.assertIsNotNone(rows[1]["cleared_at"])
+
+    def test_bill_simple_serializer(self):
+        for queryset in (Bill.objects.order_by("id"), Bill.objects.with_live_overdue().order_by("id")):
+            with self.subTest(live=bool(queryset.query.annotations)):
+                self.assertSameJson(queryset, BillSimpleSerializer)
+
+    def test_payment_serializer(self):
+        rows = self.assertSameJson(Payment.objects.order_by("id"), PaymentSerializer)
+        self.assertEqual(rows[1]["amount"], "0.50")          # quantized like DecimalField
+        self.assertIsNone(rows[1]["cheque_date"])
+
+    def test_sparse_fieldset(self):
+        rows = self.assertSameJson(
+            Bill.objects.order_by("id"), BillSerializer, fields="id,remaining_amount,invoice_date",
+        )
+        self.assertEqual(set(rows[0]), {"id", "remaining_amount", "invoice_date"})
+
+
+class FullListResponseMixin:
+    """GET /api/bills/ as a streamed full list and as a regular page."""
+
+    URL = "/api/bills/"
+
+    def get(self, **params):
+        response = self.admin_client.get(self.URL, {"ordering": "invoice_date", **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def streamed(self, **params):
+        response = self.get(**params)
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def paged(self, **params):
+        response = self.get(page=1, limit=100, **params)
+        self.assertFalse(response.streaming)
+        return response.json()["results"]
+
+
+@override_settings(LIST_STREAM_CHUNK_SIZE=2)
+class FullListStreamingTests(FullListResponseMixin, BillFixturesMixin, TestCase):
+    """The streamed JSON array matches the regular response."""
+
+    def test_matches_the_regular_response(self):
+        rows = self.streamed()
+        self.assertEqual(len(rows), len(self.bills))  # three chunks of two
+        self.assertEqual(rows, self.paged())
+
+    def test_sparse_fieldset(self):
+        fields = "id,remaining_amount,route_name"
+        self.assertEqual(self.streamed(fields=fields), self.paged(fields=fields))
+
+    def test_empty_result(self):
+        self.assertEqual(self.streamed(invoice_number="NOPE"), [])
+
+
+@override_settings(LIST_STREAM_CHUNK_SIZE=2)
+class ColumnarResponseTests(FullListResponseMixin, BillFixturesMixin, TestCase):
+    """?format=columnar carries the same rows as the JSON responses."""
+
+    @staticmethod
+    def expand(payload):
+        """Columnar payload → row dicts."""
+        columns, dictionaries = payload["columns"], payload["dictionaries"]
+        rows = []
+        for values in payload["rows"]:
+            row = dict(zip(columns, values))
+            for column, strings in dictionaries.items():
+                if row[column] is not None:
+                    row[column] = strings[row[column]]
+            rows.append(row)
+        return rows
+
+    def assertSameRows(self, payload, json_rows):
+        # a row dict leaves out fields of NULL relations; a column holds null
+        columns = payload["columns"]
+        self.assertEqual(self.expand(payload), [{c: row.get(c) for c in columns} for row in json_rows])
+
+    def test_streamed_list_matches_the_regular_responses(self):
+        payload = self.streamed(format="columnar")
+        self.assertEqual(payload, self.paged(format="columnar"))
+        self.assertSameRows(payload, self.paged())
+        self.assertEqual(payload["dictionaries"]["route_name"], ["North", "South"])
+
+    def test_sparse_fieldset(self):
+        fields = "id,remaining_amount,route_name"
+        payload = self.streamed(fields=fields, format="columnar")
+        self.assertEqual(payload["columns"], ["id", "route_name", "remaining_amount"])
+        self.assertEqual(payload, self.paged(fields=fields, format="columnar"))
+
+    def test_empty_result(self):
+        payload = self.streamed(invoice_number="NOPE", format="columnar")
+        # still a full columnar object, so clients need no special case
+        self.assertEqual(payload["columns"], self.streamed(format="columnar")["columns"])
+        self.assertEqual(payload["rows"], [])
+        self.assertEqual(payload["dictionaries"], {name: [] for name in payload["dictionaries"]})
+
+    def test_sync_bills(self):
+        url = "/api/bills/my-assignments-sync/"
+        bills = self.dra_client.get(url).json()["bills"]
+        payload = self.dra_client.get(url, {"format": "columnar"}).json()["bills"]
+        self.assertSameRows(payload, bills)
+        self.assertEqual(len(payload["rows"]), 3)
+
+    def test_serializer_fallback(self):
+        queryset = Bill.objects.order_by("id")
+        # a serializer the values_list() fast path can't compile
+        unsupported = mock.Mock(supported=False)
+        with mock.patch.object(RowMapper, "for_queryset", return_value=unsupported):
+            table, chunks = columnar_chunks(queryset, BillSimpleSerializer, chunk_size=4)
+            fallback = json.loads(b"".join(iter_columnar_json(table, chunks)))
+        table, chunks = columnar_chunks(queryset, BillSimpleSerializer, chunk_size=4)
+        fast = json.loads(b"".join(iter_columnar_json(table, chunks)))
+        self.assertEqual(fallback, fast)
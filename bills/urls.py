@@ -8,7 +8,11 @@ from bills.views import (
     BillImportView,
     BillAssignView,
     MyAssignmentsFlatView,
+    MyAssignmentsSyncView,
+    MyAssignmentsBootstrapView,
     ImportBillsFromExcelAPIView,
+    ImportJobCreateView,
+    ImportJobDetailView,
 )
 
 router = DefaultRouter()
@@ -29,6 +33,12 @@ urlpatterns = [
     # GET  /api/bills/my-assignments-flat/ → MyAssignmentsFlatView
     path("my-assignments-flat/", MyAssignmentsFlatView.as_view(), name="my-assignments-flat"),
 
+    # GET  /api/bills/my-assignments-bootstrap/ → MyAssignmentsBootstrapView (app start-up)
+    path("my-assignments-bootstrap/", MyAssignmentsBootstrapView.as_view(), name="my-assignments-bootstrap"),
+
+    # GET  /api/bills/my-assignments-sync/?token=… → MyAssignmentsSyncView (delta sync)
+    path("my-assignments-sync/", MyAssignmentsSyncView.as_view(), name="my-assignments-sync"),
+
     # GET  /api/bills/export-records/
     # Note: no “bills/” prefix here—just “export-records/”
 
@@ -36,4 +46,9 @@ urlpatterns = [
     path("", include(router.urls)),
 
     path("import-excel/", ImportBillsFromExcelAPIView.as_view(), name="import-bills-excel"),
+
+    # POST /api/bills/import-jobs/       → ImportJobCreateView (background import)
+    # GET  /api/bills/import-jobs/<pk>/  → ImportJobDetailView (progress polling)
+    path("import-jobs/", ImportJobCreateView.as_view(), name="import-jobs-create"),
+    path("import-jobs/<int:pk>/", ImportJobDetailView.as_view(), name="import-jobs-detail"),
 ]
@@ -0,0 +1,183 @@
+# bills/versions.py
+"""
+Per-table change counters for conditional GETs (ETag / Last-Modified).
+
+Every write to one of TABLES bumps that table's counter, after commit, in
+the ChangeCounter table: a plain row in the database, so a write from any
+worker process, cron job or management command changes what every other
+process reads (a per-process cache would not). A view's ETag is a hash of
+the counters of the tables its response reads, plus anything else the
+body depends on (the user, the negotiated format, today's date for live
+overdue days, an object's own updated_at…). Comparing it with
+If-None-Match costs one primary-key lookup, not the view's query.
+
+Counters start at the current time in milliseconds when their row is
+missing (first use, a restored database), so a reset never reissues an
+ETag that was already handed out for different content. Each bump also
+records when it happened, which is what Last-Modified reports.
+
+Readers read the counters before the data and bumps land after commit,
+so a response is never tagged with a counter newer than what it shows.
+
+Writes through signals (save(), delete()) bump from the models modules;
+queryset .update()/bulk_*() paths call bump_versions() themselves.
+"""
+import datetime
+import hashlib
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .dateranges import start_of_day
+
+BILLS = "bills"
+PAYMENTS = "payments"
+ROUTES = "routes"
+OUTLETS = "outlets"
+USERS = "users"
+TABLES = (BILLS, PAYMENTS, ROUTES, OUTLETS, USERS)
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _create_counters(names, value):
+    from .models import ChangeCounter  # bills.models imports this module
+    modified_at = datetime.datetime.fromtimestamp(value / 1000, datetime.timezone.utc)
+    ChangeCounter.objects.bulk_create(
+        [ChangeCounter(name=name, value=value, modified_at=modified_at) for name in names],
+        ignore_conflicts=True,
+    )
+
+
+def counter_values(*names):
+    """{name: (value, modified_at epoch seconds)} for `names`, in one query."""
+    from .models import ChangeCounter
+    rows = ChangeCounter.objects.filter(name__in=names).values_list("name", "value", "modified_at")
+    found = {name: (value, modified.timestamp()) for name, value, modified in rows}
+    missing = [name for name in names if name not in found]
+    if missing:
+        # start past any counter value handed out before
+        _create_counters(missing, _now_ms())
+        rows = ChangeCounter.objects.filter(name__in=missing).values_list("name", "value", "modified_at")
+        found.update((name, (value, modified.timestamp())) for name, value, modified in rows)
+    return found
+
+
+def bump_counters(*names):
+    """Bump the counters `names` once the current transaction commits."""
+    def bump():
+        from .models import ChangeCounter
+        counters = ChangeCounter.objects.filter(name__in=names)
+        if counters.update(value=F("value") + 1, modified_at=timezone.now()) < len(set(names)):
+            _create_counters(names, _now_ms() + 1)
+    transaction.on_commit(bump)
+
+
+def table_versions(*tables):
+    """{table: (counter, modified_at epoch seconds)} for `tables`."""
+    return counter_values(*tables)
+
+
+def bump_versions(*tables):
+    """Bump the counters of `tables` once the current transaction commits."""
+    bump_counters(*tables)
+
+
+# ─── conditional GET for DRF views ──────────────────────────────────────────
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+def _etag_matches(etag, header):
+    # weak comparison, as for If-None-Match
+    candidates = {tag.removeprefix("W/") for tag in parse_etags(header)}
+    return "*" in candidates or etag in candidates
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified on GET and HEAD from change counters.
+
+    `etag_tables` names the tables the response reads; set `etag_daily`
+    when it renders live overdue days. get_object_version() may add a
+    per-object part (e.g. the row's updated_at); returning None there skips
+    the conditional check (the view then 404s as usual). A matching
+    If-None-Match (or, without one, an If-Modified-Since not older than
+    the last change) answers 304 before any of the view's own queries.
+    """
+    etag_tables = ()
+    etag_daily = False
+
+    def get_object_version(self):
+        """(version, modified datetime or None) of the detail object, if any."""
+        return ("", None)
+
+    def get_etag_parts(self, request):
+        return (
+            request.user.pk,
+            getattr(request.accepted_renderer, "format", None),
+            getattr(self, "action", None),
+            tuple(sorted(self.kwargs.items())),
+            tuple(sorted(request.query_params.lists())),
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method not in ("GET", "HEAD") or not self.etag_tables:
+            return
+
+        object_version = self.get_object_version()
+        if object_version is None:
+            return
+        object_part, object_modified = object_version
+
+        versions = table_versions(*self.etag_tables)
+        parts = [
+            self.get_etag_parts(request),
+            sorted((table, counter) for table, (counter, _) in versions.items()),
+            object_part,
+            timezone.localdate().isoformat() if self.etag_daily else "",
+        ]
+        self.etag = quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest()[:24])
+        modified = max(seconds for _, seconds in versions.values())
+        if object_modified is not None:
+            modified = max(modified, object_modified.timestamp())
+        if self.etag_daily:
+            # overdue days moved on at local midnight
+            modified = max(modified, start_of_day(timezone.localdate()).timestamp())
+        self.last_modified = int(modified)
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if _etag_matches(self.etag, if_none_match):
+                raise NotModified()
+            return
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since:
+            since = parse_http_date_safe(if_modified_since)
+            if since is not None and self.last_modified <= since:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, "etag", None)
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(self.last_modified)
+            # per-user bodies: private, and revalidated on every use
+            response["Cache-Control"] = "private, no-cache"
+        return response
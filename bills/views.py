@@ -1,6 +1,4 @@
 from django.utils import timezone
-import io
-import pandas as pd
 
 from rest_framework import generics, status, permissions, viewsets
 from rest_framework.generics import GenericAPIView
@@ -9,6 +7,8 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 
 from django.http import HttpResponse
 from django.db import transaction
@@ -17,9 +17,8 @@ from django.utils.dateparse import parse_date
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
-from .models import Bill, Route, Outlet
+from .models import Bill, Route, Outlet, ImportJob, record_unassignments
 from bills.models import Bill
-from users.models import User
 from payments.models import Payment
 from .serializers import (
     BillSerializer,
@@ -30,8 +29,33 @@ from .serializers import (
     OutletSerializer,
     ExcelImportBillsSerializer,
     BillSimpleSerializer,
+    ImportJobCreateSerializer,
+    ImportJobSerializer,
+)
+from bills.pagination import BillPagination, AssignmentKeysetPagination, KeysetModeMixin
+from bills.importers import BillImporter, PaymentImporter
+from bills import jobs
+from bills.dateranges import filter_local_dates
+from bills.planning import QueryPlanMixin, plan_queryset
+from bills.fieldsets import requested_fields
+from bills.rowmappers import serialize_rows
+from bills.streaming import full_list_response
+from bills.columnar import ColumnarJSONRenderer, columnar_from_dicts, columnar_rows, wants_columnar
+from bills.sync import TOKEN_QUERY_PARAM, SyncDelta
+from bills.bootstrap import bootstrap_payload
+from bills import versions
+from bills.versions import ConditionalGetMixin, bump_versions
+from bills.references import ReferenceViewMixin, outlets as reference_outlets
+from bills.worklists import filter_worklist, get_worklist, invalidate_worklists, sort_worklist
+from bills.exports import (
+    BILL_EXPORT_COLUMNS,
+    BILL_EXPORT_FIELDS,
+    PAYMENT_EXPORT_COLUMNS,
+    PAYMENT_EXPORT_FIELDS,
+    build_export_frame,
+    streaming_export_response,
+    write_export_xlsx,
 )
-from bills.pagination import BillPagination
 
 
 class IsAdmin(permissions.BasePermission):
@@ -39,26 +63,135 @@ class IsAdmin(permissions.BasePermission):
         return request.user.is_authenticated and request.user.is_admin
 
 
-class BillListCreateView(generics.ListCreateAPIView):
+KEYSET_PARAMETERS = [
+    OpenApiParameter(
+        name='pagination',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description="(Optional) 'cursor' switches to keyset pagination (no OFFSET/COUNT).",
+        required=False,
+        enum=['cursor'],
+    ),
+    OpenApiParameter(
+        name='cursor',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='(Optional) Opaque cursor taken from a previous `next_cursor`.',
+        required=False,
+    ),
+    OpenApiParameter(
+        name='count',
+        type=OpenApiTypes.BOOL,
+        location=OpenApiParameter.QUERY,
+        description='(Optional, cursor mode) Include the total count (costs a COUNT query).',
+        required=False,
+    ),
+]
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        name='fields',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='(Optional) Comma-separated output fields to keep, e.g. id,invoice_number,remaining_amount.',
+        required=False,
+    ),
+    OpenApiParameter(
+        name='omit',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='(Optional) Comma-separated output fields to drop.',
+        required=False,
+    ),
+]
+
+AUTOCOMPLETE_PARAMETERS = [
+    OpenApiParameter(
+        name='q',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='Name prefix (case-insensitive).',
+        required=False,
+    ),
+    OpenApiParameter(
+        name='limit',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description='(Optional) Max results, default 10, at most 50.',
+        required=False,
+    ),
+]
+
+OVERDUE_PARAMETERS = [
+    OpenApiParameter(
+        name='min_overdue',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description='(Optional) Only bills at least this many days overdue (computed live).',
+        required=False,
+    ),
+]
+
+
+def min_overdue_param(request):
+    """?min_overdue=<days> as a non-negative int, or None when absent."""
+    raw = request.query_params.get('min_overdue')
+    if raw in (None, ''):
+        return None
+    try:
+        days = int(raw)
+    except ValueError:
+        days = -1
+    if days < 0:
+        raise ValidationError({'min_overdue': ['Must be a non-negative integer.']})
+    return days
+
+
+class BillListCreateView(ConditionalGetMixin, QueryPlanMixin, KeysetModeMixin, generics.ListCreateAPIView):
     """
     GET  /api/bills/    → list all bills (or filter by ?invoice_number=…)
     POST /api/bills/    → create a new bill
+
+    ?pagination=cursor (then ?cursor=<next_cursor>) switches to keyset paging
+    on (created_at, id): no OFFSET, and no COUNT unless ?count=true.
+
+    overdue_days is computed at query time (see BillQuerySet), so
+    ?ordering=-overdue_days and ?min_overdue=90 are always current.
+
+    ?format=columnar returns the compact columnar format (bills.columnar).
+
+    GET answers 304 to a current If-None-Match (see bills.versions).
     """
     serializer_class = BillSerializer  # overridden in get_serializer_class()
     permission_classes = (IsAdmin,)
     pagination_class = BillPagination
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer)
+    etag_tables = (versions.BILLS, versions.OUTLETS, versions.ROUTES, versions.USERS)
+    etag_daily = True
+    ordering_fields = ('created_at', 'invoice_date', 'overdue_days', 'remaining_amount')
 
     def get_queryset(self):
         """
-        Base queryset, optionally filtered by ?invoice_number=<value>.
-        Always ordered by -created_at.
+        Base queryset, optionally filtered by ?invoice_number=<value> and
+        ?min_overdue=<days>. Ordered by ?ordering (default -created_at).
         """
-        qs = Bill.objects.all().order_by('-created_at')
+        qs = Bill.objects.with_live_overdue()
         inv = self.request.query_params.get('invoice_number')
         if inv:
             # Filter any bill whose invoice_number contains the supplied string
             qs = qs.filter(invoice_number__icontains=inv)
-        return qs
+
+        min_overdue = min_overdue_param(self.request)
+        if min_overdue is not None:
+            qs = qs.min_overdue(min_overdue)
+
+        raw_ordering = self.request.query_params.get('ordering', '-created_at')
+        field = raw_ordering.lstrip('-')
+        if field not in self.ordering_fields:
+            raise ValidationError({'ordering': [f"Invalid ordering '{raw_ordering}'."]})
+        if field == 'overdue_days':
+            field = 'live_overdue_days'
+        return qs.order_by(f"-{field}" if raw_ordering.startswith('-') else field)
 
     def get_serializer_class(self):
         return BillCreateSerializer if self.request.method == 'POST' else BillSerializer
@@ -88,18 +221,40 @@ class BillListCreateView(generics.ListCreateAPIView):
                 description='(Optional) Filter bills whose invoice_number contains this string.',
                 required=False,
             ),
+            OpenApiParameter(
+                name='ordering',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="(Optional) created_at, invoice_date, overdue_days or remaining_amount; prefix '-' for descending. Default -created_at.",
+                required=False,
+            ),
+            *OVERDUE_PARAMETERS,
+            *FIELDSET_PARAMETERS,
+            *KEYSET_PARAMETERS,
         ]
     )
     def list(self, request, *args, **kwargs):
         """
         Override `list()` so that:
         1) If neither `page` nor `limit` is present, return all bills (filtered by invoice_number if given).
-        2) Otherwise, attempt to paginate using ?page & ?limit, falling back to defaults on invalid values.
+        2) Otherwise, paginate using ?page & ?limit; invalid values fall back to 1).
+        Cursor mode (?pagination=cursor / ?cursor=…) bypasses both and seeks by keyset.
         """
+        if self.uses_keyset():
+            return self.keyset_list(request)
+
         # 1) Grab the filtered queryset (accounts for invoice_number)
         base_qs = self.filter_queryset(self.get_queryset())
 
-        # 2) Try to paginate normally (DRF will read ?page & ?limit)
+        # 2) If neither page nor limit is in the query, return the full (filtered) set,
+        #    streamed as a JSON array chunk by chunk (see bills.streaming) –
+        #    no COUNT or page query first
+        if 'page' not in request.query_params and 'limit' not in request.query_params:
+            return full_list_response(
+                request, base_qs, self.get_serializer_class(), self.get_serializer_context()
+            )
+
+        # 3) Try to paginate normally (DRF will read ?page & ?limit)
         try:
             page_qs = self.paginate_queryset(base_qs)
         except Exception:
@@ -108,15 +263,13 @@ class BillListCreateView(generics.ListCreateAPIView):
             mutable_qs.pop('page', None)
             mutable_qs.pop('limit', None)
             request._request.GET = mutable_qs
-            page_qs = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
-
-        # 3) If neither page nor limit was in the query, return the full (filtered) set
-        if 'page' not in request.query_params and 'limit' not in request.query_params:
-            serializer = self.get_serializer(base_qs, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # …which leaves neither, so the full set as in 2)
+            return full_list_response(
+                request, base_qs, self.get_serializer_class(), self.get_serializer_context()
+            )
 
-        # 4) Otherwise, DRF pagination applies (either valid or after fallback). If paginate_queryset()
-        #    returned a page object, return the paginated response; else, return all.
+        # 4) Otherwise, DRF pagination applies. If paginate_queryset() returned
+        #    a page object, return the paginated response; else, return all.
         if page_qs is not None:
             serializer = self.get_serializer(page_qs, many=True)
             return self.get_paginated_response(serializer.data)
@@ -127,15 +280,28 @@ class BillListCreateView(generics.ListCreateAPIView):
 
 
 
-class BillDetailView(generics.RetrieveUpdateAPIView):
+class BillDetailView(ConditionalGetMixin, QueryPlanMixin, generics.RetrieveUpdateAPIView):
     """
     GET    /api/bills/{pk}/    → retrieve a bill
     PUT    /api/bills/{pk}/    → update a bill
     PATCH  /api/bills/{pk}/    → partial update
+
+    The ETag comes from the bill's own updated_at plus the outlet / route /
+    user counters (see bills.versions); a current If-None-Match gets 304.
     """
-    queryset = Bill.objects.all()
+    queryset = Bill.objects.with_live_overdue()
     permission_classes = (IsAdmin,)
     serializer_class   = BillSerializer
+    etag_tables = (versions.OUTLETS, versions.ROUTES, versions.USERS)
+    etag_daily = True
+
+    def get_object_version(self):
+        updated_at = (
+            Bill.objects.filter(pk=self.kwargs['pk'])
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+        return None if updated_at is None else (updated_at.isoformat(), updated_at)
 
 
 class BillAssignView(GenericAPIView):
@@ -154,7 +320,12 @@ class BillAssignView(GenericAPIView):
         dra_id   = ser.validated_data['dra_id']
 
         bills = Bill.objects.filter(id__in=bill_ids)
-        bills.update(assigned_to_id=dra_id)
+        with transaction.atomic():
+            invalidate_worklists({dra_id, *bills.values_list('assigned_to_id', flat=True)})
+            record_unassignments(bills, dra_id)
+            bills.update(assigned_to_id=dra_id, updated_at=timezone.now())
+            bump_versions(versions.BILLS)
+        bills = plan_queryset(bills.with_live_overdue(), BillSerializer)
 
         out = BillSerializer(bills, many=True)
         return Response(out.data, status=status.HTTP_200_OK)
@@ -177,8 +348,10 @@ class BillImportView(GenericAPIView):
       - "Cheque #"          (Optional: if your Payment model has a cheque_number field)
       - "Cheque Date"       (Optional: if your Payment model has a cheque_date field)
       - "Payment Date"      (Required: when the payment was made)
-    Additional columns (if present) are ignored. Each row is processed independently;
+    Additional columns (if present) are ignored. Each row is validated independently;
     errors are collected in the "errors" list, and successful rows increment "imported".
+    Valid rows are inserted in batches (settings.BILL_IMPORT_BATCH_SIZE) and the
+    touched bills' remaining_amount/status are recomputed once per batch.
 
     Returns a JSON response of the form:
       {
@@ -197,192 +370,73 @@ class BillImportView(GenericAPIView):
         # 1) Validate that a file was uploaded
         ser = self.get_serializer(data=request.data)
         ser.is_valid(raise_exception=True)
-        excel_file = ser.validated_data["file"]
-
-        # 2) Load into a pandas DataFrame
-        try:
-            df = pd.read_excel(excel_file)
-        except Exception as e:
-            return Response(
-                {"detail": f"Error reading Excel file: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        reader = ser.validated_data["reader"]
 
-        # 3) Normalize column names by stripping whitespace
-        df.columns = [c.strip() for c in df.columns]
-
-        # 4) The import sheet must at least contain these column headers:
-        required = {
-            "Invoice Number",
-            "Payment Amount",
-            "Username",
-            "Payment Date",
-        }
-        missing = required - set(df.columns)
+        # 2) The import sheet must at least contain these column headers
+        #    (the streaming reader parsed the header row once, whitespace-stripped):
+        required = set(PaymentImporter.REQUIRED_COLUMNS)
+        missing = required - set(reader.headers)
         if missing:
             return Response(
                 {"error": f"Missing required columns: {sorted(missing)}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        summary = {"imported": 0, "errors": []}
-
-        for idx, row in df.iterrows():
-            row_num = idx + 2  # Excel row = index + header row
-
-            # 5a) Invoice Number → lookup Bill
-            raw_inv = row.get("Invoice Number")
-            if pd.isna(raw_inv) or str(raw_inv).strip() == "":
-                summary["errors"].append(
-                    {"row": row_num, "error": "Invoice Number is blank"}
-                )
-                continue
-            invoice_number = str(raw_inv).strip()
-            bill = Bill.objects.filter(invoice_number=invoice_number).first()
-            if not bill:
-                summary["errors"].append(
-                    {"row": row_num, "error": f"Bill with Invoice Number '{invoice_number}' not found"}
-                )
-                continue
-
-            # 5b) Payment Amount → numeric
-            raw_amt = row.get("Payment Amount")
-            if pd.isna(raw_amt):
-                summary["errors"].append(
-                    {"row": row_num, "error": "Payment Amount is blank"}
-                )
-                continue
-            try:
-                amt_str = str(raw_amt).replace(",", "").replace("$", "")
-                payment_amount = float(amt_str)
-            except (ValueError, TypeError):
-                summary["errors"].append(
-                    {"row": row_num, "error": f"Invalid Payment Amount: '{raw_amt}'"}
-                )
-                continue
-
-            # 5c) Username → lookup User (dra)
-            raw_user = row.get("Username")
-            if pd.isna(raw_user) or str(raw_user).strip() == "":
-                summary["errors"].append(
-                    {"row": row_num, "error": "Username is blank"}
-                )
-                continue
-            identifier = str(raw_user).strip()
-            dra = (
-                User.objects.filter(username=identifier).first()
-                or User.objects.filter(email=identifier).first()
-            )
-            if not dra:
-                summary["errors"].append(
-                    {"row": row_num, "error": f"User '{identifier}' not found"}
-                )
-                continue
-
-            # 5d) Payment Date → parse to a date
-            raw_date = row.get("Payment Date")
-            if pd.isna(raw_date):
-                summary["errors"].append(
-                    {"row": row_num, "error": "Payment Date is blank"}
-                )
-                continue
-
-            if isinstance(raw_date, pd.Timestamp):
-                payment_date = raw_date.to_pydatetime()
-            else:
-                # Try ISO‐format first
-                parsed = parse_date(str(raw_date))
-                if parsed:
-                    # convert date → datetime at midnight
-                    payment_date = timezone.datetime(
-                        parsed.year, parsed.month, parsed.day, tzinfo=timezone.get_current_timezone()
-                    )
-                else:
-                    # Fallback: let pandas parse
-                    try:
-                        payment_date = pd.to_datetime(str(raw_date))
-                    except Exception:
-                        payment_date = None
-
-            if not payment_date:
-                summary["errors"].append(
-                    {"row": row_num, "error": f"Invalid Payment Date: '{raw_date}'"}
-                )
-                continue
-
-            # 5e) Optional: Cheque # and Cheque Date if your Payment model expects them
-            cheque_number = None
-            if "Cheque #" in df.columns:
-                raw_chq = row.get("Cheque #")
-                if not pd.isna(raw_chq):
-                    cheque_number = str(raw_chq).strip()
-
-            cheque_date = None
-            if "Cheque Date" in df.columns:
-                raw_chq_date = row.get("Cheque Date")
-                if not pd.isna(raw_chq_date):
-                    if isinstance(raw_chq_date, pd.Timestamp):
-                        cheque_date = raw_chq_date.to_pydatetime().date()
-                    else:
-                        parsed_chq = parse_date(str(raw_chq_date))
-                        if not parsed_chq:
-                            # fallback
-                            try:
-                                cheque_date = pd.to_datetime(str(raw_chq_date)).date()
-                            except:
-                                cheque_date = None
-                        else:
-                            cheque_date = parsed_chq
-
-            # 5f) Finally, create the Payment instance
-            try:
-                Payment.objects.create(
-                    bill=bill,
-                    dra=dra,
-                    amount=payment_amount,
-                    created_at=payment_date,
-                    cheque_number=cheque_number,
-                    cheque_date=cheque_date,
-                    payment_method="Imported",  # or default logic
-                )
-                summary["imported"] += 1
-            except Exception as e:
-                summary["errors"].append(
-                    {"row": row_num, "error": f"Database error: {str(e)}"}
-                )
-                continue
+        # 3) Stream row chunks into the bulk importer: bills/users resolved,
+        #    payments bulk-inserted and the affected bill balances recomputed
+        #    once per batch (see PaymentImporter)
+        importer = PaymentImporter()
+        for chunk in reader.chunks(importer.batch_size):
+            importer.import_batch(chunk)
+        summary = importer.summary
 
         return Response(summary, status=status.HTTP_200_OK)
 
 
-class RouteViewSet(viewsets.ReadOnlyModelViewSet):
+class RouteViewSet(ConditionalGetMixin, ReferenceViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     GET  /api/routes/              → list all routes
     GET  /api/routes/{pk}/         → retrieve a single route
     GET  /api/routes/{pk}/outlets/ → list outlets on this route
+    GET  /api/routes/autocomplete/?q=<prefix>&limit=<n> → routes by name prefix
+
+    Served from the in-process reference snapshot (bills.references).
     """
     queryset         = Route.objects.all().order_by('name')
     serializer_class = RouteSerializer
+    etag_tables      = (versions.ROUTES, versions.OUTLETS)
+    reference_table  = versions.ROUTES
 
     @action(detail=True, methods=['get'])
     def outlets(self, request, pk=None):
-        route = self.get_object()
-        qs    = Outlet.objects.filter(route=route)
-        page  = self.paginate_queryset(qs)
+        route = self.get_reference()
+        rows  = [o for o in reference_outlets().rows if o.route_id == route.pk]
+        context = self.get_serializer_context()
+        page  = self.paginate_queryset(rows)
         if page is not None:
-            serializer = OutletSerializer(page, many=True)
+            serializer = OutletSerializer(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
 
-        serializer = OutletSerializer(qs, many=True)
+        serializer = OutletSerializer(rows, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @extend_schema(parameters=AUTOCOMPLETE_PARAMETERS)
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        return self.autocomplete_response(request)
 
-class OutletViewSet(viewsets.ReadOnlyModelViewSet):
+
+class OutletViewSet(ConditionalGetMixin, ReferenceViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     GET /api/outlets/         → list all outlets (or filter by ?route_id=<id>)
     GET /api/outlets/{pk}/    → retrieve a single outlet
+    GET /api/outlets/autocomplete/?q=<prefix>&limit=<n> → outlets by name prefix
+
+    Served from the in-process reference snapshot (bills.references).
     """
     serializer_class = OutletSerializer
+    etag_tables      = (versions.OUTLETS, versions.ROUTES)
+    reference_table  = versions.OUTLETS
 
     def get_queryset(self):
         qs       = Outlet.objects.select_related('route').all()
@@ -391,19 +445,49 @@ class OutletViewSet(viewsets.ReadOnlyModelViewSet):
             qs = qs.filter(route_id=route_id)
         return qs
 
+    def filter_references(self, rows):
+        route_id = self.request.query_params.get('route_id')
+        if route_id is None:
+            return rows
+        return [o for o in rows if str(o.route_id) == route_id]
+
+    @extend_schema(parameters=AUTOCOMPLETE_PARAMETERS)
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        return self.autocomplete_response(request)
+
 class IsDRA(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user.is_authenticated and request.user.role == 'dra')
 
     
-class MyAssignmentsFlatView(APIView):
+class MyAssignmentsFlatView(ConditionalGetMixin, APIView):
     """
     GET /api/my-assignments-flat/?page=<n>&limit=<m>
-    Returns three arrays (routes, outlets, bills) for the logged-in user,
-    but ONLY paginates the 'bills' array.
+    Returns the logged-in user's open bills (with route/outlet names),
+    paginated. For routes, outlets and bills in one normalized payload see
+    MyAssignmentsBootstrapView.
+
+    GET /api/my-assignments-flat/?pagination=cursor&limit=<m>
+      → keyset pagination on the chosen ?ordering (plus id); follow
+        pagination.next_cursor via ?cursor=…. total_items only with ?count=true.
+
+    ?ordering=-overdue_days and ?min_overdue=<days> use live overdue days
+    (see BillQuerySet), served by the (status, invoice_date) index.
+
+    Page-number mode filters, sorts and pages the DRA's cached worklist
+    (bills/worklists.py) instead of querying; cursor mode stays on the
+    database.
+
+    ?format=columnar sends "bills" in the compact columnar format.
+
+    A current If-None-Match gets 304 (see bills.versions).
     """
 
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer)
+    etag_tables = (versions.BILLS, versions.OUTLETS, versions.ROUTES)
+    etag_daily = True
 
     def get(self, request, format=None):
         user = request.user
@@ -412,6 +496,7 @@ class MyAssignmentsFlatView(APIView):
         bills_qs = (
             Bill.objects
                 .filter(assigned_to=user, status='open')
+                .with_live_overdue()
         )
 
         # ─── 2) Apply optional query-param filters ──────────────────────────
@@ -438,10 +523,12 @@ class MyAssignmentsFlatView(APIView):
                 invoice_number__icontains=invoice_number
             )
 
- # ─── 6) Count total (for pagination) ─────────────────────────────────
-        total_bills = bills_qs.count()
+        # ─── 5b) Filter by live overdue days (invoice_date range) ───────────
+        min_overdue = min_overdue_param(request)
+        if min_overdue is not None:
+            bills_qs = bills_qs.min_overdue(min_overdue)
 
-        # ─── 7) Apply ordering + pagination ─────────────────────────────────
+        # ─── 6) Apply ordering ───────────────────────────────────────────────
         raw_ordering = request.query_params.get('ordering', 'outlet__route__name')
         ordering = raw_ordering.lstrip('-')
         direction = raw_ordering[:1] if raw_ordering.startswith('-') else ''
@@ -450,32 +537,80 @@ class MyAssignmentsFlatView(APIView):
             "id", "brand", "invoice_date",
             "outlet__route__name", "invoice_number",
             "outlet__name", "remaining_amount",
-            "actual_amount",
+            "actual_amount", "overdue_days",
         ]:
             return Response(
                 {"detail": f"Invalid ordering '{raw_ordering}'."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if ordering == "overdue_days":
+            # every bill here is open, so more overdue == older invoice_date;
+            # ordering on the indexed column avoids sorting on an expression
+            ordering = "invoice_date"
+            direction = "" if direction == "-" else "-"
+
         if direction == "-":
             bills_qs = bills_qs.order_by(f"-{ordering}")
         else:
             bills_qs = bills_qs.order_by(ordering)
 
+        # join outlet/route and load only the columns BillSimpleSerializer
+        # reads (for the ?fields= / ?omit= subset, if any); the ordering's
+        # relation stays joined, since ORDER BY and the cursor need it
+        context = {"request": request}
+        bills_qs = plan_queryset(
+            bills_qs, BillSimpleSerializer,
+            field_names=requested_fields(request, BillSimpleSerializer),
+        )
+
+        # ─── 7) Cursor mode: seek past the last row, skip COUNT by default ───
+        if AssignmentKeysetPagination.requested(request):
+            paginator = AssignmentKeysetPagination()
+            bills_page = paginator.paginate_queryset(bills_qs, request, view=self)
+            pagination = {
+                "limit":       paginator.page_size_value,
+                "next_cursor": paginator.next_cursor,
+                "next":        paginator.get_next_link(),
+            }
+            if paginator.count is not None:
+                pagination["total_items"] = paginator.count
+            return Response({
+                "bills": BillSimpleSerializer(bills_page, many=True, context=context).data,
+                "pagination": pagination,
+            })
+
+        # ─── 8) Page-number mode: filter, sort + slice the cached worklist ───
+        rows = filter_worklist(
+            get_worklist(user),
+            route_name=route_name,
+            outlet_name=outlet_name,
+            invoice_number=invoice_number,
+            min_overdue=min_overdue,
+        )
+        rows = sort_worklist(rows, raw_ordering)
+        total_bills = len(rows)
+
         page = int(request.query_params.get("page", 1))
         limit = int(request.query_params.get("limit", 25))
 
         start = (page - 1) * limit
         end = start + limit
-        bills_page_qs = bills_qs[start:end]
-
-        # ─── 8) Serialize only the “bills” portion ───────────────────────────
-        serialized_bills = BillSimpleSerializer(bills_page_qs, many=True).data
+        page_rows = rows[start:end]
+
+        # ─── 9) Trim to ?fields= / ?omit= (cached rows are complete) ─────────
+        field_names = requested_fields(request, BillSimpleSerializer)
+        if field_names is not None:
+            page_rows = [
+                {name: row[name] for name in field_names if name in row}
+                for row in page_rows
+            ]
+        serialized_bills = columnar_from_dicts(page_rows) if wants_columnar(request) else page_rows
 
-        # ─── 9) Compute total_pages via ceiling division ─────────────────────
+        # ─── 10) Compute total_pages via ceiling division ────────────────────
         total_pages = (total_bills + limit - 1) // limit if total_bills > 0 else 0
 
-        # ─── 10) Return the combined payload ─────────────────────────────────
+        # ─── 11) Return the combined payload ─────────────────────────────────
         return Response({
             "bills": serialized_bills,
             "pagination": {
@@ -485,7 +620,76 @@ class MyAssignmentsFlatView(APIView):
                 "total_pages": total_pages,
             },
         })
-    
+
+
+class MyAssignmentsBootstrapView(APIView):
+    """
+    GET /api/bills/my-assignments-bootstrap/
+    App start-up in one round trip: the logged-in DRA's open bills plus the
+    distinct routes and outlets they reference, each sent once (see
+    bills/bootstrap.py), and a token to continue with delta syncs.
+
+    ?fields= / ?omit= apply to "bills"; ?format=columnar sends every array
+    columnar.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer)
+
+    @extend_schema(parameters=FIELDSET_PARAMETERS, responses=OpenApiTypes.OBJECT)
+    def get(self, request, format=None):
+        return Response(bootstrap_payload(request))
+
+
+class MyAssignmentsSyncView(APIView):
+    """
+    GET /api/bills/my-assignments-sync/?token=<token>
+    Delta sync of the logged-in DRA's open assigned bills (see bills/sync.py):
+    only the bills changed since the token, the ids to drop, and the next
+    token. Without a token (or with an expired one) "full" is true and
+    "bills" is the whole worklist.
+
+    ?fields= / ?omit= apply to "bills"; ?format=columnar sends them columnar.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name=TOKEN_QUERY_PARAM,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='(Optional) The `token` returned by the previous sync.',
+                required=False,
+            ),
+            *FIELDSET_PARAMETERS,
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request, format=None):
+        # ─── 1) Work out what changed since the client's token ───────────────
+        delta = SyncDelta(request.user, request.query_params.get(TOKEN_QUERY_PARAM))
+
+        # ─── 2) Plan + serialize the changed bills (values_list fast path) ───
+        context = {"request": request}
+        bills_qs = plan_queryset(
+            delta.bills.with_live_overdue().order_by("id"), BillSimpleSerializer,
+            field_names=requested_fields(request, BillSimpleSerializer),
+        )
+        if wants_columnar(request):
+            serialized_bills = columnar_rows(bills_qs, BillSimpleSerializer, context)
+        else:
+            serialized_bills = serialize_rows(bills_qs, BillSimpleSerializer, context)
+
+        return Response({
+            "token":   delta.token,
+            "full":    delta.full,
+            "bills":   serialized_bills,
+            "removed": delta.removed,
+        })
+
 
 def export_bills_xlsx(start_date=None, end_date=None):
     """
@@ -508,91 +712,33 @@ def export_bills_xlsx(start_date=None, end_date=None):
 
     Returns: (content_bytes, filename, content_type)
     """
-    bills_qs = Bill.objects.select_related("outlet__route").all()
+    # 1) Restrict to the invoice_date window
+    bills_qs = Bill.objects.all()
     if start_date:
         bills_qs = bills_qs.filter(invoice_date__gte=start_date)
     if end_date:
         bills_qs = bills_qs.filter(invoice_date__lte=end_date)
 
-    raw_values = bills_qs.values(
-        "pk",
-        "brand",
-        "invoice_date",
-        "invoice_number",
-        "remaining_amount",
-        "actual_amount",
-        "outlet__name",
-        "outlet__route__name",
+    # 2) Build the frame: Overdue Days, categoricals and fixed-point money
+    #    are all vectorized (see build_export_frame)
+    bills_df = build_export_frame(
+        bills_qs,
+        BILL_EXPORT_FIELDS,
+        invoice_date_field="invoice_date",
+        categorical=("brand", "outlet__route__name", "outlet__name"),
+        money=("remaining_amount", "actual_amount"),
     )
+    bills_df = bills_df[BILL_EXPORT_COLUMNS]
 
-    bills_df = pd.DataFrame.from_records(raw_values)
-
-    if bills_df.empty:
-        bills_df = pd.DataFrame(
-            columns=[
-                "pk",
-                "brand",
-                "invoice_date",
-                "invoice_number",
-                "remaining_amount",
-                "actual_amount",
-                "outlet__name",
-                "outlet__route__name",
-            ]
-        )
-
-   
-    today = timezone.localdate()
-    def compute_overdue(row):
-        inv_date = row["invoice_date"]
-        if pd.isna(inv_date):
-            return 0
-        inv = inv_date.to_pydatetime().date() if isinstance(inv_date, pd.Timestamp) else inv_date
-        delta = (today - inv).days
-        return max(delta, 0)
-
-    bills_df["Overdue Days"] = bills_df.apply(compute_overdue, axis=1)
-
-    bills_df = bills_df.rename(
-        columns={
-            "pk": "Bill ID",
-            "brand": "Brand",
-            "invoice_date": "Invoice Date",
-            "outlet__route__name": "Route Name",
-            "invoice_number": "Invoice Number",
-            "outlet__name": "Outlet Name",
-            "remaining_amount": "Outstanding Amount",
-            "actual_amount": "Invoice Bill Amount",
-        }
-    )
-
-    ordered_columns = [
-        "Bill ID",
-        "Brand",
-        "Invoice Date",
-        "Route Name",
-        "Invoice Number",
-        "Outlet Name",
-        "Outstanding Amount",
-        "Overdue Days",
-        "Invoice Bill Amount",
-    ]
-    bills_df = bills_df[ordered_columns]
-
-    # 8) Strip timezone info from “Invoice Date” if present
-    if "Invoice Date" in bills_df.columns and pd.api.types.is_datetime64tz_dtype(bills_df["Invoice Date"].dtype):
-        bills_df["Invoice Date"] = bills_df["Invoice Date"].dt.tz_convert(None)
-
-    # 9) Build a filename based on the date window
+    # 3) Build a filename based on the date window
     start_str = start_date.isoformat() if start_date else "all"
     end_str = end_date.isoformat() if end_date else "all"
     filename = f"bills_{start_str}_to_{end_str}.xlsx"
 
-    # 10) Write to an in‐memory XLSX file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        bills_df.to_excel(writer, index=False, sheet_name="Bills")
-    content = output.getvalue()
+    # 4) Write to an in‐memory XLSX file
+    content = write_export_xlsx(
+        bills_df, "Bills", money_columns=("Outstanding Amount", "Invoice Bill Amount")
+    )
     content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
     return content, filename, content_type
@@ -619,101 +765,78 @@ def export_payments_xlsx(start_date=None, end_date=None):
     Returns: (content_bytes, filename, content_type)
     """
 
-    payments_qs = Payment.objects.select_related("bill__outlet__route", "dra").all()
-    if start_date:
-        payments_qs = payments_qs.filter(created_at__date__gte=start_date)
-    if end_date:
-        payments_qs = payments_qs.filter(created_at__date__lte=end_date)
-
-   
-    raw_values = payments_qs.values(
-        "bill__pk",
-        "bill__brand",
-        "bill__invoice_date",
-        "bill__outlet__route__name",
-        "bill__invoice_number",
-        "bill__outlet__name",
-        "amount",
-        "dra__username",
-    )
-
-    payments_df = pd.DataFrame.from_records(raw_values)
-
-    if payments_df.empty:
-        payments_df = pd.DataFrame(
-            columns=[
-                "bill__pk",
-                "bill__brand",
-                "bill__invoice_date",
-                "bill__outlet__route__name",
-                "bill__invoice_number",
-                "bill__outlet__name",
-                "amount",
-                "dra__username",
-            ]
-        )
-
-    today = timezone.localdate()
-
-    def compute_overdue(row):
-        inv_date = row["bill__invoice_date"]
-        if pd.isna(inv_date):
-            return 0
-        inv = inv_date.to_pydatetime().date() if isinstance(inv_date, pd.Timestamp) else inv_date
-        delta = (today - inv).days
-        return max(delta, 0)
-
-    payments_df["Overdue Days"] = payments_df.apply(compute_overdue, axis=1)
-
-    payments_df = payments_df.rename(
-        columns={
-            "bill__pk":                "Bill ID",
-            "bill__brand":             "Brand",
-            "bill__invoice_date":      "Invoice Date",
-            "bill__outlet__route__name": "Route Name",
-            "bill__invoice_number":    "Invoice Number",
-            "bill__outlet__name":      "Outlet Name",
-            "amount":                  "Payment Amount",
-            "dra__username":           "Username",
-        }
+    # 1) Restrict to the payment date window (a created_at timestamp range)
+    payments_qs = filter_local_dates(Payment.objects.all(), "created_at", start_date, end_date)
+
+    # 2) Build the frame: Overdue Days, categoricals and fixed-point money
+    #    are all vectorized (see build_export_frame)
+    payments_df = build_export_frame(
+        payments_qs,
+        PAYMENT_EXPORT_FIELDS,
+        invoice_date_field="bill__invoice_date",
+        categorical=(
+            "bill__brand",
+            "bill__outlet__route__name",
+            "bill__outlet__name",
+            "dra__username",
+        ),
+        money=("amount",),
     )
+    payments_df = payments_df[PAYMENT_EXPORT_COLUMNS]
 
-    ordered_columns = [
-        "Bill ID",
-        "Brand",
-        "Invoice Date",
-        "Route Name",
-        "Invoice Number",
-        "Outlet Name",
-        "Payment Amount",
-        "Username",
-        "Overdue Days",
-    ]
-    payments_df = payments_df[ordered_columns]
-
-    # 7) Drop any timezone info from “Invoice Date” if present
-    if "Invoice Date" in payments_df.columns and pd.api.types.is_datetime64tz_dtype(payments_df["Invoice Date"].dtype):
-        payments_df["Invoice Date"] = payments_df["Invoice Date"].dt.tz_convert(None)
-
-    # 8) Build the output filename based on the date window
+    # 3) Build the output filename based on the date window
     start_str = start_date.isoformat() if start_date else "all"
     end_str = end_date.isoformat() if end_date else "all"
     filename = f"payments_{start_str}_to_{end_str}.xlsx"
 
-    # 9) Write DataFrame to an in‐memory XLSX file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        payments_df.to_excel(writer, index=False, sheet_name="Payments")
-    content = output.getvalue()
+    # 4) Write DataFrame to an in‐memory XLSX file
+    content = write_export_xlsx(payments_df, "Payments", money_columns=("Payment Amount",))
     content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
     return content, filename, content_type
 
 
+EXPORT_MODE_PARAMETERS = [
+    OpenApiParameter(
+        name="file_format",
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description="(Optional) 'xlsx' (default) or 'csv'. CSV is always streamed.",
+        required=False,
+        enum=["xlsx", "csv"],
+    ),
+    OpenApiParameter(
+        name="stream",
+        type=OpenApiTypes.BOOL,
+        location=OpenApiParameter.QUERY,
+        description="(Optional) Stream the XLSX export instead of building it in memory.",
+        required=False,
+    ),
+]
+
+
+def export_mode(request):
+    """
+    Read ?file_format= and ?stream= for the export views.
+    Returns (file_format, stream); file_format is None when invalid.
+    """
+    file_format = request.query_params.get("file_format", "xlsx").lower()
+    if file_format not in ("xlsx", "csv"):
+        return None, False
+    stream = file_format == "csv" or (
+        request.query_params.get("stream", "").lower() in ("1", "true", "yes")
+    )
+    return file_format, stream
+
+
 class BillExportView(APIView):
     """
     GET /api/bills/export-bills/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
       → returns a single XLSX file containing only bills in that date range.
+
+    Streaming mode (bounded memory, rows read in chunks):
+      • ?stream=true          → XLSX built with a write-only workbook
+      • ?file_format=csv      → CSV, first bytes sent immediately
     """
     permission_classes = (IsAuthenticated,)  # or (IsAuthenticated,) if you want auth
 
@@ -733,6 +856,7 @@ class BillExportView(APIView):
                 description="(Optional) YYYY-MM-DD. Filter bills with invoice_date ≤ end_date.",
                 required=False,
             ),
+            *EXPORT_MODE_PARAMETERS,
         ],
         responses={
             200: OpenApiTypes.BINARY,
@@ -757,6 +881,15 @@ class BillExportView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        file_format, stream = export_mode(request)
+        if file_format is None:
+            return Response(
+                {"detail": "Invalid file_format. Must be 'xlsx' or 'csv'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if stream:
+            return streaming_export_response("bills", file_format, start_date, end_date)
+
         content, filename, content_type = export_bills_xlsx(start_date, end_date)
         resp = HttpResponse(content, content_type=content_type)
         resp["Content-Disposition"] = f'attachment; filename="{filename}"'
@@ -767,6 +900,10 @@ class PaymentExportView(APIView):
     """
     GET /api/bills/export-payments/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
       → returns a single XLSX file containing only payments in that date range.
+
+    Streaming mode (bounded memory, rows read in chunks):
+      • ?stream=true          → XLSX built with a write-only workbook
+      • ?file_format=csv      → CSV, first bytes sent immediately
     """
     permission_classes = (IsAuthenticated,)  # or (IsAuthenticated,) if you want auth
 
@@ -786,6 +923,7 @@ class PaymentExportView(APIView):
                 description="(Optional) YYYY-MM-DD. Filter payments with created_at ≤ end_date.",
                 required=False,
             ),
+            *EXPORT_MODE_PARAMETERS,
         ],
         responses={
             200: OpenApiTypes.BINARY,
@@ -810,6 +948,15 @@ class PaymentExportView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        file_format, stream = export_mode(request)
+        if file_format is None:
+            return Response(
+                {"detail": "Invalid file_format. Must be 'xlsx' or 'csv'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if stream:
+            return streaming_export_response("payments", file_format, start_date, end_date)
+
         content, filename, content_type = export_payments_xlsx(start_date, end_date)
         resp = HttpResponse(content, content_type=content_type)
         resp["Content-Disposition"] = f'attachment; filename="{filename}"'
@@ -820,102 +967,75 @@ class ImportBillsFromExcelAPIView(APIView):
     permission_classes = (IsAuthenticated,)
 
     # map Excel headers → our internal snake_case keys
-    HEADER_MAP = {
-        'Brand':               'brand',
-        'Invoice Date':        'invoice_date',
-        'Route Name':          'route_name',
-        'Invoice Number':      'invoice_number',
-        'Outlet Name':         'outlet_name',
-        'Outstanding Amount':  'outstanding_amount',
-        'Overdue Days':        'overdue_days',
-        'Invoice Bill Amount': 'bill_amount',
-    }
+    HEADER_MAP = BillImporter.HEADER_MAP
 
     def post(self, request, *args, **kwargs):
-        # 1) validate upload
+        # 1) validate upload (header row is checked by the serializer)
         ser = ExcelImportBillsSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
-        excel_file = ser.validated_data['file']
+        reader = ser.validated_data['reader']
 
-        # 2) read into a DataFrame
-        try:
-            df = pd.read_excel(excel_file, engine='openpyxl')
-        except Exception as e:
-            return Response(
-                {'detail': f'Could not read Excel file: {e}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # 3) clean & rename headers
-        df.columns = [c.strip() for c in df.columns]
-        df.rename(columns=self.HEADER_MAP, inplace=True)
-
-        # 4) check all required columns are present
-        missing = [c for c in self.HEADER_MAP.values() if c not in df.columns]
-        if missing:
-            return Response(
-                {'detail': f'Missing columns: {", ".join(missing)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # 2) rename headers → our internal snake_case keys
+        reader.header_map = self.HEADER_MAP
 
-        imported = []
-        errors = []
+        # 3) stream row chunks from the sheet into the set-based importer
+        #    (batched bulk inserts); only one chunk is held in memory
+        importer = BillImporter()
+        for chunk in reader.chunks(importer.batch_size):
+            importer.import_batch(chunk)
+        imported = importer.imported
+        errors = importer.errors
 
-        # 5) process rows in one transaction
-        with transaction.atomic():
-            for idx, row in df.iterrows():
-                excel_row = idx + 2  # for human-friendly errors
-                try:
-                    # parse & coerce types
-                    brand          = str(row['brand']).strip()
-                    invoice_date   = pd.to_datetime(row['invoice_date']).date()
-                    route_name     = str(row['route_name']).strip()
-                    invoice_number = str(row['invoice_number']).strip()
-                    outlet_name    = str(row['outlet_name']).strip()
-                    outstanding_amt= float(row['outstanding_amount'])
-                    overdue_days   = int(row['overdue_days'])
-                    bill_amount    = float(row['bill_amount'])
-
-                    # skip dupes
-                    if Bill.objects.filter(invoice_number=invoice_number).exists():
-                        continue
-
-                    # get/create Route
-                    route, _ = Route.objects.get_or_create(name=route_name)
-
-                    # get/create Outlet (with correct route FK)
-                    outlet, created = Outlet.objects.get_or_create(
-                        name=outlet_name,
-                        defaults={'route': route}
-                    )
-                    if not created and outlet.route_id != route.id:
-                        outlet.route = route
-                        outlet.save(update_fields=['route'])
-
-                    # create Bill (assigned_to left NULL)
-                    bill = Bill.objects.create(
-                        brand=brand,
-                        invoice_date=invoice_date,
-                        outlet=outlet,
-                        invoice_number=invoice_number,
-                        actual_amount=bill_amount,
-                        # no assigned_to – leave it for manual assignment later
-                    )
-
-                    # set remaining & overdue
-                    Bill.objects.filter(pk=bill.pk).update(
-                        remaining_amount=outstanding_amt,
-                        overdue_days=overdue_days
-                    )
-
-                    imported.append(bill)
-
-                except Exception as e:
-                    errors.append({'row': excel_row, 'error': str(e)})
-
-        # 6) serialize & return
+        # 4) serialize & return
         out_ser = BillSimpleSerializer(imported, many=True)
         return Response({
             'imported': out_ser.data,
             'errors':   errors,
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_201_CREATED)
+
+
+class ImportJobCreateView(GenericAPIView):
+    """
+    POST /api/bills/import-jobs/   (multipart: kind=bills|payments, file=<xlsx>)
+      → validates the header row, stores the upload and queues it on the local
+        worker pool. Returns 202 with the job id immediately; poll
+        /api/bills/import-jobs/<id>/ for progress.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = (IsAuthenticated,)
+    serializer_class = ImportJobCreateSerializer
+
+    @extend_schema(
+        request   = ImportJobCreateSerializer,
+        responses = {202: ImportJobSerializer},
+    )
+    def post(self, request, *args, **kwargs):
+        ser = self.get_serializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            job = ImportJob.objects.create(
+                kind=ser.validated_data["kind"],
+                file=ser.validated_data["file"],
+                created_by=request.user,
+            )
+            jobs.submit(job)
+
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportJobDetailView(generics.RetrieveAPIView):
+    """
+    GET /api/bills/import-jobs/<id>/
+      → status, rows processed, rows imported, errors so far and throughput
+        (rows/second) of an import job. Admins see every job, other users
+        only their own.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = ImportJobSerializer
+
+    def get_queryset(self):
+        qs = ImportJob.objects.all()
+        if not self.request.user.is_admin:
+            qs = qs.filter(created_by=self.request.user)
+        return qs
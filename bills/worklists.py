@@ -0,0 +1,160 @@
+# bills/worklists.py
+"""
+Per-DRA cached worklist behind MyAssignmentsFlatView.
+
+A DRA's worklist is their open assigned bills, already rendered by
+BillSimpleSerializer, held in Django's cache (WORKLIST_CACHE alias,
+default "default"). Filtering (?route_name=, ?outlet_name=,
+?invoice_number=, ?min_overdue=), sorting (?ordering=) and paging then run
+in Python over the cached list, so repeated refreshes never reach the
+database.
+
+Keys carry the local date, because overdue_days is computed live and
+changes at midnight, a global generation and the DRA's own version:
+
+    worklist:<generation>:<version>:<user id>:<YYYY-MM-DD>
+
+Both numbers are ChangeCounter rows (bills/versions.py), "worklist" and
+"worklist:<user id>", so they are shared by every worker process and
+management command even when the cache itself is per process.
+Invalidation never deletes anything: it bumps a counter after the
+transaction commits, and the stale entry just ages out. A refresh reads
+the counters *before* building the list, so one that raced a write
+caches under the old key and the next refresh misses:
+
+  • invalidate_worklists(user_ids) for bill saves/deletes, assignments and
+    payments (the bill's assignee, plus the previous one on reassignment),
+  • invalidate_bill_worklists(bill_ids) when only the bills are known,
+  • bump_worklist_generation() for changes that touch everybody's list
+    (route / outlet renames, bulk repairs).
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Bill
+from .planning import plan_queryset
+from .rowmappers import serialize_rows
+from .serializers import BillSimpleSerializer
+from .sync import worklist
+from .versions import bump_counters, counter_values
+
+GENERATION_COUNTER = "worklist"
+DEFAULT_WORKLIST_CACHE_TIMEOUT = 6 * 60 * 60
+
+# ?ordering= name → (key in the cached row, sort key of its value)
+SORT_KEYS = {
+    "id":                  ("id", None),
+    "brand":               ("brand", None),
+    "invoice_date":        ("invoice_date", None),
+    "outlet__route__name": ("route_name", None),
+    "invoice_number":      ("invoice_number", None),
+    "outlet__name":        ("outlet_name", None),
+    "remaining_amount":    ("remaining_amount", Decimal),
+    "actual_amount":       ("actual_amount", Decimal),  # rendered as a string
+    "overdue_days":        ("overdue_days", None),
+}
+
+
+def worklist_cache():
+    return caches[getattr(settings, "WORKLIST_CACHE", "default")]
+
+
+def worklist_timeout():
+    return getattr(settings, "WORKLIST_CACHE_TIMEOUT", DEFAULT_WORKLIST_CACHE_TIMEOUT)
+
+
+def _user_counter(user_id):
+    return f"worklist:{user_id}"
+
+
+def worklist_key(user_id, day=None):
+    """The cache key of `user_id`'s worklist as of now (one query)."""
+    user_counter = _user_counter(user_id)
+    counters = counter_values(GENERATION_COUNTER, user_counter)
+    generation, version = counters[GENERATION_COUNTER][0], counters[user_counter][0]
+    day = day or timezone.localdate()
+    return f"worklist:{generation}:{version}:{user_id}:{day.isoformat()}"
+
+
+# ─── reading ────────────────────────────────────────────────────────────────
+def build_worklist(user):
+    """The rendered open bills assigned to `user` (one query)."""
+    bills_qs = plan_queryset(
+        worklist(user).with_live_overdue().order_by("id"), BillSimpleSerializer,
+    )
+    return serialize_rows(bills_qs, BillSimpleSerializer)
+
+
+def get_worklist(user):
+    """`user`'s worklist from the cache, built and stored on a miss."""
+    cache = worklist_cache()
+    key = worklist_key(user.pk)  # before the build: a racing write moves it on
+    rows = cache.get(key)
+    if rows is None:
+        rows = build_worklist(user)
+        cache.set(key, rows, worklist_timeout())
+    return rows
+
+
+def filter_worklist(rows, route_name=None, outlet_name=None, invoice_number=None, min_overdue=None):
+    """The same filters MyAssignmentsFlatView applies in SQL (icontains…)."""
+    needles = [
+        (field, value.casefold())
+        for field, value in (
+            ("route_name", route_name),
+            ("outlet_name", outlet_name),
+            ("invoice_number", invoice_number),
+        )
+        if value
+    ]
+    if min_overdue is not None:
+        # every bill here is open: overdue ≥ n ⇔ invoice_date ≤ today − n
+        latest = timezone.localdate() - datetime.timedelta(days=min_overdue)
+    out = []
+    for row in rows:
+        if any(needle not in (row.get(field) or "").casefold() for field, needle in needles):
+            continue
+        if min_overdue is not None and row["invoice_date"] > latest:
+            continue
+        out.append(row)
+    return out
+
+
+def sort_worklist(rows, ordering):
+    """Rows ordered like order_by(ordering), ties broken by id."""
+    descending = ordering.startswith("-")
+    key, convert = SORT_KEYS[ordering.lstrip("-")]
+    convert = convert or (lambda value: value)
+
+    def sort_key(row):
+        value = row.get(key)
+        # NULLs sort first ascending / last descending, as on sqlite/mysql
+        return (value is not None, convert(value) if value is not None else 0, row["id"])
+
+    return sorted(rows, key=sort_key, reverse=descending)
+
+
+# ─── invalidation ───────────────────────────────────────────────────────────
+def invalidate_worklists(user_ids):
+    """Move the worklists of `user_ids` to new keys once the transaction commits."""
+    user_ids = {pk for pk in user_ids if pk is not None}
+    if user_ids:
+        bump_counters(*sorted(_user_counter(pk) for pk in user_ids))
+
+
+def invalidate_bill_worklists(bill_ids):
+    """invalidate_worklists() for whoever `bill_ids` are assigned to."""
+    bill_ids = {pk for pk in bill_ids if pk is not None}
+    if bill_ids:
+        invalidate_worklists(
+            Bill.objects.filter(pk__in=bill_ids).values_list("assigned_to_id", flat=True)
+        )
+
+
+def bump_worklist_generation():
+    """Invalidate every DRA's worklist at once (after commit)."""
+    bump_counters(GENERATION_COUNTER)
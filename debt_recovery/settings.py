@@ -143,9 +143,52 @@ EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = 'no-reply@example.com'
 
 
+# Excel imports: rows inserted per bulk_create batch
+BILL_IMPORT_BATCH_SIZE = 1000
+
+# Background import jobs (bills/jobs.py): worker threads per process, and
+# seconds without a heartbeat after which a running job is resumed elsewhere
+IMPORT_JOB_WORKERS = 2
+IMPORT_JOB_STALE_AFTER = 300
+
+# Streaming exports: rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Unpaginated list endpoints stream their JSON array in chunks of this many rows
+LIST_STREAM_CHUNK_SIZE = 1000
+
+# Delta sync (bills/sync.py): seconds each sync re-reads before the client's
+# token (late commits), and days tombstones / tokens stay valid
+SYNC_TOKEN_OVERLAP = 60
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Per-DRA worklist cache (bills/worklists.py), keyed by change counters in
+# the database so every process sees an invalidation; the timeout only
+# bounds memory for agents who stopped refreshing. LocMemCache keeps a copy
+# per worker process; a shared backend (Redis…) builds each list once.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'debt-recovery',
+    },
+}
+WORKLIST_CACHE = 'default'
+WORKLIST_CACHE_TIMEOUT = 6 * 60 * 60
+
+# Memory-mapped routes / outlets / agents snapshot shared by all workers on
+# the host (bills/snapshots.py), e.g. BASE_DIR / 'var' / 'reference.snapshot';
+# None keeps a copy in each process instead
+REFERENCE_SNAPSHOT_PATH = None
+
+
 # Cron Jobs
 CRONJOBS = [
     ('30 23 * * *', 'django.core.management.call_command', ['send_daily_reports']),
+    ('15 3 * * *', 'django.core.management.call_command', ['purge_assignment_tombstones']),
+    # import jobs orphaned by a restart (bills/jobs.py): a job is only
+    # reclaimed once its heartbeat is IMPORT_JOB_STALE_AFTER old, so a run
+    # while the owning worker is still alive is a no-op
+    ('*/5 * * * *', 'django.core.management.call_command', ['resume_import_jobs']),
 ]
 
 
@@ -160,6 +203,10 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 STATIC_URL = 'static/'
+
+# Uploaded files (import job spreadsheets)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
 # STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 
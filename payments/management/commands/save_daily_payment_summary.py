@@ -1,18 +1,17 @@
 # payments/management/commands/save_daily_payment_summary.py
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import Sum, Q, Value, DecimalField
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from payments.models import Payment, DailyPaymentSummary
+from payments.summaries import rebuild_daily_summaries
 
 
 class Command(BaseCommand):
     help = (
-        "Compute and save the totals (cash, upi, cheque) for yesterday, "
-        "and store them in DailyPaymentSummary."
+        "Recompute the totals (cash, upi, cheque) for yesterday, a --date or "
+        "a --start/--end range from the payments, and store them in "
+        "DailyPaymentSummary. Payment writes keep the summaries current; "
+        "this backfills and repairs them."
     )
 
     def add_arguments(self, parser):
@@ -24,73 +23,53 @@ class Command(BaseCommand):
                 "Defaults to yesterday (relative to local date)."
             ),
         )
+        parser.add_argument(
+            "--start",
+            type=str,
+            help="First date of a range to rebuild, in YYYY-MM-DD (with --end).",
+        )
+        parser.add_argument(
+            "--end",
+            type=str,
+            help="Last date of the range (inclusive), in YYYY-MM-DD. Defaults to yesterday.",
+        )
+
+    def parse_date(self, raw, option):
+        try:
+            return timezone.datetime.strptime(raw, "%Y-%m-%d").date()
+        except ValueError:
+            self.stderr.write(f"Error: --{option} must be in YYYY-MM-DD format.")
+            return None
 
     def handle(self, *args, **options):
-        # 1) Determine target_date (either from --date or yesterday).
-        if options["date"]:
-            try:
-                target_date = timezone.datetime.strptime(
-                    options["date"], "%Y-%m-%d"
-                ).date()
-            except ValueError:
-                self.stderr.write("Error: --date must be in YYYY-MM-DD format.")
+        # 1) Determine the range: --start/--end, --date, or yesterday.
+        yesterday = timezone.localdate() - timezone.timedelta(days=1)
+        if options["start"]:
+            start_date = self.parse_date(options["start"], "start")
+            end_date = self.parse_date(options["end"], "end") if options["end"] else yesterday
+            if start_date is None or end_date is None:
+                return
+            if start_date > end_date:
+                self.stderr.write("Error: --start must not be after --end.")
+                return
+        elif options["date"]:
+            start_date = end_date = self.parse_date(options["date"], "date")
+            if start_date is None:
                 return
         else:
-            today = timezone.localdate()
-            target_date = today - timezone.timedelta(days=1)
+            start_date = end_date = yesterday
 
-        self.stdout.write(f"Aggregating payments for {target_date} …")
+        self.stdout.write(f"Aggregating payments for {start_date} … {end_date} …")
 
-        # 2) Filter Payment rows whose created_at__date == target_date.
-        payments = Payment.objects.filter(created_at__date=target_date)
+        # 2) One GROUP BY (date, payment_method) query, one upsert.
+        summaries = rebuild_daily_summaries(start_date, end_date)
 
-        # 3) Compute sums by method, wrapping fallback 0 as DecimalField.
-        aggs = payments.aggregate(
-            cash_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="cash")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-            upi_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="upi")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-            cheque_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="cheque")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-        )
-
-        cash_total = aggs["cash_sum"]
-        upi_total = aggs["upi_sum"]
-        cheque_total = aggs["cheque_sum"]
-
-        # 4) Upsert into DailyPaymentSummary.
-        with transaction.atomic():
-            summary_obj, created = DailyPaymentSummary.objects.update_or_create(
-                date=target_date,
-                defaults={
-                    "cash_total": cash_total,
-                    "upi_total": upi_total,
-                    "cheque_total": cheque_total,
-                },
-            )
-
-        if created:
+        if len(summaries) == 1:
+            summary = summaries[0]
             self.stdout.write(
-                f"Created DailyPaymentSummary for {target_date}: "
-                f"cash ₹{cash_total}, upi ₹{upi_total}, cheque ₹{cheque_total}."
+                f"Saved DailyPaymentSummary for {summary.date}: "
+                f"cash ₹{summary.cash_total}, upi ₹{summary.upi_total}, "
+                f"cheque ₹{summary.cheque_total}."
             )
         else:
-            self.stdout.write(
-                f"Updated DailyPaymentSummary for {target_date}: "
-                f"cash ₹{cash_total}, upi ₹{upi_total}, cheque ₹{cheque_total}."
-            )
+            self.stdout.write(f"Saved {len(summaries)} daily payment summaries.")
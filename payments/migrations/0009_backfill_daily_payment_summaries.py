@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+SUMMARY_COLUMNS = {"cash": "cash_total", "upi": "upi_total", "cheque": "cheque_total"}
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Payment writes now maintain DailyPaymentSummary incrementally (and the
+    today-totals endpoint reads it), so rebuild every day that has payments
+    first: one GROUP BY (local date, payment_method) query.
+    """
+    Payment = apps.get_model("payments", "Payment")
+    DailyPaymentSummary = apps.get_model("payments", "DailyPaymentSummary")
+    grouped = (
+        Payment.objects.filter(payment_method__in=SUMMARY_COLUMNS)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "payment_method")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    rows = {}
+    for group in grouped:
+        row = rows.setdefault(group["day"], DailyPaymentSummary(date=group["day"]))
+        setattr(row, SUMMARY_COLUMNS[group["payment_method"]], group["total"])
+    DailyPaymentSummary.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=list(SUMMARY_COLUMNS.values()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.dispatch import receiver
-from django.db.models.signals import post_save
-from django.db.models import Sum
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
 from decimal import Decimal
+from bills import versions
+from bills.expressions import overdue_days_expression
 from bills.models import Bill
+from bills.versions import bump_versions
 
 class Payment(models.Model):
     METHOD_CHOICES = (('cash','Cash'),('upi','UPI'),('cheque','Cheque'))
@@ -19,17 +23,160 @@ class Payment(models.Model):
     cheque_number  = models.CharField(max_length=50, blank=True, null=True)
     cheque_date    = models.DateField(blank=True, null=True)
     created_at     = models.DateTimeField(auto_now_add=True)
+    updated_at     = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # a DRA's payments on one bill, newest first
+            models.Index(fields=['bill', 'dra', '-created_at'], name='payment_bill_dra_created_idx'),
+            # date-range lists, exports, daily totals and summaries
+            models.Index(fields=['created_at'], name='payment_created_at_idx'),
+        ]
+
+BALANCE_UPDATE_BATCH = 100  # bills per CASE UPDATE (bounds its parameter count)
+
+
+def apply_balance_delta(bill_id, delta):
+    """
+    Ledger-style balance maintenance: remaining_amount -= delta in a single
+    UPDATE, without re-aggregating the bill's payments.
+
+    A positive delta is a payment; a negative one is a compensating entry
+    (payment reduced or deleted). Crossing zero flips the status in the same
+    statement: down to ≤ 0 marks the bill cleared and freezes its
+    overdue_days (as record_payment does), back above 0 reopens a bill that
+    this ledger had cleared. (Every right-hand side below sees the
+    row's *old* values, so `remaining_amount <= delta` ⇔ new balance ≤ 0.)
+    """
+    return apply_balance_deltas({bill_id: delta})
+
+
+def apply_balance_deltas(deltas):
+    """
+    apply_balance_delta() for many bills, {bill_id: delta}: one CASE UPDATE
+    per BALANCE_UPDATE_BATCH bills (e.g. a payment import's batch).
+    """
+    deltas = [(pk, Decimal(delta)) for pk, delta in deltas.items() if delta]
+    if not deltas:
+        return 0
+    now = timezone.now()
+    frozen_overdue = overdue_days_expression(timezone.localdate())
+    updated = 0
+    for start in range(0, len(deltas), BALANCE_UPDATE_BATCH):
+        batch = deltas[start:start + BALANCE_UPDATE_BATCH]
+        remaining, status, cleared_at, overdue_days = [], [], [], []
+        for pk, delta in batch:
+            row = Q(pk=pk)
+            remaining.append(When(row, then=F('remaining_amount') - delta))
+            if delta > 0:
+                crossing = row & Q(remaining_amount__lte=delta) & ~Q(status=Bill.STATUS_CLEARED)
+                status.append(When(crossing, then=Value(Bill.STATUS_CLEARED)))
+                cleared_at.append(When(crossing & Q(cleared_at__isnull=True), then=Value(now)))
+                overdue_days.append(When(crossing, then=frozen_overdue))
+            else:
+                crossing = (
+                    row
+                    & Q(remaining_amount__lte=0)
+                    & Q(remaining_amount__gt=delta)
+                    & Q(status=Bill.STATUS_CLEARED)
+                )
+                status.append(When(crossing, then=Value(Bill.STATUS_OPEN)))
+                cleared_at.append(When(crossing, then=Value(None)))
+        updated += Bill.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+            remaining_amount=Case(*remaining, default=F('remaining_amount'),
+                                  output_field=Bill._meta.get_field('remaining_amount')),
+            status=Case(*status, default=F('status'), output_field=Bill._meta.get_field('status')),
+            cleared_at=Case(*cleared_at, default=F('cleared_at'),
+                            output_field=Bill._meta.get_field('cleared_at')),
+            overdue_days=Case(*overdue_days, default=F('overdue_days'),
+                              output_field=Bill._meta.get_field('overdue_days')),
+            updated_at=now,
+        )
+    bump_versions(versions.BILLS)
+    return updated
+
+
+@receiver(pre_save, sender=Payment)
+def remember_ledger_entry(sender, instance, **kwargs):
+    """
+    Keep the stored (bill, amount, method, created_at) of an edited payment
+    for compensation (bill balance and daily summary).
+    """
+    instance._ledger_prev = None
+    if instance.pk and not kwargs.get('raw'):
+        instance._ledger_prev = (
+            Payment.objects.filter(pk=instance.pk)
+            .values_list('bill_id', 'amount', 'payment_method', 'created_at')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+def update_bill_remaining(sender, instance, created, **kwargs):
+    # payments.services.record_payment already applied the balance change
+    # under the bill's row lock
+    if getattr(instance, '_balance_applied', False) or kwargs.get('raw'):
+        return
+    amount = Decimal(instance.amount)
+    prev = getattr(instance, '_ledger_prev', None)
+    if created or prev is None:
+        apply_balance_delta(instance.bill_id, amount)
+        return
+    prev_bill_id, prev_amount, _, _ = prev
+    if prev_bill_id == instance.bill_id:
+        apply_balance_delta(instance.bill_id, amount - prev_amount)
+    else:
+        # moved to another bill: refund the old one, charge the new one
+        apply_balance_delta(prev_bill_id, -prev_amount)
+        apply_balance_delta(instance.bill_id, amount)
+
+
+@receiver(post_delete, sender=Payment)
+def refund_bill_remaining(sender, instance, **kwargs):
+    apply_balance_delta(instance.bill_id, -Decimal(instance.amount))
+
+
+@receiver(post_save, sender=Payment)
+def update_daily_summary(sender, instance, created, **kwargs):
+    """Move the payment's local-date DailyPaymentSummary row (payments/summaries.py)."""
+    if kwargs.get('raw'):
+        return
+    from .summaries import record_summary_entries, summary_entry
+    prev = getattr(instance, '_ledger_prev', None)
+    with transaction.atomic():
+        if not created and prev is not None:
+            _, prev_amount, prev_method, prev_created_at = prev
+            record_summary_entries([summary_entry(prev_created_at, prev_method, prev_amount)], sign=-1)
+        record_summary_entries([summary_entry(instance.created_at, instance.payment_method, instance.amount)])
+
+
+@receiver(post_delete, sender=Payment)
+def remove_from_daily_summary(sender, instance, **kwargs):
+    from .summaries import record_summary_entries, summary_entry
+    record_summary_entries(
+        [summary_entry(instance.created_at, instance.payment_method, instance.amount)], sign=-1,
+    )
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def bump_payments_version(sender, **kwargs):
+    bump_versions(versions.PAYMENTS)
+
 
 @receiver(post_save, sender=Payment)
-def update_bill_remaining(sender, instance, **kwargs):
-    bill = instance.bill
-    paid = bill.user_payments.aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0.00')
-    bill.remaining_amount = bill.actual_amount - paid
-    if bill.remaining_amount <= 0:
-        bill.status = 'closed'
-    bill.save(update_fields=['remaining_amount', 'status'])
+@receiver(post_delete, sender=Payment)
+def invalidate_payment_worklists(sender, instance, **kwargs):
+    """A payment moves its bill's balance: refresh the assignee's worklist."""
+    if kwargs.get('raw'):
+        return
+    from bills.worklists import invalidate_bill_worklists, invalidate_worklists
+    if Payment.bill.is_cached(instance):
+        invalidate_worklists([instance.bill.assigned_to_id])
+    else:
+        invalidate_bill_worklists([instance.bill_id])
+    prev = getattr(instance, '_ledger_prev', None)
+    if prev is not None and prev[0] != instance.bill_id:
+        invalidate_bill_worklists([prev[0]])
 
 class DailyPaymentSummary(models.Model):
     date = models.DateField(unique=True)  # e.g. 2025-06-04
@@ -1,6 +1,8 @@
 # payments/pagination.py
 from rest_framework.pagination import PageNumberPagination
 
+from bills.pagination import KeysetPagination
+
 class PaymentPagination(PageNumberPagination):
     # Default page size if the client does not supply “limit”
     page_size = 10
@@ -13,3 +15,8 @@ class PaymentPagination(PageNumberPagination):
 
     # Optional: enforce a maximum page size
     max_page_size = 100
+
+
+class PaymentKeysetPagination(KeysetPagination):
+    # Payments are listed newest first: seek on (created_at, id)
+    default_ordering = ('-created_at',)
@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from django.shortcuts import get_object_or_404
 from .models import Payment
-from bills.models import Bill
+from .services import record_payment
+from bills.planning import LazyLoadCheckingListSerializer
+from bills.fieldsets import SparseFieldsetMixin
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     route_id        = serializers.ReadOnlyField(source='bill.outlet.route.id')
     route_name      = serializers.ReadOnlyField(source='bill.outlet.route.name')
     outlet_id       = serializers.ReadOnlyField(source='bill.outlet.id')
@@ -30,32 +31,17 @@ class PaymentSerializer(serializers.ModelSerializer):
             'cheque_date',
             'created_at',
         )
-        read_only_fields = ('dra', 'created_at')
+        read_only_fields = ('dra', 'bill', 'created_at')
+        list_serializer_class = LazyLoadCheckingListSerializer
 
-    def validate_amount(self, value):
+    def create(self, validated_data):
         """
-        1) Look up the Bill by bill_id (passed as a URL kwarg).
-        2) If bill.remaining_amount == 0, reject immediately.
-        3) If value > bill.remaining_amount, reject as an over‐payment.
-        Otherwise, return value.
+        Delegate to record_payment(): it locks the bill once, validates the
+        amount against the locked balance (same messages as before, under
+        "amount"), inserts the payment and updates the bill in one UPDATE.
         """
-        view = self.context.get("view")
-        bill_id = view.kwargs.get("bill_id")
-        bill = get_object_or_404(Bill, pk=bill_id)
-
-        # 1) Bill already fully paid?
-        if bill.remaining_amount <= 0:
-            raise serializers.ValidationError(
-                "This bill is already fully paid (remaining amount is 0)."
-            )
-
-        # 2) Over‐payment?
-        if value > bill.remaining_amount:
-            raise serializers.ValidationError(
-                f"Cannot pay {value}. Remaining amount is only {bill.remaining_amount}."
-            )
-
-        return value
+        bill_id = validated_data.pop("bill_id")
+        return record_payment(bill_id, **validated_data)
 
 class PaymentCreateSerializer(serializers.ModelSerializer):
     class Meta:
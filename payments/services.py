@@ -0,0 +1,63 @@
+# payments/services.py
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import serializers
+
+from bills import versions
+from bills.models import Bill
+from bills.versions import bump_versions
+from .models import Payment
+
+
+def record_payment(bill_id, dra, **fields):
+    """
+    The single write path for a new payment against `bill_id`:
+
+      1) lock the bill row (SELECT … FOR UPDATE) – concurrent payments on the
+         same bill queue up here, so the remaining-amount check below can
+         never be passed twice with the same balance
+      2) validate the amount against the locked balance
+      3) insert the payment (its post_save balance recomputation is skipped)
+      4) apply the new balance – and, when it reaches zero, the cleared
+         status, cleared_at and frozen overdue_days – in one UPDATE
+
+    Raises ValidationError({"amount": …}) for a fully-paid bill or an
+    over-payment, Http404 for an unknown bill.
+    """
+    amount = fields["amount"]
+    with transaction.atomic():
+        # outlet/route ride along for the response serializer, but only the
+        # bill row itself is locked
+        bill = get_object_or_404(
+            Bill.objects.select_related("outlet__route").select_for_update(of=("self",)),
+            pk=bill_id,
+        )
+
+        # Bill already fully paid?
+        if bill.remaining_amount <= 0:
+            raise serializers.ValidationError({"amount": [
+                "This bill is already fully paid (remaining amount is 0)."
+            ]})
+
+        # Over‐payment?
+        if amount > bill.remaining_amount:
+            raise serializers.ValidationError({"amount": [
+                f"Cannot pay {amount}. Remaining amount is only {bill.remaining_amount}."
+            ]})
+
+        payment = Payment(bill=bill, dra=dra, **fields)
+        payment._balance_applied = True  # see update_bill_remaining
+        payment.save(force_insert=True)
+
+        changes = {"remaining_amount": bill.remaining_amount - amount, "updated_at": timezone.now()}
+        if changes["remaining_amount"] <= 0 and bill.status != Bill.STATUS_CLEARED:
+            changes["status"] = Bill.STATUS_CLEARED
+            changes["cleared_at"] = bill.cleared_at or timezone.now()
+            changes["overdue_days"] = max((timezone.localdate() - bill.invoice_date).days, 0)
+        Bill.objects.filter(pk=bill.pk).update(**changes)
+        bump_versions(versions.BILLS)
+
+        for name, value in changes.items():
+            setattr(bill, name, value)
+    return payment
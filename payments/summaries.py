@@ -0,0 +1,125 @@
+# payments/summaries.py
+"""
+Incrementally maintained DailyPaymentSummary.
+
+Every payment insert, edit and delete moves its local date's row by the
+amount, in one `UPDATE … SET <method>_total = <method>_total + delta`
+(the row is created on first use), so the totals never need
+re-aggregating:
+
+  • insert  → +amount on (local date of created_at, method)
+  • edit    → −old entry, +new entry (amount, method or date may change)
+  • delete  → −amount
+
+The payments.models signals do this per payment; bulk inserts call
+record_summary_entries() themselves. Methods without a column (e.g.
+imported payments) aren't summarized, as before.
+
+rebuild_daily_summaries() recomputes a range of days from the payments
+with one GROUP BY (date, payment_method) query, for backfills and repairs.
+It overwrites the rows, so run it while no payments for those days are
+being written.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bills.dateranges import filter_local_dates
+from .models import DailyPaymentSummary, Payment
+
+# payment_method → DailyPaymentSummary column
+SUMMARY_COLUMNS = {
+    "cash":   "cash_total",
+    "upi":    "upi_total",
+    "cheque": "cheque_total",
+}
+
+
+def summary_entry(created_at, payment_method, amount):
+    """(local date, column, amount) a payment contributes, or None."""
+    column = SUMMARY_COLUMNS.get(payment_method)
+    if column is None or created_at is None:
+        return None
+    return (timezone.localdate(created_at), column, Decimal(amount))
+
+
+def apply_summary_delta(day, column, delta):
+    """<column> += delta on `day`'s row, creating the row if needed."""
+    if not delta:
+        return
+    rows = DailyPaymentSummary.objects.filter(date=day)
+    if rows.update(**{column: F(column) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            DailyPaymentSummary.objects.create(date=day, **{column: delta})
+    except IntegrityError:  # created concurrently: add to theirs
+        rows.update(**{column: F(column) + delta})
+
+
+def record_summary_entries(entries, sign=1):
+    """Apply summary_entry() tuples, one UPDATE per (day, column)."""
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        if entry is not None:
+            day, column, amount = entry
+            deltas[day, column] += sign * amount
+    with transaction.atomic():
+        for (day, column), delta in sorted(deltas.items()):
+            apply_summary_delta(day, column, delta)
+
+
+def record_payments(payments):
+    """Add bulk-created `payments` to their days' summaries."""
+    record_summary_entries(
+        summary_entry(p.created_at, p.payment_method, p.amount) for p in payments
+    )
+
+
+# ─── reading ────────────────────────────────────────────────────────────────
+def day_totals(day):
+    """{"date", "cash_total", "upi_total", "cheque_total"} for `day` (one query)."""
+    columns = tuple(SUMMARY_COLUMNS.values())
+    totals = DailyPaymentSummary.objects.filter(date=day).values(*columns).first()
+    return {"date": day, **(totals or dict.fromkeys(columns, Decimal("0.00")))}
+
+
+# ─── backfill ───────────────────────────────────────────────────────────────
+def rebuild_daily_summaries(start_date, end_date):
+    """
+    Recompute the summaries of start_date..end_date (inclusive) from the
+    payments: one GROUP BY (local date, payment_method) query and one
+    upsert. Days without payments get zero rows. Returns the rows.
+    """
+    payments = filter_local_dates(
+        Payment.objects.filter(payment_method__in=SUMMARY_COLUMNS),
+        "created_at", start_date, end_date,
+    )
+    grouped = (
+        payments.annotate(day=TruncDate("created_at"))
+        .values("day", "payment_method")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+    rows = {}
+    day = start_date
+    while day <= end_date:
+        rows[day] = DailyPaymentSummary(date=day)
+        day += timedelta(days=1)
+    for group in grouped:
+        setattr(rows[group["day"]], SUMMARY_COLUMNS[group["payment_method"]], group["total"])
+
+    with transaction.atomic():
+        DailyPaymentSummary.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=["date"],
+            update_fields=list(SUMMARY_COLUMNS.values()),
+        )
+    return list(rows.values())
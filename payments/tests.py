@@ -1,3 +1,321 @@
+import datetime
+import importlib
+from decimal import Decimal
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db.models import Sum
+from django.http import Http404
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from bills.dateranges import filter_local_dates
+from bills.models import Bill, Outlet, Route
+from users.models import User
+from .models import DailyPaymentSummary, Payment
+from .services import record_payment
+from .summaries import SUMMARY_COLUMNS, day_totals, rebuild_daily_summaries
+
+
+class PaymentFixturesMixin:
+    """A DRA and one open bill of 100.00."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dra = User.objects.create_user("dra", password="x", role="dra")
+        route = Route.objects.create(name="North")
+        cls.outlet = Outlet.objects.create(name="Shop A", route=route)
+        cls.bill = cls.make_bill("INV001")
+
+    @classmethod
+    def make_bill(cls, number, amount="100.00"):
+        return Bill.objects.create(
+            outlet=cls.outlet, invoice_number=number,
+            invoice_date=datetime.date(2025, 1, 1), actual_amount=Decimal(amount),
+            assigned_to=cls.dra,
+        )
+
+    def reload(self, bill=None):
+        return Bill.objects.get(pk=(bill or self.bill).pk)
+
+
+class RecordPaymentTests(PaymentFixturesMixin, TestCase):
+    def test_partial_payment_reduces_the_balance(self):
+        payment = record_payment(self.bill.pk, self.dra, amount=Decimal("40.00"), payment_method="cash")
+
+        bill = self.reload()
+        self.assertEqual(payment.bill_id, bill.pk)
+        self.assertEqual(bill.remaining_amount, Decimal("60.00"))
+        self.assertEqual(bill.status, Bill.STATUS_OPEN)
+        self.assertIsNone(bill.cleared_at)
+
+    def test_paying_the_rest_clears_the_bill(self):
+        record_payment(self.bill.pk, self.dra, amount=Decimal("40.00"), payment_method="cash")
+        record_payment(self.bill.pk, self.dra, amount=Decimal("60.00"), payment_method="upi")
+
+        bill = self.reload()
+        self.assertEqual(bill.remaining_amount, Decimal("0.00"))
+        self.assertEqual(bill.status, Bill.STATUS_CLEARED)
+        self.assertIsNotNone(bill.cleared_at)
+        self.assertGreater(bill.overdue_days, 0)  # frozen at clearing time
+
+    def test_over_payment_is_rejected(self):
+        with self.assertRaises(serializers.ValidationError) as ctx:
+            record_payment(self.bill.pk, self.dra, amount=Decimal("100.01"), payment_method="cash")
+
+        self.assertEqual(
+            ctx.exception.detail["amount"][0],
+            "Cannot pay 100.01. Remaining amount is only 100.00.",
+        )
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.reload().remaining_amount, Decimal("100.00"))
+
+    def test_fully_paid_bill_is_rejected(self):
+        record_payment(self.bill.pk, self.dra, amount=Decimal("100.00"), payment_method="cash")
+
+        with self.assertRaises(serializers.ValidationError) as ctx:
+            record_payment(self.bill.pk, self.dra, amount=Decimal("1.00"), payment_method="cash")
+        self.assertIn("already fully paid", ctx.exception.detail["amount"][0])
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_unknown_bill_is_404(self):
+        with self.assertRaises(Http404):
+            record_payment(999999, self.dra, amount=Decimal("1.00"), payment_method="cash")
+
+
+class PaymentCreateViewTests(PaymentFixturesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.dra)
+
+    def post(self, bill_id, amount):
+        return self.client.post(
+            f"/api/payments/{bill_id}/payments/",
+            {"payment_method": "cash", "amount": amount}, format="json",
+        )
+
+    def test_create_and_errors(self):
+        response = self.post(self.bill.pk, "100.00")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.reload().status, Bill.STATUS_CLEARED)
+
+        response = self.post(self.bill.pk, "1.00")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("amount", response.json())
+
+        self.assertEqual(self.post(999999, "1.00").status_code, 404)
+
+
+class PaymentLedgerTests(PaymentFixturesMixin, TestCase):
+    """Saving/deleting a Payment directly keeps its bill's balance and status."""
+
+    def pay(self, amount, bill=None):
+        return Payment.objects.create(
+            bill=bill or self.bill, dra=self.dra, amount=Decimal(amount), payment_method="cash",
+        )
+
+    def assertBalance(self, remaining, status, bill=None):
+        bill = self.reload(bill)
+        self.assertEqual(bill.remaining_amount, Decimal(remaining))
+        self.assertEqual(bill.status, status)
+        if status == Bill.STATUS_CLEARED:
+            self.assertIsNotNone(bill.cleared_at)
+        else:
+            self.assertIsNone(bill.cleared_at)
+
+    def test_create_charges_the_bill(self):
+        self.pay("30.00")
+        self.assertBalance("70.00", Bill.STATUS_OPEN)
+
+    def test_edit_compensates_the_old_amount(self):
+        payment = self.pay("30.00")
+        payment.amount = Decimal("45.00")
+        payment.save()
+        self.assertBalance("55.00", Bill.STATUS_OPEN)
+
+    def test_move_refunds_the_old_bill(self):
+        other = self.make_bill("INV002")
+        payment = self.pay("100.00")
+        self.assertBalance("0.00", Bill.STATUS_CLEARED)
+
+        payment.bill = other
+        payment.save()
+        self.assertBalance("100.00", Bill.STATUS_OPEN)
+        self.assertBalance("0.00", Bill.STATUS_CLEARED, bill=other)
+
+    def test_delete_refunds_and_reopens(self):
+        payment = self.pay("100.00")
+        payment.delete()
+        self.assertBalance("100.00", Bill.STATUS_OPEN)
+
+    def test_clearing_freezes_overdue_days_like_record_payment(self):
+        api_paid = self.make_bill("INV002")
+        # open bills' column is stale; clearing must write the current value
+        Bill.objects.update(overdue_days=0)
+        record_payment(api_paid.pk, self.dra, amount=Decimal("100.00"), payment_method="cash")
+        payment = self.pay("60.00")
+        payment.amount = Decimal("100.00")
+        payment.save()
+
+        expected = (timezone.localdate() - self.bill.invoice_date).days
+        self.assertEqual(self.reload().overdue_days, expected)
+        self.assertEqual(self.reload(api_paid).overdue_days, expected)
+
+    def test_edit_crosses_zero_both_ways(self):
+        payment = self.pay("60.00")
+        payment.amount = Decimal("100.00")
+        payment.save()
+        self.assertBalance("0.00", Bill.STATUS_CLEARED)
+
+        payment.amount = Decimal("99.99")
+        payment.save()
+        self.assertBalance("0.01", Bill.STATUS_OPEN)
+
+    def test_raising_the_invoice_amount_reopens(self):
+        self.pay("100.00")
+        bill = self.reload()
+        bill.actual_amount = Decimal("120.00")
+        bill.save()
+
+        self.assertEqual(bill.status, Bill.STATUS_OPEN)
+        self.assertBalance("20.00", Bill.STATUS_OPEN)
+        self.assertEqual(self.reload().opening_amount, Decimal("120.00"))
+
+    def test_lowering_the_invoice_amount_below_the_paid_clears(self):
+        self.pay("80.00")
+        bill = self.reload()
+        bill.actual_amount = Decimal("80.00")
+        bill.save()
+
+        self.assertEqual(bill.status, Bill.STATUS_CLEARED)
+        self.assertBalance("0.00", Bill.STATUS_CLEARED)
+
+
+class ReconcileRemainingAmountsTests(PaymentFixturesMixin, TestCase):
+    def reconcile(self):
+        out = StringIO()
+        call_command("reconcile_remaining_amounts", stdout=out)
+        return out.getvalue()
+
+    def test_reopens_a_cleared_bill_with_a_positive_balance(self):
+        Bill.objects.filter(pk=self.bill.pk).update(
+            remaining_amount=Decimal("0.00"), status=Bill.STATUS_CLEARED,
+            cleared_at=datetime.datetime(2025, 2, 1, tzinfo=datetime.timezone.utc),
+        )
+
+        self.assertIn("0 newly cleared, 1 reopened", self.reconcile())
+        bill = self.reload()
+        self.assertEqual(bill.remaining_amount, Decimal("100.00"))
+        self.assertEqual(bill.status, Bill.STATUS_OPEN)
+        self.assertIsNone(bill.cleared_at)
+
+    def test_clears_a_paid_off_bill(self):
+        Payment.objects.bulk_create([
+            Payment(bill=self.bill, dra=self.dra, amount=Decimal("100.00"), payment_method="cash"),
+        ])
+
+        self.assertIn("1 newly cleared, 0 reopened", self.reconcile())
+        self.assertEqual(self.reload().status, Bill.STATUS_CLEARED)
+
+
+class DailySummaryTests(PaymentFixturesMixin, TestCase):
+    """DailyPaymentSummary always equals a direct Sum over the payments."""
+
+    DAY = datetime.date(2025, 3, 1)
+    NEXT_DAY = datetime.date(2025, 3, 2)
+
+    def at(self, day, hour=10):
+        return datetime.datetime.combine(day, datetime.time(hour), tzinfo=datetime.timezone.utc)
+
+    def pay(self, amount, method="cash", day=DAY, bill=None):
+        payment = Payment.objects.create(
+            bill=bill or self.bill, dra=self.dra, amount=Decimal(amount), payment_method=method,
+        )
+        self.assertInSync(timezone.localdate())
+        # created today (auto_now_add): back-date it, itself an edit
+        payment.created_at = self.at(day)
+        payment.save()
+        return payment
+
+    def direct_totals(self, day):
+        totals = {column: Decimal("0.00") for column in SUMMARY_COLUMNS.values()}
+        grouped = (
+            filter_local_dates(Payment.objects.all(), "created_at", day, day)
+            .values("payment_method").annotate(total=Sum("amount")).order_by()
+        )
+        for group in grouped:
+            if group["payment_method"] in SUMMARY_COLUMNS:
+                totals[SUMMARY_COLUMNS[group["payment_method"]]] = group["total"]
+        return {"date": day, **totals}
+
+    def assertInSync(self, *days):
+        for day in days or (self.DAY, self.NEXT_DAY, timezone.localdate()):
+            with self.subTest(day=day):
+                self.assertEqual(day_totals(day), self.direct_totals(day))
+
+    def test_insert(self):
+        self.pay("10.00")
+        self.pay("2.50", method="upi")
+        self.assertInSync()
+        self.assertEqual(day_totals(self.DAY)["cash_total"], Decimal("10.00"))
+
+    def test_amount_and_method_edit(self):
+        payment = self.pay("10.00")
+        payment.amount = Decimal("12.00")
+        payment.save()
+        self.assertInSync()
+
+        payment.payment_method = "cheque"
+        payment.save()
+        self.assertInSync()
+        self.assertEqual(day_totals(self.DAY)["cash_total"], Decimal("0.00"))
+
+    def test_date_and_bill_move(self):
+        other = self.make_bill("INV002")
+        payment = self.pay("10.00")
+        self.pay("5.00", day=self.NEXT_DAY)
+
+        payment.created_at = self.at(self.NEXT_DAY, hour=23)
+        payment.save()
+        self.assertInSync()
+
+        payment.bill = other
+        payment.save()
+        self.assertInSync()
+        self.assertEqual(day_totals(self.NEXT_DAY)["cash_total"], Decimal("15.00"))
+
+    def test_delete(self):
+        payment = self.pay("10.00")
+        self.pay("1.00")
+        payment.delete()
+        self.assertInSync()
+        self.assertEqual(day_totals(self.DAY)["cash_total"], Decimal("1.00"))
+
+    def test_unsummarized_methods_are_ignored(self):
+        Payment.objects.bulk_create([
+            Payment(bill=self.bill, dra=self.dra, amount=Decimal("3.00"),
+                    payment_method="Imported", created_at=self.at(self.DAY)),
+        ])
+        self.pay("1.00")
+        self.assertInSync()
+
+    def test_rebuild_repairs_drift(self):
+        self.pay("10.00")
+        self.pay("4.00", method="upi", day=self.NEXT_DAY)
+        DailyPaymentSummary.objects.update(cash_total=Decimal("999.00"))
+
+        rows = rebuild_daily_summaries(self.DAY - datetime.timedelta(days=1), self.NEXT_DAY)
+        self.assertEqual([row.date for row in rows], [self.DAY - datetime.timedelta(days=1), self.DAY, self.NEXT_DAY])
+        self.assertInSync(self.DAY - datetime.timedelta(days=1), self.DAY, self.NEXT_DAY)
+
+    def test_migration_backfill(self):
+        self.pay("10.00")
+        self.pay("4.00", method="upi", day=self.NEXT_DAY)
+        DailyPaymentSummary.objects.all().delete()
 
-# Create your tests here.
+        migration = importlib.import_module("payments.migrations.0009_backfill_daily_payment_summaries")
+        migration.backfill_summaries(django_apps, None)
+        self.assertInSync()
@@ -1,20 +1,22 @@
 from bills.serializers import serializers
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
-from django.db.models.functions import Coalesce
-from django.db.models import Sum, Q, Value, DecimalField
-
 
 from django.utils.dateparse import parse_date
 from django.utils import timezone
-from bills.models import Bill
 from .models import Payment
 from .serializers import PaymentSerializer
 from rest_framework.permissions import IsAdminUser
-from .pagination import PaymentPagination
+from .pagination import PaymentPagination, PaymentKeysetPagination
+from bills.pagination import KeysetModeMixin
+from bills.dateranges import filter_local_dates
+from bills import versions
+from bills.planning import QueryPlanMixin
+from bills.versions import ConditionalGetMixin
+from bills.streaming import full_list_response
 from .serializers import TodayPaymentTotalsSerializer
+from .summaries import day_totals
 
 
 
@@ -23,15 +25,18 @@ class IsDRA(permissions.BasePermission):
         return request.user.is_authenticated and request.user.role == 'dra'
 
 
-class BillPaymentsListCreateView(generics.ListCreateAPIView):
+class BillPaymentsListCreateView(ConditionalGetMixin, QueryPlanMixin, KeysetModeMixin, generics.ListCreateAPIView):
     """
     GET  /api/payments/<bill_id>/payments/
       → list all payments for bill=<bill_id>, made by the current DRA.
       If neither `page` nor `limit` is provided, returns all matching payments.
       Supports filters:
         • ?invoice_number=<str>  → filters Payment → Bill → invoice_number__icontains
-        • ?start_date=YYYY-MM-DD → filters Payment.created_at__date >= start_date
-        • ?end_date=YYYY-MM-DD   → filters Payment.created_at__date <= end_date
+        • ?start_date=YYYY-MM-DD → filters payments created on/after start_date (local date)
+        • ?end_date=YYYY-MM-DD   → filters payments created on/before end_date (local date)
+      ?pagination=cursor (then ?cursor=<next_cursor>) → keyset pages on
+      (created_at, id), no OFFSET; ?count=true adds the total.
+      A current If-None-Match gets 304 (see bills.versions).
 
     POST /api/payments/<bill_id>/payments/
       → create a new payment (assigned to the current DRA & this bill).
@@ -39,6 +44,8 @@ class BillPaymentsListCreateView(generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = (IsDRA,)
     pagination_class = PaymentPagination
+    keyset_pagination_class = PaymentKeysetPagination
+    etag_tables = (versions.PAYMENTS, versions.BILLS, versions.OUTLETS, versions.ROUTES)
 
     def get_queryset(self):
         bid = self.kwargs['bill_id']
@@ -51,58 +58,60 @@ class BillPaymentsListCreateView(generics.ListCreateAPIView):
         if inv_no:
             qs = qs.filter(bill__invoice_number__icontains=inv_no)
 
-        # 3) Filter by payment date range (created_at date)
+        # 3) Filter by payment date range (local created_at date, as an
+        #    index-friendly created_at timestamp range)
         raw_start = self.request.query_params.get('start_date')
         raw_end = self.request.query_params.get('end_date')
         start_date = parse_date(raw_start) if raw_start else None
         end_date = parse_date(raw_end) if raw_end else None
 
-        if start_date:
-            qs = qs.filter(created_at__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(created_at__date__lte=end_date)
+        qs = filter_local_dates(qs, 'created_at', start_date, end_date)
 
         return qs.order_by('-created_at')
 
     def list(self, request, *args, **kwargs):
         """
         If neither `page` nor `limit` in query params, return ALL matching payments.
-        Otherwise, fall back to DRF pagination.
+        Otherwise, fall back to DRF pagination (keyset in cursor mode).
         """
+        if self.uses_keyset():
+            return self.keyset_list(request)
+
         if 'page' not in request.query_params and 'limit' not in request.query_params:
             queryset = self.filter_queryset(self.get_queryset())
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return full_list_response(
+                request, queryset, self.get_serializer_class(), self.get_serializer_context()
+            )
 
         return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """
-        At this point, `validate_amount()` in the serializer has already run,
-        so `amount <= bill.remaining_amount` and `remaining_amount > 0` are guaranteed.
+        The bill is locked, the amount validated against its remaining
+        balance, the payment inserted and the bill's balance/status updated
+        in a single transaction (see payments.services.record_payment).
         """
-        bill = get_object_or_404(Bill, pk=self.kwargs['bill_id'])
-        payment = serializer.save(dra=self.request.user, bill=bill)
+        serializer.save(dra=self.request.user, bill_id=self.kwargs['bill_id'])
 
-        # If fully paid now, mark as cleared
-        if bill.remaining_amount <= 0:
-            bill.status = 'cleared'
-            bill.save()
 
-
-class MyPaymentsListView(generics.ListAPIView):
+class MyPaymentsListView(ConditionalGetMixin, QueryPlanMixin, KeysetModeMixin, generics.ListAPIView):
     """
     GET /api/payments/ → list ALL payments (admin only).
       If neither `page` nor `limit` is provided, returns ALL matching payments.
       Supports filters:
         • ?invoice_number=<str>  → Payment → Bill → invoice_number__icontains
         • ?username=<str>        → Payment → dra → username__icontains
-        • ?start_date=YYYY-MM-DD → Payment.created_at__date >= start_date
-        • ?end_date=YYYY-MM-DD   → Payment.created_at__date <= end_date
+        • ?start_date=YYYY-MM-DD → payments created on/after start_date (local date)
+        • ?end_date=YYYY-MM-DD   → payments created on/before end_date (local date)
+      ?pagination=cursor (then ?cursor=<next_cursor>) → keyset pages on
+      (created_at, id), no OFFSET; ?count=true adds the total.
+      A current If-None-Match gets 304 (see bills.versions).
     """
     serializer_class = PaymentSerializer
     permission_classes = (IsAdminUser,)
     pagination_class = PaymentPagination
+    keyset_pagination_class = PaymentKeysetPagination
+    etag_tables = (versions.PAYMENTS, versions.BILLS, versions.OUTLETS, versions.ROUTES)
 
     def get_queryset(self):
         # Base: all payments, ordered newest first
@@ -118,28 +127,30 @@ class MyPaymentsListView(generics.ListAPIView):
         if uname:
             qs = qs.filter(dra__username__icontains=uname)
 
-        # Filter by payment date range
+        # Filter by payment date range (as a created_at timestamp range)
         raw_start = self.request.query_params.get('start_date')
         raw_end = self.request.query_params.get('end_date')
         start_date = parse_date(raw_start) if raw_start else None
         end_date = parse_date(raw_end) if raw_end else None
 
-        if start_date:
-            qs = qs.filter(created_at__date__gte=start_date)
-        if end_date:
-            qs = qs.filter(created_at__date__lte=end_date)
+        qs = filter_local_dates(qs, 'created_at', start_date, end_date)
 
         return qs
 
     def list(self, request, *args, **kwargs):
         """
         Override `list()` so that if neither `page` nor `limit` is present, 
-        we return the full queryset; otherwise, use standard pagination.
+        we return the full queryset; otherwise, use standard pagination
+        (keyset in cursor mode).
         """
+        if self.uses_keyset():
+            return self.keyset_list(request)
+
         if 'page' not in request.query_params and 'limit' not in request.query_params:
             queryset = self.filter_queryset(self.get_queryset())
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return full_list_response(
+                request, queryset, self.get_serializer_class(), self.get_serializer_context()
+            )
 
         return super().list(request, *args, **kwargs)
 
@@ -151,48 +162,10 @@ class TodayPaymentTotalsAPIView(APIView):
       "upi_total": "…",
       "cheque_total": "…"
     }
+    Read from today's DailyPaymentSummary row, which every payment write
+    keeps current (see payments/summaries.py): one single-row query.
     """
 
     def get(self, request, *args, **kwargs):
-        # 1) Determine “today” in local time (Asia/Kolkata).
-        today = timezone.localdate()
-
-        # 2) Filter only Payment rows whose created_at__date == today.
-        payments_today = Payment.objects.filter(created_at__date=today)
-
-        # 3) Aggregate sums per payment_method.
-        #    Each Sum(...) returns a Decimal or None; Value(0, output_field=DecimalField(...))
-        #    ensures the fallback is also a DecimalField.
-        aggregates = payments_today.aggregate(
-            cash_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="cash")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-            upi_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="upi")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-            cheque_sum=Coalesce(
-                Sum(
-                    "amount",
-                    filter=Q(payment_method="cheque")
-                ),
-                Value(0, output_field=DecimalField(max_digits=12, decimal_places=2)),
-            ),
-        )
-
-        data = {
-            "date": today,
-            "cash_total": aggregates["cash_sum"],
-            "upi_total": aggregates["upi_sum"],
-            "cheque_total": aggregates["cheque_sum"],
-        }
-
-        serializer = TodayPaymentTotalsSerializer(data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        serializer = TodayPaymentTotalsSerializer(day_totals(timezone.localdate()))
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -9,6 +9,7 @@ from django.core.mail import EmailMessage
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
+from bills.dateranges import filter_local_date
 from bills.models import Bill
 from payments.models import Payment
 
@@ -47,8 +48,7 @@ class Command(BaseCommand):
         # 2. Fetch payments created today, along with related Bill and DRA user.
         #    Adjust 'created_by' below to match your actual field on Payment for “DRA username.”
         payments_qs = (
-            Payment.objects
-            .filter(created_at__date=today)
+            filter_local_date(Payment.objects.all(), 'created_at', today)
             .select_related('bill', 'created_by')  # assumes Payment.bill → Bill, Payment.created_by → User
             .order_by('created_at')
         )
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bills import versions
+from bills.versions import bump_versions
 
 class User(AbstractUser):
     ROLE_CHOICES = (('admin', 'Admin'), ('dra', 'Debt Recovery Agent'))
@@ -9,3 +14,8 @@ class User(AbstractUser):
     @property
     def is_admin(self):
         return self.role == 'admin'
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_users_version(sender, **kwargs):
+    bump_versions(versions.USERS)
@@ -9,6 +9,9 @@ from rest_framework.generics import GenericAPIView
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from users.serializers import LogoutRequestSerializer
 
+from bills import versions
+from bills.references import ReferenceViewMixin, agents
+from bills.versions import ConditionalGetMixin
 from users.models import User
 from users.serializers import UserSerializer
 
@@ -56,13 +59,20 @@ class LogoutView(GenericAPIView):
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(ConditionalGetMixin, ReferenceViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     GET /api/auth/users/      → list non-admin users
     GET /api/auth/users/{pk}/ → retrieve single non-admin user
+
+    Served from the in-process reference snapshot (bills.references).
     """
     serializer_class   = UserSerializer
     permission_classes = [IsAuthenticated]
+    etag_tables        = (versions.USERS,)
+    reference_table    = versions.USERS
+
+    def filter_references(self, rows):
+        return agents(rows)
 
     def get_queryset(self):
         return User.objects.exclude(